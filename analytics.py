@@ -0,0 +1,325 @@
+"""
+Sales analytics rollups
+
+Three summary tables hold, per month and quotation status, how many
+quotations, lines and units were quoted and for how much:
+  rollup_product_month   per product
+  rollup_customer_month  per customer
+  rollup_tecnica_month   per tecnica_personalizacion
+The reports page and `python analytics.py report` read only these tables.
+They never scan quotation_details.
+
+The rollups are kept current incrementally. After every flush that
+touches quotations or their lines, the rollup rows those quotations feed
+(their products, customer and tecnicas in their month, including the
+values they had before the change) are recomputed from the base tables,
+in the same transaction. Writes that bypass the ORM call
+refresh_quotations() themselves. Live and archived quotations (archive.py)
+are both counted, so archiving doesn't change the numbers.
+
+To recompute everything in one set-based pass, one INSERT ... SELECT per
+rollup:
+    python analytics.py rebuild
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import delete, distinct, func, insert, literal, select, union_all
+
+from models import (db, Customer, Product, Quotation, QuotationArchive, QuotationDetail, QuotationDetailArchive,
+                    RollupCustomerMonth, RollupProductMonth, RollupTecnicaMonth)
+
+# dimension -> (rollup model, its key column)
+ROLLUPS = {
+    'producto': (RollupProductMonth, 'product_id'),
+    'cliente': (RollupCustomerMonth, 'customer_id'),
+    'tecnica': (RollupTecnicaMonth, 'tecnica'),
+}
+
+MEASURES = ['cotizaciones', 'lineas', 'cantidad', 'suma_precio', 'importe']
+
+RECOMPUTE_BATCH = 500  # dimension values recomputed per DELETE + INSERT ... SELECT
+
+# Quotation / line fields whose change moves numbers between rollup rows
+QUOTATION_FIELDS = ('fecha', 'customer_id', 'status')
+DETAIL_FIELDS = ('quotation_id', 'product_id', 'tecnica_personalizacion', 'cantidad', 'precio_pactado',
+                 'costo_personalizacion')
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _month_sql(conn, column):
+    """First day of column's month, in the connection's dialect"""
+    if conn.dialect.name == 'sqlite':
+        return func.strftime('%Y-%m-01', column)
+    return func.date_format(column, '%Y-%m-01')
+
+
+def _lines(quotations, details, dimension, month, conditions):
+    """One row per quoted line: month, dimension value, status and the line's measures"""
+    key = {
+        'producto': details.c.product_id,
+        'cliente': quotations.c.customer_id,
+        'tecnica': func.coalesce(details.c.tecnica_personalizacion, ''),
+    }[dimension]
+    cantidad = func.coalesce(details.c.cantidad, 0)
+    precio = func.coalesce(details.c.precio_pactado, 0)
+    return (
+        select(month(quotations.c.fecha).label('mes'), key.label('clave'), quotations.c.status.label('status'),
+               quotations.c.quotation_id.label('quotation_id'), cantidad.label('cantidad'),
+               precio.label('precio'),
+               ((precio + func.coalesce(details.c.costo_personalizacion, 0)) * cantidad).label('importe'))
+        .select_from(details.join(quotations, quotations.c.quotation_id == details.c.quotation_id))
+        .where(quotations.c.fecha.isnot(None), quotations.c.status.isnot(None), key.isnot(None),
+               *conditions(quotations, details, key))
+    )
+
+
+def aggregate(dimension, month, conditions=lambda q, d, key: ()):
+    """SELECT for rollup rows of a dimension over live and archived quotations
+
+    month(fecha_column) gives the mes value; conditions(quotations, details, key)
+    narrows the lines.
+    """
+    lines = union_all(
+        _lines(Quotation.__table__, QuotationDetail.__table__, dimension, month, conditions),
+        _lines(QuotationArchive.__table__, QuotationDetailArchive.__table__, dimension, month, conditions),
+    ).subquery()
+    return (
+        select(lines.c.mes, lines.c.clave, lines.c.status, func.count(distinct(lines.c.quotation_id)),
+               func.count(), func.sum(lines.c.cantidad), func.sum(lines.c.precio), func.sum(lines.c.importe))
+        .group_by(lines.c.mes, lines.c.clave, lines.c.status)
+    )
+
+
+def _recompute(conn, dimension, values, month):
+    """Replace the rollup rows of some values of a dimension in one month"""
+    model, key_column = ROLLUPS[dimension]
+    table = model.__table__
+    values = sorted(values)
+    end = next_month(month)
+    for start in range(0, len(values), RECOMPUTE_BATCH):
+        batch = values[start:start + RECOMPUTE_BATCH]
+        conn.execute(delete(table).where(table.c.mes == month, table.c[key_column].in_(batch)))
+        conn.execute(insert(table).from_select(
+            ['mes', key_column, 'status'] + MEASURES,
+            aggregate(dimension, lambda fecha: literal(month),
+                      lambda q, d, key: (q.c.fecha >= month, q.c.fecha < end, key.in_(batch))),
+        ))
+
+
+def contributions(conn, quotation_ids):
+    """{quotation_id: {'fecha' | 'producto' | 'cliente' | 'tecnica': set of values}}, as stored now"""
+    touched = defaultdict(lambda: defaultdict(set))
+    quotations, details = Quotation.__table__, QuotationDetail.__table__
+    ids = list(quotation_ids)
+    for start in range(0, len(ids), 500):
+        rows = conn.execute(
+            select(quotations.c.quotation_id, quotations.c.fecha, quotations.c.customer_id,
+                   details.c.product_id, details.c.tecnica_personalizacion)
+            .select_from(quotations.outerjoin(details, details.c.quotation_id == quotations.c.quotation_id))
+            .where(quotations.c.quotation_id.in_(ids[start:start + 500]))
+        )
+        for q_id, fecha, customer_id, product_id, tecnica in rows:
+            values = touched[q_id]
+            values['fecha'].add(fecha)
+            values['cliente'].add(customer_id)
+            values['producto'].add(product_id)
+            values['tecnica'].add(tecnica or '')
+    return touched
+
+
+def refresh_quotations(conn, quotation_ids, previous=None):
+    """
+    Recompute the rollup rows fed by these quotations, as they are now in the database
+
+    previous: contributions() of the quotations before the change, whose
+    rows (old month, removed products...) must be recomputed too.
+    """
+    touched = list(contributions(conn, quotation_ids).values()) + list((previous or {}).values())
+
+    keys = defaultdict(set)  # (dimension, month) -> values
+    for values in touched:
+        for month in {month_start(f) for f in values['fecha'] if f is not None}:
+            for dimension in ROLLUPS:
+                keys[(dimension, month)].update(v for v in values[dimension] if v is not None)
+
+    for (dimension, month), values in keys.items():
+        if values:
+            _recompute(conn, dimension, values, month)
+    return sum(len(values) for values in keys.values())
+
+
+def refresh_customers(conn, merged):
+    """
+    Recompute the customer rollups after quotations moved between customers with UPDATEs
+
+    merged: {old customer_id: customer_id its quotations now belong to}.
+    Call it after the UPDATE: the rollup rows of the old customers still
+    tell which months moved.
+    """
+    table = RollupCustomerMonth.__table__
+    ids = list(set(merged) | set(merged.values()))
+    keys = defaultdict(set)  # month -> customer_ids
+    for start in range(0, len(ids), 500):
+        for customer_id, month in conn.execute(
+            select(table.c.customer_id, table.c.mes).distinct()
+            .where(table.c.customer_id.in_(ids[start:start + 500]))
+        ):
+            keys[month].update({customer_id, merged.get(customer_id, customer_id)})
+    for month, customer_ids in keys.items():
+        _recompute(conn, 'cliente', customer_ids, month)
+    return sum(len(customer_ids) for customer_ids in keys.values())
+
+
+def _changed_quotation_ids(session):
+    """Ids of the quotations whose rollup rows this flush may change (None for unsaved ones)"""
+    ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Quotation):
+            fields = QUOTATION_FIELDS + ('details',)
+        elif isinstance(obj, QuotationDetail):
+            fields = DETAIL_FIELDS
+        else:
+            continue
+        state = db.inspect(obj)
+        if not (state.pending or state.deleted or obj in session.deleted
+                or any(state.attrs[f].history.has_changes() for f in fields)):
+            continue
+        if isinstance(obj, Quotation):
+            ids.add(obj.quotation_id)
+        else:
+            ids.add(obj.quotation_id)
+            ids.update(state.attrs.quotation_id.history.deleted)
+            if obj.quotation is not None:
+                ids.add(obj.quotation.quotation_id)
+    ids.discard(None)
+    return ids
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def remember_rollup_sources(session, flush_context, instances):
+    # What the quotations about to change contribute now; attribute history
+    # can't tell, since attributes expired by a commit keep no old value
+    ids = _changed_quotation_ids(session)
+    session.info['rollup_previous'] = contributions(session.connection(), ids) if ids else {}
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def refresh_rollups(session, flush_context):
+    previous = session.info.pop('rollup_previous', {})
+    ids = _changed_quotation_ids(session) | set(previous)
+    if ids:
+        refresh_quotations(session.connection(), ids, previous)
+
+
+def rebuild(conn):
+    """Recompute every rollup from scratch, one INSERT ... SELECT each"""
+    for dimension, (model, key_column) in ROLLUPS.items():
+        table = model.__table__
+        conn.execute(delete(table))
+        conn.execute(insert(table).from_select(
+            ['mes', key_column, 'status'] + MEASURES,
+            aggregate(dimension, lambda fecha: _month_sql(conn, fecha)),
+        ))
+
+
+# --- Reports (rollup tables only) ---
+
+def _totals(model):
+    return (func.sum(model.cotizaciones).label('cotizaciones'), func.sum(model.lineas).label('lineas'),
+            func.sum(model.cantidad).label('cantidad'), func.sum(model.importe).label('importe'),
+            (func.sum(model.suma_precio) / func.sum(model.lineas)).label('precio_promedio'))
+
+
+def _period(model, desde, hasta, statuses):
+    conditions = [model.mes >= desde, model.mes < next_month(hasta)]
+    if statuses:
+        conditions.append(model.status.in_(statuses))
+    return conditions
+
+
+def top_products(desde, hasta, statuses=None, limit=20):
+    """Most quoted products (by units) between the months desde and hasta"""
+    m = RollupProductMonth
+    totals = (select(m.product_id, *_totals(m)).where(*_period(m, desde, hasta, statuses))
+              .group_by(m.product_id).order_by(func.sum(m.cantidad).desc()).limit(limit).subquery())
+    return db.session.execute(
+        select(totals, Product.clave_producto, Product.tipo_producto)
+        .outerjoin(Product, Product.id == totals.c.product_id)
+        .order_by(totals.c.cantidad.desc())
+    ).all()
+
+
+def top_customers(desde, hasta, statuses=None, limit=20):
+    """Customers with the highest quoted amount"""
+    m = RollupCustomerMonth
+    totals = (select(m.customer_id, *_totals(m)).where(*_period(m, desde, hasta, statuses))
+              .group_by(m.customer_id).order_by(func.sum(m.importe).desc()).limit(limit).subquery())
+    return db.session.execute(
+        select(totals, Customer.nombre_empresa)
+        .outerjoin(Customer, Customer.customer_id == totals.c.customer_id)
+        .order_by(totals.c.importe.desc())
+    ).all()
+
+
+def by_tecnica(desde, hasta, statuses=None):
+    m = RollupTecnicaMonth
+    return db.session.execute(
+        select(m.tecnica, *_totals(m)).where(*_period(m, desde, hasta, statuses))
+        .group_by(m.tecnica).order_by(func.sum(m.importe).desc())
+    ).all()
+
+
+def by_month(desde, hasta, statuses=None):
+    """Totals per month; every quoted line has exactly one customer row"""
+    m = RollupCustomerMonth
+    return db.session.execute(
+        select(m.mes, *_totals(m)).where(*_period(m, desde, hasta, statuses)).group_by(m.mes).order_by(m.mes)
+    ).all()
+
+
+def last_months(count, today=None):
+    """(first month, last month) of the `count` months up to today's"""
+    hasta = month_start(today or date.today())
+    desde = hasta
+    for _ in range(count - 1):
+        desde = date(desde.year - (desde.month == 1), (desde.month - 2) % 12 + 1, 1)
+    return desde, hasta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['rebuild', 'report'])
+    parser.add_argument('--meses', type=int, default=3, help='report: months up to the current one')
+    parser.add_argument('--status', action='append', help='report: only these statuses (repeatable)')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        if args.command == 'rebuild':
+            rebuild(db.session.connection())
+            db.session.commit()
+            for model, _ in ROLLUPS.values():
+                print(f"✓ {model.__tablename__}: {db.session.query(func.count()).select_from(model).scalar()} rows")
+            return
+
+        desde, hasta = last_months(args.meses)
+        print(f"\n📊 {desde:%Y-%m} to {hasta:%Y-%m}" + (f" ({', '.join(args.status)})" if args.status else ''))
+        print(f"\n  {'Clave':<20} {'Unidades':>10} {'Líneas':>7} {'Precio prom.':>13} {'Importe':>14}")
+        for row in top_products(desde, hasta, args.status):
+            print(f"  {row.clave_producto or row.product_id:<20} {row.cantidad:>10} {row.lineas:>7} "
+                  f"{float(row.precio_promedio or 0):>13.2f} {float(row.importe or 0):>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,87 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
-from models import db, Product, ImpresionChoice, ColorsChoice, Customer, Quotation, QuotationDetail
-from forms import ProductForm, CustomerForm
+import logging
+import os
+
+import click
+from flask.cli import with_appcontext
+from flask import (Blueprint, Flask, Response, abort, current_app, render_template, request, redirect, url_for, flash,
+                   send_file, stream_with_context)
+from models import (db, Product, ImpresionChoice, ColorsChoice, Customer, CustomerPrice, ImportJob, Quotation,
+                    QuotationArchive, QuotationDetail, QuotationTemplate, PRICE_COLUMNS)
+from forms import ProductForm, CustomerForm, ImportForm
 from config import Config
-from datetime import datetime
+from db_pool import engine_options, install_liveness_check
+from migrations import upgrade
+from quotation_api import api, claim_version, QuotationClosed, VersionConflict
+import analytics
+import archive
+import assets
+import facets
+import fast_json
+import import_jobs
+import logs
+import price_checks
+import quotation_copy
+import readers
+import replicas
+import scheduler
+from replicas import read_replica
+import compression
+import customer_search
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 from io import BytesIO
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from flask import render_template, redirect, url_for, flash
-from sqlalchemy.orm import joinedload  # Import this at the top
+from sqlalchemy.orm import joinedload, selectinload  # Import this at the top
 
-app = Flask(__name__)
-app.config.from_object(Config)
+# reportlab is only imported inside the PDF routes: it is the slowest import
+# in the app and most processes (CLI scripts, workers serving HTML) never use it.
 
-db.init_app(app)
+main = Blueprint('main', __name__)
 
-with app.app_context():
+log = logging.getLogger(__name__)
+
+
+def create_app(config_class=Config):
+    """Application factory, used by wsgi.py and the CLI scripts"""
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+    logs.init_app(app)
+    db.init_app(app)
+    replicas.init_app(app, db)
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+    assets.init_app(app)
+    compression.init_app(app)
+    fast_json.init_app(app)
+
+    app.cli.add_command(init_db_command)
+
+    # Creating the engine does not open a connection, so this is free at startup
+    with app.app_context():
+        for engine in db.engines.values():
+            install_liveness_check(engine, app.config['DB_PING_IDLE_SECONDS'])
+            logs.count_queries(engine)
+
+    return app
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create missing tables (run once after install or upgrade)"""
     db.create_all()
+    print("✅ Tables created")
 
-    # Auto-initialize choices if tables are empty
-    if ImpresionChoice.query.count() == 0 or ColorsChoice.query.count() == 0:
-        print("\n⚠️  Choice tables are empty. Initializing with default values...")
-        print("Run 'python init_choices.py' to customize choices.\n")
+    for name in upgrade():
+        print(f"  ✓ Migration applied: {name}")
 
+    if ImpresionChoice.query.count() == 0 or ColorsChoice.query.count() == 0:
+        print("\n⚠️  Choice tables are empty.")
+        print("Run 'python init_choices.py' to load the default values.\n")
 
-# ... rest of your app.py code remains the same ...
 
-@app.context_processor
+@main.app_context_processor
 def inject_counts():
     """Available in ALL templates"""
     return dict(
@@ -39,36 +92,28 @@ def inject_counts():
 
 # ==================== ROUTES ====================
 
-@app.route('/')
-@app.route('/products')
+@main.route('/')
+@main.route('/products')
+@read_replica
 def index():
     """Display all products"""
     page = request.args.get('page', 1, type=int)
-    search = request.args.get('search', '', type=str)
+    search = facets.normalize_search(request.args.get('search', '', type=str))  # for the query and the facet cache
     available_filter = request.args.get('available', '', type=str)
 
-    query = Product.query
+    filters = facets.active_filters(request.args)
 
-    if search:
-        query = query.filter(
-            (Product.clave_producto.ilike(f'%{search}%')) |
-            (Product.tipo_producto.ilike(f'%{search}%')) |
-            (Product.descripcion.ilike(f'%{search}%'))
-        )
+    conditions = facets.base_conditions(search, available_filter) + facets.facet_conditions(filters)
+    products = readers.product_page(conditions, page, per_page=10)
 
-    if available_filter == 'yes':
-        query = query.filter(Product.available == True)
-    elif available_filter == 'no':
-        query = query.filter(Product.available == False)
+    list_args = dict(search=search, available=available_filter, **filters)
+    facet_groups = facets.sidebar(facets.facet_counts(search, available_filter, filters), filters, list_args)
 
-    products = query.order_by(Product.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    return render_template('index.html', products=products, search=search, available_filter=available_filter,
+                           filters=filters, list_args=list_args, facet_groups=facet_groups)
 
-    return render_template('index.html', products=products, search=search, available_filter=available_filter)
 
-
-@app.route('/product/create', methods=['GET', 'POST'])
+@main.route('/product/create', methods=['GET', 'POST'])
 def create_product():
     """Create new product"""
     form = ProductForm()
@@ -87,8 +132,8 @@ def create_product():
                 medidas=form.medidas.data,
                 material=form.material.data,
                 empaque=form.empaque.data,
-                impresion=form.impresion.data,
-                colores=form.colores.data,
+                impresion_id=form.impresion.data,
+                colores_id=form.colores.data,
                 precio_unitario=form.precio_unitario.data,
                 precio_mayorista=form.precio_mayorista.data,
                 precio_cliente=form.precio_cliente.data,
@@ -101,7 +146,7 @@ def create_product():
             db.session.commit()
 
             flash(f'Producto "{product.tipo_producto}" creado exitosamente.', 'success')
-            return redirect(url_for('view_product', id=product.id))
+            return redirect(url_for('main.view_product', id=product.id))
 
         except Exception as e:
             db.session.rollback()
@@ -110,14 +155,15 @@ def create_product():
     return render_template('create_product.html', form=form)
 
 
-@app.route('/product/<int:id>')
+@main.route('/product/<int:id>')
+@read_replica
 def view_product(id):
     """View product details"""
     product = Product.query.get_or_404(id)
     return render_template('view_product.html', product=product)
 
 
-@app.route('/product/<int:id>/edit', methods=['GET', 'POST'])
+@main.route('/product/<int:id>/edit', methods=['GET', 'POST'])
 def edit_product(id):
     """Edit product"""
     product = Product.query.get_or_404(id)
@@ -137,8 +183,8 @@ def edit_product(id):
             product.medidas = form.medidas.data
             product.material = form.material.data
             product.empaque = form.empaque.data
-            product.impresion = form.impresion.data
-            product.colores = form.colores.data
+            product.impresion_id = form.impresion.data
+            product.colores_id = form.colores.data
             product.precio_unitario = form.precio_unitario.data
             product.precio_mayorista = form.precio_mayorista.data
             product.precio_cliente = form.precio_cliente.data
@@ -148,7 +194,7 @@ def edit_product(id):
 
             db.session.commit()
             flash(f'Producto actualizado exitosamente.', 'success')
-            return redirect(url_for('view_product', id=product.id))
+            return redirect(url_for('main.view_product', id=product.id))
 
         except Exception as e:
             db.session.rollback()
@@ -161,8 +207,8 @@ def edit_product(id):
         form.medidas.data = product.medidas
         form.material.data = product.material
         form.empaque.data = product.empaque
-        form.impresion.data = product.impresion
-        form.colores.data = product.colores
+        form.impresion.data = product.impresion_id
+        form.colores.data = product.colores_id
         form.precio_unitario.data = product.precio_unitario
         form.precio_mayorista.data = product.precio_mayorista
         form.precio_cliente.data = product.precio_cliente
@@ -173,7 +219,7 @@ def edit_product(id):
     return render_template('edit_product.html', form=form, product=product)
 
 
-@app.route('/product/<int:id>/toggle-availability', methods=['POST'])
+@main.route('/product/<int:id>/toggle-availability', methods=['POST'])
 def toggle_availability(id):
     """Toggle product availability"""
     product = Product.query.get_or_404(id)
@@ -189,10 +235,10 @@ def toggle_availability(id):
         db.session.rollback()
         flash(f'Error: {str(e)}', 'danger')
 
-    return redirect(url_for('view_product', id=product.id))
+    return redirect(url_for('main.view_product', id=product.id))
 
 
-@app.route('/product/<int:id>/delete', methods=['POST'])
+@main.route('/product/<int:id>/delete', methods=['POST'])
 def delete_product(id):
     """Delete product"""
     product = Product.query.get_or_404(id)
@@ -206,12 +252,67 @@ def delete_product(id):
         db.session.rollback()
         flash(f'Error: {str(e)}', 'danger')
 
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
+
 
+@main.route('/import', methods=['GET', 'POST'])
+def import_catalog():
+    """Upload a catalog file; the import runs in the background (import_jobs.py)"""
+    form = ImportForm()
 
-@app.route('/product/<int:id>/print')
+    if form.validate_on_submit():
+        running = import_jobs.running_job()
+        if running is not None:
+            flash('Ya hay una importación en curso, espere a que termine.', 'warning')
+            return redirect(url_for('main.import_status', job_id=running.id))
+
+        job = import_jobs.start(form.archivo.data, form.modo.data)
+        if job is None:  # another upload claimed the slot since the check above
+            running = import_jobs.running_job()
+            flash('Ya hay una importación en curso, espere a que termine.', 'warning')
+            if running is None:
+                return redirect(url_for('main.import_catalog'))
+            return redirect(url_for('main.import_status', job_id=running.id))
+        return redirect(url_for('main.import_status', job_id=job.id))
+
+    jobs = ImportJob.query.order_by(ImportJob.id.desc()).limit(10).all()
+    return render_template('imports/upload.html', form=form, jobs=jobs, modes=ImportJob.MODES)
+
+
+@main.route('/import/<int:job_id>')
+def import_status(job_id):
+    job = ImportJob.query.get_or_404(job_id)
+    return render_template('imports/status.html', job=job, modes=ImportJob.MODES)
+
+
+@main.route('/import/<int:job_id>/events')
+def import_events(job_id):
+    """Server-Sent Events with the job's progress, see import_jobs.events()"""
+    ImportJob.query.get_or_404(job_id)
+    db.session.rollback()
+    return Response(stream_with_context(import_jobs.events(job_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@main.route('/catalog/price-checks')
+@read_replica
+def check_prices():
+    """Every product whose prices break a rule in price_checks.py"""
+    checked, elapsed, results = price_checks.check_table(limit=100)  # products listed per rule
+    return render_template('price_checks.html', checked=checked, elapsed=elapsed, results=results,
+                           columns=PRICE_COLUMNS, disabled=current_app.config['PRICE_CHECKS_DISABLED'])
+
+
+@main.route('/product/<int:id>/print')
+@read_replica
 def print_product(id):
     """Generate PDF for single product"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib import colors
+
     product = Product.query.get_or_404(id)
 
     pdf_buffer = BytesIO()
@@ -269,10 +370,18 @@ def print_product(id):
     )
 
 
-@app.route('/products/print-all')
+@main.route('/products/print-all')
+@read_replica
 def print_all_products():
     """Generate PDF of all available products"""
-    products = Product.query.filter_by(available=True).order_by(Product.clave_producto).all()
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib import colors
+
+    products = (Product.query.options(*Product.with_choices())
+                .filter_by(available=True).order_by(Product.clave_producto).all())
 
     pdf_buffer = BytesIO()
     doc = SimpleDocTemplate(pdf_buffer, pagesize=A4)
@@ -321,35 +430,24 @@ def print_all_products():
     )
 
 
-from sqlalchemy import or_  # Make sure to import or_
-
-
-@app.route('/customers')
+@main.route('/customers')
+@read_replica
 def customers():
     # 1. Get the search term from the URL
     search = request.args.get('search', '', type=str)
 
-    query = Customer.query
-
-    # 2. If a search term exists, filter the query
-    if search:
-        query = query.filter(
-            or_(
-                Customer.nombre_empresa.ilike(f'%{search}%'),
-                Customer.contacto_nombre.ilike(f'%{search}%'),
-                Customer.email.ilike(f'%{search}%'),
-                Customer.rfc.ilike(f'%{search}%')
-            )
-        )
-
-    # 3. Order results
-    customers = query.order_by(Customer.nombre_empresa).all()
+    # 2. With a search term, the best CUSTOMER_SEARCH_LIMIT matches from the
+    # trigram index (customer_search.py); without one, every customer by name
+    if search.strip():
+        customers = customer_search.search(search)
+    else:
+        customers = readers.customer_rows()
 
-    # 4. Pass 'customers' AND 'search' back to the template
+    # 3. Pass 'customers' AND 'search' back to the template
     return render_template('customers/index.html', customers=customers, search=search)
 
 
-@app.route('/customer/create', methods=['GET', 'POST'])
+@main.route('/customer/create', methods=['GET', 'POST'])
 def create_customer():
     form = CustomerForm()
 
@@ -360,18 +458,19 @@ def create_customer():
             email=form.email.data,
             telefono=form.telefono.data,
             rfc=form.rfc.data,
+            nivel_precio=form.nivel_precio.data,
         )
 
         db.session.add(customer)
         db.session.commit()
 
         flash('Cliente creado correctamente', 'success')
-        return redirect(url_for('customers'))
+        return redirect(url_for('main.customers'))
 
     return render_template('customers/create.html', form=form)
 
 
-@app.route('/customer/<int:customer_id>/edit', methods=['GET', 'POST'])
+@main.route('/customer/<int:customer_id>/edit', methods=['GET', 'POST'])
 def edit_customer(customer_id):
     customer = Customer.query.get_or_404(customer_id)
     form = CustomerForm(obj=customer)
@@ -382,47 +481,159 @@ def edit_customer(customer_id):
         customer.email = form.email.data
         customer.telefono = form.telefono.data
         customer.rfc = form.rfc.data
+        customer.nivel_precio = form.nivel_precio.data
 
         db.session.commit()
         flash('Cliente actualizado', 'success')
-        return redirect(url_for('customers'))
+        return redirect(url_for('main.customers'))
 
     return render_template('customers/edit.html', form=form, customer=customer)
 
 
-@app.route('/customer/<int:customer_id>')
+@main.route('/customer/<int:customer_id>')
+@read_replica
 def view_customer(customer_id):
     customer = Customer.query.get_or_404(customer_id)
-    return render_template('customers/view.html', customer=customer)
+    special_prices = (CustomerPrice.query.options(joinedload(CustomerPrice.product))
+                      .filter_by(customer_id=customer_id).all())
+    return render_template('customers/view.html', customer=customer, special_prices=special_prices,
+                           tiers=Customer.TIERS)
+
+
+@main.route('/customer/<int:customer_id>/prices', methods=['POST'])
+def save_customer_price(customer_id):
+    """Add or change the customer's special price for one product"""
+    Customer.query.get_or_404(customer_id)
+    clave = request.form.get('clave_producto', '').strip()
+    product = Product.query.filter_by(clave_producto=clave).first()
+    if product is None:
+        flash(f'Producto no encontrado: {clave}', 'danger')
+        return redirect(url_for('main.view_customer', customer_id=customer_id))
 
+    try:
+        precio = Decimal(request.form.get('precio', ''))
+    except InvalidOperation:
+        precio = None
+    if precio is None or not precio.is_finite() or precio < 0:
+        flash('Precio inválido', 'danger')
+        return redirect(url_for('main.view_customer', customer_id=customer_id))
 
-from flask import jsonify, request
-import json
+    special = db.session.get(CustomerPrice, (customer_id, product.id))
+    if special is None:
+        special = CustomerPrice(customer_id=customer_id, product_id=product.id)
+        db.session.add(special)
+    special.precio = precio
+    db.session.commit()
+
+    flash(f'Precio especial de {product.clave_producto} guardado', 'success')
+    return redirect(url_for('main.view_customer', customer_id=customer_id))
+
+
+@main.route('/customer/<int:customer_id>/prices/<int:product_id>/delete', methods=['POST'])
+def delete_customer_price(customer_id, product_id):
+    special = CustomerPrice.query.get_or_404((customer_id, product_id))
+    db.session.delete(special)
+    db.session.commit()
+
+    flash('Precio especial eliminado', 'success')
+    return redirect(url_for('main.view_customer', customer_id=customer_id))
+
+
+from flask import jsonify
 
 
 # --- QUOTATION ROUTES ---
 
-@app.route('/quotations')
+@main.route('/quotations')
+@read_replica
 def quotations():
+    page = request.args.get('page', 1, type=int)
+    filters = {
+        'status': request.args.get('status', '', type=str),
+        'customer_id': request.args.get('customer_id', '', type=str),
+        'desde': request.args.get('desde', '', type=str),
+        'hasta': request.args.get('hasta', '', type=str),
+        'vence': request.args.get('vence', '', type=str),
+        'archivadas': request.args.get('archivadas', '', type=str),
+    }
+
+    # Archived quotations (archive.py) are listed separately, with the same filters
+    model = QuotationArchive if filters['archivadas'] == '1' else Quotation
+
     # We use joinedload to ensure the Customer data is loaded with the Quotation
-    # This prevents errors if you try to access q.customer.nombre_empresa in HTML
-    quotes = Quotation.query.options(joinedload(Quotation.customer)) \
-        .order_by(Quotation.fecha.desc()).all()
+    # This prevents errors if you try to access q.customer.nombre_empresa in HTML.
+    # selectinload fetches the details of the whole page in one query for q.total
+    query = model.query.options(joinedload(model.customer), selectinload(model.details))
+
+    # Each filter matches one of the composite indexes on Quotation
+    if filters['status'] in Quotation.STATUSES:
+        query = query.filter(model.status == filters['status'])
+
+    if filters['customer_id'].isdigit():
+        query = query.filter(model.customer_id == int(filters['customer_id']))
+
+    desde = parse_date(filters['desde'])
+    if desde:
+        query = query.filter(model.fecha >= desde)
+
+    hasta = parse_date(filters['hasta'])
+    if hasta:
+        query = query.filter(model.fecha < hasta + timedelta(days=1))
 
-    # DEBUG: Print to your terminal/console
-    # print(f"DEBUG: Found {len(quotes)} quotations in database.")
-    # for q in quotes:
-    #     print(f" - ID: {q.quotation_id}, Customer ID: {q.customer_id}")
+    if filters['vence'] == 'semana' and model is Quotation:
+        query = query.filter(expiring_within(7))
+
+    quotes = query.order_by(model.fecha.desc()).paginate(
+        page=page, per_page=25, error_out=False
+    )
+
+    expiring_count = Quotation.query.filter(expiring_within(7)).count()
+    customer_options = db.session.query(Customer.customer_id, Customer.nombre_empresa) \
+        .order_by(Customer.nombre_empresa).all()
+
+    return render_template(
+        'quotations/index.html',
+        quotes=quotes,
+        filters=filters,
+        statuses=Quotation.STATUSES,
+        customer_options=customer_options,
+        expiring_count=expiring_count
+    )
 
-    return render_template('quotations/index.html', quotes=quotes)
 
-@app.route('/quotations/create', methods=['GET', 'POST'])
+def parse_date(value):
+    """Parse a YYYY-MM-DD query arg, None if empty or invalid"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def expiring_within(days):
+    """Open quotations whose vence_en falls in the next `days` days (index range scan)"""
+    now = datetime.utcnow()
+    return (
+        Quotation.status.in_(Quotation.OPEN_STATUSES)
+        & (Quotation.vence_en >= now)
+        & (Quotation.vence_en < now + timedelta(days=days))
+    )
+
+
+@main.route('/quotations/create', methods=['GET', 'POST'])
 def create_quotation():
     # --- POST: SAVE DATA ---
     if request.method == 'POST':
         try:
             data = request.get_json()
 
+            # Details link by product id; the builder sends claves
+            claves = {item['clave_producto'] for item in data['items']}
+            product_ids = dict(db.session.query(Product.clave_producto, Product.id)
+                               .filter(Product.clave_producto.in_(claves)))
+            missing = claves - product_ids.keys()
+            if missing:
+                return jsonify({'success': False, 'error': f"Producto no encontrado: {', '.join(sorted(missing))}"}), 400
+
             # 1. Create Header
             new_quote = Quotation(
                 customer_id=int(data['customer_id']),
@@ -439,6 +650,7 @@ def create_quotation():
             for item in data['items']:
                 detail = QuotationDetail(
                     quotation_id=new_quote.quotation_id,
+                    product_id=product_ids[item['clave_producto']],
                     clave_producto=item['clave_producto'],
                     cantidad=int(item['cantidad']),
                     precio_pactado=float(item['precio']),
@@ -450,7 +662,7 @@ def create_quotation():
                 db.session.add(detail)
 
             db.session.commit()
-            return jsonify({'success': True, 'redirect': url_for('view_quotation', q_id=new_quote.quotation_id)})
+            return jsonify({'success': True, 'redirect': url_for('main.view_quotation', q_id=new_quote.quotation_id)})
 
         except Exception as e:
             db.session.rollback()
@@ -458,31 +670,176 @@ def create_quotation():
 
     # --- GET: LOAD FORM DATA ---
 
-    # We rename these variables to avoid "shadowing" warnings
-    all_customers = Customer.query.order_by(Customer.nombre_empresa).all()
-    active_products = Product.query.filter_by(available=True).order_by(Product.tipo_producto).all()
+    # Customers are picked with the typeahead (api.search_customers), not listed here
+    active_products = readers.product_options()
 
-    # Debug print to check in your console if data is actually loading
-    print(f"Loaded {len(all_customers)} customers and {len(active_products)} products.")
+    log.debug("Quotation form: %d products", len(active_products))
 
     return render_template(
         'quotations/create.html',
-        customers=all_customers,  # Pass 'all_customers' as 'customers' to the template
         products=active_products  # Pass 'active_products' as 'products' to the template
     )
 
 
-@app.route('/quotations/<int:q_id>')
+@main.route('/quotations/<int:q_id>')
+@read_replica
 def view_quotation(q_id):
-    quote = Quotation.query.get_or_404(q_id)
+    quote = archive.find_quotation(q_id)  # falls back to the archive tables
+    if quote is None:
+        abort(404)
     return render_template('quotations/view.html', quote=quote)
 
 
+@main.route('/quotations/<int:q_id>/status', methods=['POST'])
+def change_quotation_status(q_id):
+    quote = Quotation.query.get_or_404(q_id)
+    new_status = request.form.get('status', '')
+
+    if not quote.can_change_to(new_status):
+        flash(f'No se puede cambiar de {quote.status} a {new_status}.', 'danger')
+        return redirect(url_for('main.view_quotation', q_id=q_id))
+
+    try:
+        # Same optimistic lock as the builder API: fails if someone else changed it
+        claim_version(q_id, quote.version)
+        quote.status = new_status
+        db.session.commit()
+        flash(f'Cotización marcada como {new_status}.', 'success')
+
+    except VersionConflict:
+        db.session.rollback()
+        flash('La cotización fue modificada por otro usuario. Intente de nuevo.', 'warning')
+    except QuotationClosed as closed:
+        db.session.rollback()
+        flash(f'La cotización ya está {closed.args[0]}.', 'warning')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error: {str(e)}', 'danger')
+
+    return redirect(url_for('main.view_quotation', q_id=q_id))
+
+
+@main.route('/quotations/<int:q_id>/edit')
+def edit_quotation(q_id):
+    # Lines are saved one by one through the JSON API in quotation_api.py
+    quote = Quotation.query.options(joinedload(Quotation.customer)).get_or_404(q_id)
+    if not quote.editable:
+        flash(f'La cotización está {quote.status} y ya no se puede editar. Use "Duplicar" para cotizar de nuevo.',
+              'warning')
+        return redirect(url_for('main.view_quotation', q_id=q_id))
+    active_products = readers.product_options()
+
+    return render_template('quotations/edit.html', quote=quote, products=active_products)
+
+
+@main.route('/quotations/<int:q_id>/duplicate', methods=['POST'])
+def duplicate_quotation(q_id):
+    """New Borrador copy of the quotation (live or archived), optionally at today's prices"""
+    try:
+        copied = quotation_copy.duplicate_quotation(q_id, reprice=bool(request.form.get('reprice')))
+    except Exception as e:
+        flash(f'Error al duplicar: {str(e)}', 'danger')
+        return redirect(url_for('main.view_quotation', q_id=q_id))
+    if copied is None:
+        abort(404)
+
+    new_id, lines = copied
+    flash(f'Cotización #{q_id} duplicada como #{new_id} ({lines} productos).', 'success')
+    return redirect(url_for('main.edit_quotation', q_id=new_id))
+
+
+@main.route('/quotations/<int:q_id>/template', methods=['POST'])
+def save_quotation_template(q_id):
+    nombre = request.form.get('nombre', '').strip() or f'Cotización #{q_id}'
+    try:
+        saved = quotation_copy.save_template(q_id, nombre[:100])
+    except Exception as e:
+        flash(f'Error al guardar la plantilla: {str(e)}', 'danger')
+        return redirect(url_for('main.view_quotation', q_id=q_id))
+    if saved is None:
+        abort(404)
+
+    flash(f'Plantilla "{nombre}" guardada ({saved[1]} productos).', 'success')
+    return redirect(url_for('main.quotation_templates'))
+
+
+@main.route('/quotations/templates')
+@read_replica
+def quotation_templates():
+    return render_template('quotations/templates.html', templates=quotation_copy.template_rows())
+
+
+@main.route('/quotations/templates/<int:template_id>/use', methods=['POST'])
+def use_quotation_template(template_id):
+    """New quotation for the chosen customer from the template, at the customer's prices unless told otherwise"""
+    customer_id = request.form.get('customer_id', type=int)
+    if customer_id is None or db.session.get(Customer, customer_id) is None:
+        flash('Seleccione un cliente para la nueva cotización.', 'warning')
+        return redirect(url_for('main.quotation_templates'))
+
+    try:
+        created = quotation_copy.quotation_from_template(template_id, customer_id,
+                                                         reprice=bool(request.form.get('reprice')))
+    except Exception as e:
+        flash(f'Error al crear la cotización: {str(e)}', 'danger')
+        return redirect(url_for('main.quotation_templates'))
+    if created is None:
+        abort(404)
+
+    new_id, lines = created
+    flash(f'Cotización #{new_id} creada desde la plantilla ({lines} productos).', 'success')
+    return redirect(url_for('main.edit_quotation', q_id=new_id))
+
+
+@main.route('/quotations/templates/<int:template_id>/delete', methods=['POST'])
+def delete_quotation_template(template_id):
+    template = QuotationTemplate.query.get_or_404(template_id)
+    db.session.delete(template)
+    db.session.commit()
+    flash(f'Plantilla "{template.nombre}" eliminada.', 'success')
+    return redirect(url_for('main.quotation_templates'))
+
+
+# --- REPORTS ---
+
+@main.route('/reports')
+@read_replica
+def reports():
+    # Reads only the rollup tables kept by analytics.py, never the quotation lines
+    default_desde, default_hasta = analytics.last_months(6)
+    desde = parse_month(request.args.get('desde', '', type=str)) or default_desde
+    hasta = parse_month(request.args.get('hasta', '', type=str)) or default_hasta
+    statuses = [s for s in request.args.getlist('status') if s in Quotation.STATUSES]
+
+    return render_template(
+        'reports/index.html',
+        desde=desde,
+        hasta=hasta,
+        selected_statuses=statuses,
+        statuses=Quotation.STATUSES,
+        months=analytics.by_month(desde, hasta, statuses),
+        products=analytics.top_products(desde, hasta, statuses),
+        customers=analytics.top_customers(desde, hasta, statuses),
+        tecnicas=analytics.by_tecnica(desde, hasta, statuses),
+    )
+
+
+def parse_month(value):
+    """Parse a YYYY-MM query arg to the first day of that month, None if empty or invalid"""
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        return None
+
+
 if __name__ == '__main__':
-    print("\n" + "=" * 60)
-    print("Flask Price List Application")
-    print("=" * 60)
-    print("\n🌐 Open: http://localhost:5000")
-    print("🛑 Press CTRL+C to stop\n")
+    app = create_app()
+    debug = os.getenv('FLASK_DEBUG', 'true').lower() in ('true', '1', 'yes')
+
+    log.info("Flask Price List Application on http://localhost:5000 (CTRL+C to stop)")
+
+    # The debug reloader runs this file twice; only the process that serves requests runs the jobs
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        scheduler.start(app)
 
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=debug, host='0.0.0.0', port=5000)
@@ -0,0 +1,189 @@
+"""
+Archival of old quotations
+
+quotations and quotation_details only grow. archive_quotations() moves
+quotations dated more than ARCHIVE_AFTER_DAYS ago, and Aceptada,
+Cancelada and Vencida ones dated more than ARCHIVE_CLOSED_AFTER_DAYS ago, to
+quotations_archive and quotation_details_archive. Each batch of
+ARCHIVE_BATCH quotations is one transaction: INSERT ... SELECT into the
+archive, then DELETE from the hot tables, so an interrupted run leaves
+every quotation in exactly one place.
+
+Archived quotations stay reachable: view_quotation falls back to the
+archive and the quotation list has an "Archivadas" view. They can't be
+edited.
+
+Run it from cron / Task Scheduler:
+    python archive.py              # archive what is due
+    python archive.py --dry-run    # only count
+    python archive.py --partition  # MySQL: partition quotations_archive by year
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select, text
+
+from models import db, Quotation, QuotationArchive, QuotationDetail, QuotationDetailArchive
+
+log = logging.getLogger(__name__)
+
+CLOSED_STATUSES = ('Aceptada', 'Cancelada', 'Vencida')
+
+QUOTATION_COLUMNS = [c.name for c in Quotation.__table__.columns]
+DETAIL_COLUMNS = [c.name for c in QuotationDetail.__table__.columns]
+
+
+def cutoffs(now=None):
+    """{status: quotations of that status dated before this are due}"""
+    now = now or datetime.utcnow()
+    config = current_app.config
+    after = timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+    closed_after = min(after, timedelta(days=config['ARCHIVE_CLOSED_AFTER_DAYS']))
+    return {status: now - (closed_after if status in CLOSED_STATUSES else after) for status in Quotation.STATUSES}
+
+
+def _due_ids(status, before, below_id, limit):
+    # status = ? AND fecha < ? is a range scan of ix_quotations_status_fecha
+    return db.session.execute(
+        select(Quotation.quotation_id)
+        .where(Quotation.status == status, Quotation.fecha < before, Quotation.quotation_id < below_id)
+        .order_by(Quotation.fecha)
+        .limit(limit)
+    ).scalars().all()
+
+
+def count_due():
+    """{status: quotations that archive_quotations() would move}"""
+    max_id = db.session.query(func.max(Quotation.quotation_id)).scalar() or 0
+    return {
+        status: db.session.query(func.count(Quotation.quotation_id))
+        .filter(Quotation.status == status, Quotation.fecha < before, Quotation.quotation_id < max_id).scalar()
+        for status, before in cutoffs().items()
+    }
+
+
+def archive_batch(ids, now):
+    """Move these quotations and their lines to the archive tables, in one transaction"""
+    quotations, details = Quotation.__table__, QuotationDetail.__table__
+    try:
+        db.session.execute(insert(QuotationArchive.__table__).from_select(
+            QUOTATION_COLUMNS + ['archivado_en'],
+            select(*[quotations.c[c] for c in QUOTATION_COLUMNS], literal(now))
+            .where(quotations.c.quotation_id.in_(ids))
+        ))
+        db.session.execute(insert(QuotationDetailArchive.__table__).from_select(
+            DETAIL_COLUMNS,
+            select(*[details.c[c] for c in DETAIL_COLUMNS]).where(details.c.quotation_id.in_(ids))
+        ))
+        moved_details = db.session.execute(delete(details).where(details.c.quotation_id.in_(ids))).rowcount
+        moved = db.session.execute(delete(quotations).where(quotations.c.quotation_id.in_(ids))).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return moved, moved_details
+
+
+def archive_quotations(batch_size=None):
+    """Archive every quotation that is due; returns the row counts moved"""
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH']
+    now = datetime.utcnow()
+
+    # The newest quotation is never archived: SQLite (and MySQL before 8.0, on
+    # restart) derive the next id from MAX(quotation_id), and a reused id would
+    # clash with the archived one.
+    max_id = db.session.query(func.max(Quotation.quotation_id)).scalar() or 0
+
+    counts = {'quotations': 0, 'details': 0}
+    for status, before in cutoffs(now).items():
+        while True:
+            ids = _due_ids(status, before, max_id, batch_size)
+            if not ids:
+                break
+            moved, moved_details = archive_batch(ids, now)
+            counts['quotations'] += moved
+            counts['details'] += moved_details
+            log.debug('%s: %d quotations archived so far', status, counts['quotations'],
+                      extra={'status': status, 'quotations': counts['quotations'], 'details': counts['details']})
+    return counts
+
+
+def find_quotation(q_id):
+    """The quotation from the hot table, else from the archive, with lines and products loaded"""
+    for model, detail in ((Quotation, QuotationDetail), (QuotationArchive, QuotationDetailArchive)):
+        quote = (model.query
+                 .options(db.selectinload(model.details).joinedload(detail.product))
+                 .filter_by(quotation_id=q_id).first())
+        if quote is not None:
+            return quote
+    return None
+
+
+def partition_archive():
+    """
+    MySQL only: RANGE partitions on YEAR(fecha) for quotations_archive
+
+    Queries by date only read the matching years, and a whole year can be
+    dropped with ALTER TABLE ... DROP PARTITION. MySQL requires the
+    partitioning column in the primary key, so the key becomes
+    (quotation_id, fecha). The hot tables can't be partitioned: InnoDB
+    doesn't partition tables that have or are referenced by foreign keys.
+    Returns False if there was nothing to do.
+    """
+    conn = db.session.connection()
+    if conn.dialect.name != 'mysql':
+        print("⚠️  Partitioning needs MySQL, nothing done")
+        return False
+
+    partitions = conn.execute(text(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = 'quotations_archive' AND PARTITION_NAME IS NOT NULL"
+    )).scalar()
+    if partitions:
+        print("✓ quotations_archive is already partitioned")
+        return False
+
+    this_year = datetime.utcnow().year
+    first_year = conn.execute(text('SELECT MIN(YEAR(fecha)) FROM quotations_archive')).scalar() or this_year
+    ranges = ', '.join(f'PARTITION p{year} VALUES LESS THAN ({year + 1})'
+                       for year in range(first_year, this_year + 2))
+
+    conn.execute(text('UPDATE quotations_archive SET fecha = archivado_en WHERE fecha IS NULL'))
+    conn.execute(text('ALTER TABLE quotations_archive MODIFY fecha DATETIME NOT NULL, '
+                      'DROP PRIMARY KEY, ADD PRIMARY KEY (quotation_id, fecha)'))
+    conn.execute(text(f'ALTER TABLE quotations_archive PARTITION BY RANGE (YEAR(fecha)) '
+                      f'({ranges}, PARTITION pmax VALUES LESS THAN MAXVALUE)'))
+    db.session.commit()
+    print(f"✓ quotations_archive partitioned by year, {first_year} to {this_year + 1}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help='only count the quotations that are due')
+    parser.add_argument('--partition', action='store_true', help='MySQL: partition quotations_archive by year')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        if args.partition:
+            partition_archive()
+            return
+
+        due = count_due()
+        for status, count in due.items():
+            print(f"  {status:<10} {count:>8} due")
+        if args.dry_run:
+            return
+
+        print("\n🔄 Archiving...")
+        counts = archive_quotations()
+        print(f"\n✅ Archived {counts['quotations']} quotations ({counts['details']} lines)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Self-hosted CSS/JS bundles
+
+build_assets.py turns the files listed in BUNDLES into purged,
+content-hashed bundles in static/dist/ (plus .gz / .br copies) and a
+manifest.json. This module serves them with far-future cache headers and
+picks the precompressed variant the browser accepts. Without a build
+(fresh checkout, development) asset_urls() falls back to the plain vendored
+files, so pages are styled either way and never depend on a CDN.
+"""
+
+import json
+import mimetypes
+import os
+
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+
+# Bundle name -> source files under static/, in load order
+BUNDLES = {
+    'app.css': [
+        'vendor/bootstrap-5.3.0/css/bootstrap.min.css',
+        'vendor/fontawesome-6.4.0/css/fontawesome.min.css',
+        'vendor/fontawesome-6.4.0/css/solid.min.css',
+        'css/style.css',
+    ],
+    'app.js': [
+        'vendor/bootstrap-5.3.0/js/popper.min.js',
+        'vendor/bootstrap-5.3.0/js/bootstrap.min.js',
+    ],
+}
+
+# Hashed names never change content, so browsers may keep them forever
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Precompressed variants, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/ttf', '.ttf')
+
+assets = Blueprint('assets', __name__)
+
+
+def load_manifest():
+    """Logical name -> hashed file name, empty if build_assets.py hasn't run"""
+    try:
+        with open(MANIFEST, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_app(app):
+    app.extensions['asset_manifest'] = load_manifest()
+    app.register_blueprint(assets)
+    app.jinja_env.globals['asset_urls'] = asset_urls
+
+
+def asset_urls(bundle):
+    """URLs to include for a bundle: the built file, or its sources as a fallback"""
+    hashed = current_app.extensions['asset_manifest'].get(bundle)
+    if hashed:
+        return [url_for('assets.asset', filename=hashed)]
+    return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+
+@assets.route('/assets/<path:filename>')
+def asset(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = None
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+            response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+
+    if response is None:
+        response = send_from_directory(DIST_DIR, filename, mimetype=mimetype)
+
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,112 @@
+"""
+ORM objects vs column projection (readers.py) for the big read paths
+
+For a seeded catalog, loads the same data both ways and reports median
+latency and peak Python memory (tracemalloc):
+  * product_options: every available product, as the quotation builder does
+  * customers:       the full customer list
+  * product_json:    every product serialized, Product.to_dict() + json
+                     vs projected rows + orjson
+
+Usage (from the project root):
+    python benchmarks/read_path.py --size 10000
+    python benchmarks/read_path.py --size 100000 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import select  # noqa: E402
+
+import fast_json  # noqa: E402
+import readers  # noqa: E402
+from migrations import upgrade  # noqa: E402
+from models import db, Product, Customer, ImpresionChoice, ColorsChoice  # noqa: E402
+from run import DATA_DIR, make_app  # noqa: E402
+import seed  # noqa: E402
+
+
+def measure(fn, repeat):
+    """(median ms, peak KB) of fn(); memory is measured on a separate run"""
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak / 1024
+
+
+def orm_product_json():
+    products = Product.query.options(*Product.with_choices()).all()
+    return json.dumps([p.to_dict() for p in products])
+
+
+def projected_product_json():
+    rows = db.session.execute(
+        select(Product.id, Product.clave_producto, Product.tipo_producto, Product.descripcion,
+               Product.medidas, Product.material, Product.empaque, Product.impresion_id,
+               ImpresionChoice.nombre.label('impresion'), Product.colores_id,
+               ColorsChoice.nombre.label('colores'), Product.precio_unitario, Product.precio_mayorista,
+               Product.precio_cliente, Product.precio_promocion, Product.precio_cliente_mayorista,
+               Product.available)
+        .outerjoin(ImpresionChoice, ImpresionChoice.id == Product.impresion_id)
+        .outerjoin(ColorsChoice, ColorsChoice.id == Product.colores_id)
+    ).all()
+    dumps = fast_json.orjson.dumps if fast_json.orjson else json.dumps
+    return dumps([row._asdict() for row in rows], default=float)
+
+
+CASES = {
+    'product_options': (
+        lambda: Product.query.filter_by(available=True).order_by(Product.tipo_producto).all(),
+        readers.product_options,
+    ),
+    'customers': (
+        lambda: Customer.query.order_by(Customer.nombre_empresa).all(),
+        readers.customer_rows,
+    ),
+    'product_json': (orm_product_json, projected_product_json),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'read_path_{args.size}.db')
+    if os.path.exists(path):
+        os.remove(path)
+
+    app = make_app(f'sqlite:///{path}')
+    with app.app_context():
+        db.create_all()
+        upgrade()
+        print(f"📦 Seeded {seed.seed(args.size)}")
+
+        print(f"\n  {'case':<18} {'ORM ms':>9} {'rows ms':>9} {'ORM KB':>10} {'rows KB':>10}")
+        for name, (orm, projected) in CASES.items():
+            orm_ms, orm_kb = measure(orm, args.repeat)
+            rows_ms, rows_kb = measure(projected, args.repeat)
+            print(f"  {name:<18} {orm_ms:>9.1f} {rows_ms:>9.1f} {orm_kb:>10.0f} {rows_kb:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Benchmark the hot routes and the CSV importer
+
+For every catalog size a fresh database is seeded (see seed.py), then
+each route is requested through the Flask test client and timed, with
+the number of SQL statements it ran. Finally CSVImporter loads a
+synthetic CSV and its throughput is measured. Results are written as
+JSON so two runs (e.g. before and after a change) can be compared.
+
+Usage (from the project root):
+    python benchmarks/run.py                              # 1k and 10k, SQLite
+    python benchmarks/run.py --sizes 1000 10000 100000 --output after.json
+    python benchmarks/run.py --accept-encoding gzip          # measure compressed pages
+    python benchmarks/run.py --log-level INFO                # with the request log (default WARNING)
+    python benchmarks/run.py --compare before.json after.json
+
+--database-url may point at a throwaway MySQL database instead of the
+default SQLite files; use {size} in it to get one database per size.
+All tables in that database are DROPPED.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from import_csv import CSVImporter  # noqa: E402
+from migrations import upgrade  # noqa: E402
+from models import db  # noqa: E402
+import seed  # noqa: E402
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', '.data')
+
+# name -> (url, max repetitions); the PDF is capped because it is slow on big catalogs
+ROUTES = {
+    'index': ('/', None),
+    'index_search': ('/?search=aluminio', None),
+    'quotations': ('/quotations', None),
+    'create_quotation_get': ('/quotations/create', None),
+    'print_all_products': ('/products/print-all', 3),
+}
+
+IMPORT_ROWS = 5000
+
+DEFAULT_LOG_LEVEL = 'WARNING'  # no per-request log lines
+
+
+class QueryCounter:
+    """Counts statements sent to the database while active"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def make_app(database_url, log_level):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        # Fixed, whatever LOG_LEVEL / LOG_LEVELS say: a request log line per hit would be timed too
+        LOG_LEVEL = log_level
+        LOG_LEVELS = {'request': log_level}
+
+    return create_app(BenchConfig)
+
+
+def time_route(client, counter, url, repeat, headers):
+    timings, queries = [], []
+    client.get(url, headers=headers)  # warm up caches and the connection pool
+
+    for _ in range(repeat):
+        counter.count = 0
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'queries': max(queries),
+        'bytes': len(response.data),
+        'runs': repeat,
+    }
+
+
+def time_import(app, rows):
+    """Rows per second of CSVImporter.import_from_csv on a synthetic CSV"""
+    products = seed.product_rows(rows, random.Random(7), prefix='IMP')
+    columns = ['clave_producto', 'nombre_producto', 'descripcion', 'medidas', 'material', 'empaque',
+               'impresion', 'colores', 'precio_unitario', 'precio_mayorista', 'precio_cliente',
+               'precio_promocion', 'precio_cliente_mayorista', 'available']
+
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for p in products:
+            writer.writerow([p['clave_producto'], p['tipo_producto'], p['descripcion'], p['medidas'],
+                             p['material'], p['empaque'], p['impresion'], p['colores'],
+                             f"${p['precio_unitario']:.2f}", p['precio_mayorista'], p['precio_cliente'],
+                             p['precio_promocion'] or '', p['precio_cliente_mayorista'],
+                             'si' if p['available'] else 'no'])
+        path = f.name
+
+    try:
+        importer = CSVImporter(app, verbose=False)  # as the web upload runs it, without the console summary
+        start = time.perf_counter()
+        ok = importer.import_from_csv(path)
+        seconds = time.perf_counter() - start
+    finally:
+        os.remove(path)
+
+    return {
+        'ok': ok,
+        'rows': rows,
+        'imported': importer.imported,
+        'errors': importer.errors,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(rows / seconds, 1),
+    }
+
+
+def run_size(size, database_url, repeat, accept_encoding='', log_level=DEFAULT_LOG_LEVEL):
+    if database_url is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        path = os.path.join(DATA_DIR, f'bench_{size}.db')
+        if os.path.exists(path):
+            os.remove(path)
+        database_url = f'sqlite:///{path}'
+    else:
+        database_url = database_url.format(size=size)
+        if database_url == Config.SQLALCHEMY_DATABASE_URI:
+            raise SystemExit('Refusing to drop the tables of the configured application database')
+
+    app = make_app(database_url, log_level)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        upgrade()  # same schema as `flask init-db` (catalog_version row, ...)
+
+        start = time.perf_counter()
+        counts = seed.seed(size)
+        seed_seconds = time.perf_counter() - start
+        print(f"\n📦 {size} products seeded in {seed_seconds:.1f}s {counts}")
+
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    headers = {'Accept-Encoding': accept_encoding}
+    routes = {}
+    for name, (url, cap) in ROUTES.items():
+        routes[name] = time_route(client, counter, url, min(repeat, cap or repeat), headers)
+        r = routes[name]
+        print(f"  {name:<22} {r['median_ms']:>9.1f} ms  p95 {r['p95_ms']:>9.1f} ms  {r['queries']:>4} queries"
+              f"  {r['bytes'] / 1024:>8.1f} KB")
+
+    importer = time_import(app, IMPORT_ROWS)
+    print(f"  {'import_from_csv':<22} {importer['rows_per_sec']:>9.1f} rows/s ({importer['imported']} rows)")
+
+    return {'seed': counts, 'routes': routes, 'import': importer}
+
+
+def metadata(database_url, accept_encoding, log_level):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    import sqlalchemy
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'platform': platform.platform(),
+        'database': 'sqlite' if database_url is None else database_url.split(':', 1)[0],
+        'accept_encoding': accept_encoding,
+        'log_level': log_level,
+    }
+
+
+def compare(before_path, after_path):
+    """Print the median latency and query count change for every route"""
+    with open(before_path, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)
+
+    levels = [run.get('meta', {}).get('log_level') for run in (before, after)]
+    if levels[0] != levels[1]:
+        print(f"⚠️  Measured with different log levels ({levels[0]} / {levels[1]}), timings are not comparable")
+    before, after = before['results'], after['results']
+
+    for size in sorted(set(before) & set(after), key=int):
+        print(f"\n📊 {size} products")
+        for name, new in after[size]['routes'].items():
+            old = before[size]['routes'].get(name)
+            if not old:
+                continue
+            change = (new['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0
+            print(f"  {name:<22} {old['median_ms']:>9.1f} -> {new['median_ms']:>9.1f} ms ({change:+.0f}%)"
+                  f"  queries {old['queries']} -> {new['queries']}")
+        old_rate = before[size]['import']['rows_per_sec']
+        new_rate = after[size]['import']['rows_per_sec']
+        print(f"  {'import_from_csv':<22} {old_rate:>9.1f} -> {new_rate:>9.1f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--accept-encoding', default='', help="e.g. 'gzip' or 'br' to measure compressed pages")
+    parser.add_argument('--log-level', default=DEFAULT_LOG_LEVEL, type=str.upper,
+                        help=f'application log level while measuring (default: {DEFAULT_LOG_LEVEL})')
+    parser.add_argument('--output', default=None, help='JSON results file (default: benchmarks/.data/results-<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = {str(size): run_size(size, args.database_url, args.repeat, args.accept_encoding, args.log_level)
+               for size in args.sizes}
+
+    output = args.output or os.path.join(DATA_DIR, f"results-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'meta': metadata(args.database_url, args.accept_encoding, args.log_level), 'results': results}, f, indent=2)
+    print(f"\n💾 Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
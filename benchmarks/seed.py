@@ -0,0 +1,125 @@
+"""
+Synthetic data for the benchmarks
+
+Builds a catalog of `size` products plus proportional customers
+(size / 10) and quotations (size / 5, 1-8 lines each). Everything is
+generated from a fixed random seed so runs are comparable, and written
+with bulk INSERTs so seeding 100k products takes seconds.
+"""
+
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from models import db, Product, ProductTierPrice, ImpresionChoice, ColorsChoice, Customer, Quotation, QuotationDetail
+
+TIPOS = ['Placa En Aluminio Impreso', 'Taza', 'Pluma', 'Termo', 'Llavero', 'Gorra', 'Playera', 'Libreta']
+MATERIALES = ['Aluminio', 'Cerámica', 'Plástico', 'Acero', 'Algodón', 'Madera', 'Vidrio']
+IMPRESIONES = ['Serigrafia', 'Grabado laser', 'Tampografia', 'Sublimacion', 'Bordado']
+COLORES = ['Plateado', 'Dorado', 'Negro', 'Blanco', 'Rojo', 'Azul']
+ADJETIVOS = ['impreso', 'grabado', 'ejecutivo', 'premium', 'económico', 'clásico', 'deportivo']
+
+CHUNK = 5000
+
+
+def _bulk_insert(model, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(insert(model), rows[start:start + CHUNK])
+
+
+def product_rows(size, rng, prefix='BM'):
+    now = datetime.utcnow()
+    rows = []
+    for i in range(size):
+        tipo = rng.choice(TIPOS)
+        material = rng.choice(MATERIALES)
+        alto, ancho = rng.randint(5, 40), rng.randint(5, 40)
+        precio = Decimal(rng.randint(1000, 90000)) / 100
+        rows.append({
+            'clave_producto': f'{prefix}{i:06d}',
+            'tipo_producto': tipo,
+            'descripcion': f'{tipo} {rng.choice(ADJETIVOS)} de {material.lower()} {alto} X {ancho} CM',
+            'medidas': f'{alto}x{ancho} cm',
+            'material': material,
+            'empaque': rng.choice([1, 10, 25, 50, 100]),
+            'impresion': rng.choice(IMPRESIONES),
+            'colores': rng.choice(COLORES),
+            'precio_unitario': precio,
+            'precio_mayorista': precio * Decimal('0.9'),
+            'precio_cliente': precio * Decimal('1.2'),
+            'precio_promocion': precio * Decimal('1.1') if rng.random() < 0.3 else None,
+            'precio_cliente_mayorista': precio * Decimal('1.05'),
+            'available': rng.random() < 0.9,
+            'created_at': now - timedelta(minutes=size - i),
+            'updated_at': now,
+        })
+    return rows
+
+
+def seed(size, seed_value=42):
+    """Fill an empty schema; returns the row counts written"""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+
+    _bulk_insert(ImpresionChoice, [{'id': i, 'nombre': n, 'orden': i} for i, n in enumerate(IMPRESIONES, 1)])
+    _bulk_insert(ColorsChoice, [{'id': i, 'nombre': n, 'orden': i} for i, n in enumerate(COLORES, 1)])
+
+    products = product_rows(size, rng)
+    for product_id, product in enumerate(products, 1):
+        product['id'] = product_id
+    _bulk_insert(Product, [{
+        **{k: v for k, v in p.items() if k not in ('impresion', 'colores')},
+        'impresion_id': IMPRESIONES.index(p['impresion']) + 1,
+        'colores_id': COLORES.index(p['colores']) + 1,
+    } for p in products])
+    ProductTierPrice.rebuild(db.session.connection())
+
+    n_customers = max(10, size // 10)
+    _bulk_insert(Customer, [{
+        'nombre_empresa': f'Empresa {i} S.A. de C.V.',
+        'contacto_nombre': f'Contacto {i}',
+        'email': f'contacto{i}@empresa{i}.mx',
+        'telefono': f'55{i:08d}',
+        'rfc': f'EMP{i:06d}XX0',
+    } for i in range(n_customers)])
+
+    n_quotations = max(10, size // 5)
+    quotations, details = [], []
+    for q_id in range(1, n_quotations + 1):
+        fecha = now - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1440))
+        vigencia = rng.choice([7, 15, 30])
+        quotations.append({
+            'quotation_id': q_id,
+            'customer_id': rng.randint(1, n_customers),
+            'fecha': fecha,
+            'vigencia_dias': vigencia,
+            'vence_en': fecha + timedelta(days=vigencia),
+            'status': rng.choice(Quotation.STATUSES),
+            'tiempo_entrega_dias': 5,
+            'anticipo_requerido_porcentaje': Decimal('50.00'),
+            'version': 1,
+        })
+        for product in rng.sample(products, rng.randint(1, 8)):
+            details.append({
+                'quotation_id': q_id,
+                'product_id': product['id'],
+                'clave_producto': product['clave_producto'],
+                'cantidad': rng.randint(1, 500),
+                'precio_pactado': product['precio_unitario'],
+                'costo_personalizacion': Decimal(rng.randint(0, 2000)) / 100,
+                'tecnica_personalizacion': product['impresion'],
+            })
+
+    _bulk_insert(Quotation, quotations)
+    _bulk_insert(QuotationDetail, details)
+    db.session.commit()
+
+    return {
+        'choices': len(IMPRESIONES) + len(COLORES),
+        'products': len(products),
+        'customers': n_customers,
+        'quotations': n_quotations,
+        'quotation_details': len(details),
+    }
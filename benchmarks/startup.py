@@ -0,0 +1,49 @@
+"""
+CLI cold-start benchmark
+
+Times a fresh interpreter importing each command-line module, which is
+what every `python import_csv.py ...` / `python manage_choices.py` run
+pays before doing any work.
+
+Usage (from the project root):
+    python benchmarks/startup.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importing wsgi starts the scheduler thread (scheduler.py); time create_app() alone
+ENV = dict(os.environ, SCHEDULER_ENABLED='false')
+
+MODULES = ['app', 'wsgi', 'import_csv', 'manage_choices', 'init_choices', 'setup_choices']
+
+
+def time_import(module, runs):
+    """Median wall time in ms of `python -c 'import module'`"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import {module}'], cwd=ROOT, env=ENV, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    baseline = time_import('sys', runs)
+    print(f"{'module':<16} {'median ms':>10}")
+    print(f"{'(python -c)':<16} {baseline:>10.1f}")
+
+    for module in MODULES:
+        print(f"{module:<16} {time_import(module, runs):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Build the self-hosted CSS/JS bundles into static/dist/
+
+    python build_assets.py
+
+For every bundle in assets.BUNDLES:
+  * Bootstrap and Font Awesome rules whose classes appear in no template
+    are dropped (PurgeCSS-style: any word in templates/ counts as used)
+  * the sources are concatenated and written as <name>.<hash>.<ext>
+  * .gz and, if the Brotli package is installed, .br copies are written
+    next to it, so the server never compresses them at request time
+static/dist/manifest.json maps the logical names to the hashed files.
+
+The third-party files live in static/vendor/ (Bootstrap 5.3.0, Font
+Awesome Free 6.4.0 solid style), so building works offline.
+"""
+
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from assets import BUNDLES, DIST_DIR, MANIFEST, STATIC_DIR
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always built
+    brotli = None
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Only these sources are purged; our own CSS is kept as written
+PURGE = {
+    'vendor/bootstrap-5.3.0/css/bootstrap.min.css',
+    'vendor/fontawesome-6.4.0/css/fontawesome.min.css',
+}
+
+# Fonts referenced from the CSS as url(../webfonts/<name>)
+FONTS = [
+    'vendor/fontawesome-6.4.0/webfonts/fa-solid-900.woff2',
+    'vendor/fontawesome-6.4.0/webfonts/fa-solid-900.ttf',
+]
+
+# Classes added by Bootstrap's JavaScript or built in Jinja/JS at runtime
+SAFELIST = {
+    'show', 'showing', 'hiding', 'fade', 'collapse', 'collapsing', 'active', 'disabled',
+    'dropdown-menu-end', 'dropdown-menu-start', 'was-validated', 'is-valid', 'is-invalid',
+}
+SAFELIST_PREFIXES = ('alert-',)  # flash messages: alert-{{ category }}
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.json')
+
+WORD = re.compile(r'[A-Za-z0-9_-]+')
+CLASS = re.compile(r'\.(-?[_a-zA-Z][_a-zA-Z0-9-]*)')
+NOT_PSEUDO = re.compile(r':not\([^()]*\)')
+SOURCE_MAP = re.compile(r'/\*# sourceMappingURL=[^*]*\*/|//# sourceMappingURL=\S*')
+
+
+# ==================== PURGE ====================
+
+def used_words():
+    """Every word-like token in the templates"""
+    words = set(SAFELIST)
+    for path in glob.glob(os.path.join(TEMPLATES_DIR, '**', '*.html'), recursive=True):
+        with open(path, encoding='utf-8') as f:
+            words.update(WORD.findall(f.read()))
+    return words
+
+
+def _skip_string(css, i):
+    quote = css[i]
+    i += 1
+    while i < len(css) and css[i] != quote:
+        i += 2 if css[i] == '\\' else 1
+    return i + 1
+
+
+def _find(css, i, targets):
+    """Index of the first char in targets at nesting depth 0, skipping strings and comments"""
+    depth = 0
+    while i < len(css):
+        c = css[i]
+        if c in '"\'':
+            i = _skip_string(css, i)
+            continue
+        if css.startswith('/*', i):
+            i = css.find('*/', i + 2) + 2
+            continue
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth -= 1
+        elif depth == 0 and c in targets:
+            return i
+        i += 1
+    return len(css)
+
+
+def _matching_brace(css, i):
+    """Index of the '}' closing the '{' at i"""
+    depth = 0
+    while i < len(css):
+        c = css[i]
+        if c in '"\'':
+            i = _skip_string(css, i)
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(css)
+
+
+def split_selectors(prelude):
+    selectors, start = [], 0
+    while True:
+        comma = _find(prelude, start, ',')
+        selectors.append(prelude[start:comma].strip())
+        if comma >= len(prelude):
+            return selectors
+        start = comma + 1
+
+
+def selector_used(selector, words):
+    classes = CLASS.findall(NOT_PSEUDO.sub('', selector))
+    return all(c in words or c.startswith(SAFELIST_PREFIXES) for c in classes)
+
+
+def purge_css(css, words):
+    """Drop style rules whose selectors reference classes nobody uses"""
+    out, i = [], 0
+    while i < len(css):
+        if css[i].isspace():
+            i += 1
+            continue
+
+        if css.startswith('/*', i):
+            end = css.find('*/', i + 2) + 2
+            if css.startswith('/*!', i):  # license header
+                out.append(css[i:end])
+            i = end
+            continue
+
+        stop = _find(css, i, '{;')
+        if stop >= len(css) or css[stop] == ';':  # @charset, @import ...
+            out.append(css[i:stop + 1])
+            i = stop + 1
+            continue
+
+        end = _matching_brace(css, stop)
+        prelude, body = css[i:stop].strip(), css[stop + 1:end]
+        i = end + 1
+
+        if prelude.startswith('@'):
+            if prelude.startswith(('@media', '@supports', '@layer', '@container')):
+                inner = purge_css(body, words)
+                if inner:
+                    out.append(f'{prelude}{{{inner}}}')
+            else:  # @font-face, @keyframes, @page
+                out.append(f'{prelude}{{{body}}}')
+            continue
+
+        kept = [s for s in split_selectors(prelude) if selector_used(s, words)]
+        if kept:
+            out.append(f"{','.join(kept)}{{{body}}}")
+
+    return ''.join(out)
+
+
+# ==================== BUILD ====================
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def write_hashed(name, data):
+    """Write data as <stem>.<hash><ext> plus compressed copies; returns the file name"""
+    stem, ext = os.path.splitext(name)
+    hashed = f'{stem}.{content_hash(data)}{ext}'
+    path = os.path.join(DIST_DIR, hashed)
+
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    if ext in COMPRESSIBLE:
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+
+    size = f"{len(data) / 1024:.1f} KB"
+    print(f"  ✓ {hashed:<40} {size:>10}")
+    return hashed
+
+
+def read_static(source):
+    with open(os.path.join(STATIC_DIR, source), encoding='utf-8') as f:
+        return SOURCE_MAP.sub('', f.read())
+
+
+def build():
+    print("=" * 70)
+    print("BUILD STATIC ASSETS")
+    print("=" * 70)
+
+    os.makedirs(DIST_DIR, exist_ok=True)
+    old_files = set(os.listdir(DIST_DIR))
+    manifest = {}
+    words = used_words()
+
+    print("\n🔤 Fonts")
+    for source in FONTS:
+        with open(os.path.join(STATIC_DIR, source), 'rb') as f:
+            manifest[os.path.basename(source)] = write_hashed(os.path.basename(source), f.read())
+
+    for bundle, sources in BUNDLES.items():
+        print(f"\n📦 {bundle}")
+        parts = []
+        for source in sources:
+            text = read_static(source)
+            if source in PURGE:
+                before = len(text)
+                text = purge_css(text, words)
+                print(f"  ✂ {os.path.basename(source)}: {before / 1024:.0f} KB -> {len(text) / 1024:.0f} KB")
+            parts.append(text)
+
+        data = (';\n' if bundle.endswith('.js') else '\n').join(parts)
+        if bundle.endswith('.css'):
+            # Everything is flat in dist/, point the font URLs at the hashed copies
+            data = re.sub(r'url\(\.\./webfonts/([^)]+)\)', lambda m: f'url({manifest[m.group(1)]})', data)
+
+        manifest[bundle] = write_hashed(bundle, data.encode('utf-8'))
+
+    with open(MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Remove bundles from previous builds
+    keep = {'manifest.json'} | {n + s for n in manifest.values() for s in ('', '.gz', '.br')}
+    for name in old_files - keep:
+        os.remove(os.path.join(DIST_DIR, name))
+
+    if brotli is None:
+        print("\n⚠️  Brotli not installed, only .gz variants were written")
+    print("\n✅ Assets built in static/dist/")
+
+
+if __name__ == '__main__':
+    build()
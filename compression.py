@@ -0,0 +1,122 @@
+"""
+gzip / brotli compression for dynamic responses
+
+Rendered pages (the product table, the quotation builder with one
+<option> per product) and JSON compress 5-15x. An after_request hook
+compresses responses whose mimetype is in COMPRESS_MIMETYPES and that are
+at least COMPRESS_MIN_SIZE bytes. Generator responses are compressed
+chunk by chunk with a sync flush, so streaming still reaches the browser
+as it is produced. Files that already carry a Content-Encoding (the
+precompressed /assets bundles) and send_file responses are left alone.
+Brotli is used when the package is installed and the browser accepts it.
+"""
+
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, level):
+        self._b = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._b.process(data)
+
+    def flush(self):
+        return self._b.flush()
+
+    def finish(self):
+        return self._b.finish()
+
+
+def init_app(app):
+    app.after_request(compress_response)
+
+
+def choose_encoding():
+    """'br', 'gzip' or None, following the client's Accept-Encoding"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def make_compressor(encoding):
+    config = current_app.config
+    if encoding == 'br':
+        return BrotliCompressor(config['COMPRESS_BR_LEVEL'])
+    return GzipCompressor(config['COMPRESS_LEVEL'])
+
+
+def compress_stream(chunks, compressor):
+    """Compress a response iterable, flushing after every chunk"""
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    config = current_app.config
+    if not config['COMPRESS_ENABLED']:
+        return response
+
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, make_compressor(encoding))
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        compressor = make_compressor(encoding)
+        response.set_data(compressor.compress(data) + compressor.finish())
+
+    response.headers['Content-Encoding'] = encoding
+
+    # A compressed body is a different representation, it needs its own ETag
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+
+    return response
@@ -0,0 +1,382 @@
+"""
+Bulk customer import and duplicate merging
+
+Customers used to be created one at a time (create_customer). This imports
+a CSV or .xlsx file of customers, reading it with the catalog importer
+(import_csv.py). Only nombre_empresa is required; the other columns are
+contacto_nombre, email, telefono, rfc and nivel_precio.
+
+A row is the same customer as an existing one when its RFC or its email
+matches (RFC first). Both are normalized (Customer.normalize_rfc /
+normalize_email) and indexed. The existing matches for the whole file are
+loaded with a few IN queries on those indexes, not one query per row.
+Rows repeated inside the file are combined first. Rows with neither RFC
+nor email are always new customers.
+
+    python customer_import.py clientes.csv            # new customers only
+    python customer_import.py clientes.xlsx --update  # also fill in existing ones
+
+Duplicates already in the table (same RFC or same email) are merged into
+the oldest customer of each group. It keeps its own values and takes the
+blank ones from the others. Quotations, archived quotations and negotiated
+prices are repointed to it with one UPDATE per table, then the other
+customers are deleted, all in one transaction:
+
+    python customer_import.py --merge --dry-run       # list the groups
+    python customer_import.py --merge
+"""
+
+import argparse
+import logging
+import os
+import sys
+import unicodedata
+
+from sqlalchemy import case, delete, func, insert, select, update
+
+import analytics
+import customer_search
+from app import create_app
+from import_csv import CSVImporter, is_blank
+from models import db, Customer, CustomerPrice, Quotation, QuotationArchive
+
+log = logging.getLogger(__name__)
+
+FIELDS = ['nombre_empresa', 'contacto_nombre', 'email', 'telefono', 'rfc', 'nivel_precio']
+
+COLUMN_ALIASES = {
+    'empresa': 'nombre_empresa',
+    'razon_social': 'nombre_empresa',
+    'cliente': 'nombre_empresa',
+    'nombre': 'nombre_empresa',
+    'contacto': 'contacto_nombre',
+    'correo': 'email',
+    'correo_electronico': 'email',
+    'e-mail': 'email',
+    'tel': 'telefono',
+    'lista': 'nivel_precio',
+    'lista_de_precios': 'nivel_precio',
+    'nivel': 'nivel_precio',
+}
+
+LOOKUP_BATCH = 500  # values per IN (...) when loading existing customers, ids per merge UPDATE
+
+
+def _plain(text):
+    """Lowercase, without accents, spaces as _"""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return '_'.join(text.strip().lower().split())
+
+
+def tier_key(value):
+    """The Customer.TIERS key a nivel_precio cell names (the key or its label), else None"""
+    name = _plain(value)
+    return next((key for key, (label, _) in Customer.TIERS.items() if name in (key, _plain(label))), None)
+
+
+class CustomerImporter(CSVImporter):
+    """Import customers from a CSV or .xlsx file"""
+
+    required_columns = ['nombre_empresa']
+    column_aliases = COLUMN_ALIASES
+
+    def clean_phone(self, value):
+        """Phone as text; pandas reads a column of plain numbers as floats (5512345678.0)"""
+        if isinstance(value, float) and not is_blank(value) and value.is_integer():
+            value = int(value)
+        return self.clean_string(value)
+
+    def row_values(self, row, row_num):
+        """{field: value} for one row, or None (error recorded) if it can't be imported"""
+        nombre = self.clean_string(row.get('nombre_empresa'))
+        if not nombre:
+            self.error(f"Row {row_num}: Missing nombre_empresa", level=logging.WARNING)
+            return None
+
+        values = {
+            'nombre_empresa': nombre,
+            'contacto_nombre': self.clean_string(row.get('contacto_nombre')),
+            'email': Customer.normalize_email(self.clean_string(row.get('email'))),
+            'telefono': self.clean_phone(row.get('telefono')),
+            'rfc': Customer.normalize_rfc(self.clean_string(row.get('rfc'))),
+            'nivel_precio': None,
+        }
+
+        nivel = self.clean_string(row.get('nivel_precio'))
+        if nivel:
+            values['nivel_precio'] = tier_key(nivel)
+            if values['nivel_precio'] is None:
+                self.warn(f"Row {row_num}: Unknown nivel_precio '{nivel}', using the default")
+
+        if values['rfc'] and not Customer.RFC_PATTERN.match(values['rfc']):
+            self.warn(f"Row {row_num}: RFC '{values['rfc']}' doesn't look valid")
+        if values['email'] and '@' not in values['email']:
+            self.warn(f"Row {row_num}: Email '{values['email']}' doesn't look valid")
+
+        for field, value in values.items():
+            length = Customer.__table__.c[field].type.length
+            if value and len(value) > length:
+                self.error(f"Row {row_num}: {field} is longer than {length} characters")
+                return None
+        return values
+
+    def combine_file_rows(self, rows):
+        """The file's customers, with rows that share an RFC or email combined (first value wins)"""
+        customers = []
+        by_key = {}
+        for row_num, row in rows:
+            self.count_row()
+            values = self.row_values(row, row_num)
+            if values is None:
+                continue
+
+            keys = [(field, values[field]) for field in ('rfc', 'email') if values[field]]
+            earlier = next((by_key[key] for key in keys if key in by_key), None)
+            if earlier is None:
+                customers.append(values)
+                earlier = values
+            else:
+                self.skipped += 1
+                log.debug("Row %s: Same customer as an earlier row (%s)", row_num, values['nombre_empresa'])
+                for field, value in values.items():
+                    if earlier[field] is None:
+                        earlier[field] = value
+            for field in ('rfc', 'email'):
+                for value in {values[field], earlier[field]} - {None}:
+                    by_key.setdefault((field, value), earlier)
+        return customers
+
+    def existing_customers(self, customers):
+        """({rfc: customer_id}, {email: customer_id}) of the customers already in the table"""
+        found = {}
+        for field in ('rfc', 'email'):
+            column = Customer.__table__.c[field]
+            values = sorted({c[field] for c in customers if c[field]})
+            found[field] = {}
+            for start in range(0, len(values), LOOKUP_BATCH):
+                rows = db.session.execute(
+                    select(column, Customer.customer_id)
+                    .where(column.in_(values[start:start + LOOKUP_BATCH]))
+                    .order_by(Customer.customer_id.desc())  # the oldest wins when there are duplicates
+                )
+                found[field].update(rows.all())
+        return found['rfc'], found['email']
+
+    def import_customers(self, file_path, update_existing=False):
+        """
+        Import customers from a CSV or .xlsx file
+
+        Args:
+            file_path: Path to CSV or .xlsx file
+            update_existing: Fill in existing customers with the file's
+                non-empty values (default: leave them as they are)
+        """
+        self.say("=" * 70)
+        self.say("CUSTOMER IMPORT")
+        self.say("=" * 70)
+        self.say(f"File: {file_path}")
+        self.say(f"Update existing: {update_existing}")
+        self.say("=" * 70)
+
+        if not os.path.exists(file_path):
+            return self.fail(f"Error: File not found: {file_path}")
+
+        try:
+            rows = self.read_rows(file_path)
+            if rows is None:
+                return False
+
+            app = self.app or create_app()
+            with app.app_context():
+                customers = self.combine_file_rows(rows)
+                by_rfc, by_email = self.existing_customers(customers)
+
+                new, changes = [], []
+                for values in customers:
+                    rfc_match, email_match = by_rfc.get(values['rfc']), by_email.get(values['email'])
+                    if rfc_match and email_match and rfc_match != email_match:
+                        self.skipped += 1
+                        self.warn(f"'{values['nombre_empresa']}' skipped: RFC matches customer {rfc_match} and "
+                                  f"email matches customer {email_match} (python customer_import.py --merge)")
+                        continue
+                    customer_id = rfc_match or email_match
+                    if customer_id is None:
+                        new.append({**values, 'nivel_precio': values['nivel_precio'] or 'unitario'})
+                    elif update_existing:
+                        changes.append({'customer_id': customer_id,
+                                        **{f: v for f, v in values.items() if v is not None}})
+                    else:
+                        self.skipped += 1
+
+                # Two rows of the file can match the same customer; the first one counts
+                changes = list({change['customer_id']: change for change in reversed(changes)}.values())
+
+                if new:
+                    db.session.execute(insert(Customer), new)
+                for change in changes:
+                    db.session.execute(update(Customer).where(Customer.customer_id == change['customer_id'])
+                                       .values({f: v for f, v in change.items() if f != 'customer_id'}))
+                # The bulk statements skip the ORM events that keep the search index current
+                conn = db.session.connection()
+                customer_search.index_customers(conn, [change['customer_id'] for change in changes])
+                customer_search.index_missing(conn)
+                db.session.commit()
+                self.imported = len(new) + len(changes)
+                self.say(f"\n💾 {len(new)} customers created, {len(changes)} updated")
+
+            self.print_summary()
+            return True
+
+        except Exception as e:  # the app context's teardown rolled back the session
+            self.fail(f"Import failed: {str(e)}")
+            log.exception("Import of %s failed", file_path)
+            return False
+
+
+def duplicate_groups():
+    """Lists of customer_ids, oldest first, that share an RFC or an email (directly or through each other)"""
+    parent = {}
+
+    def root(customer_id):
+        while parent.setdefault(customer_id, customer_id) != customer_id:
+            customer_id = parent[customer_id]
+        return customer_id
+
+    for column in (Customer.rfc, Customer.email):
+        repeated = select(column).where(column.isnot(None)).group_by(column).having(func.count() > 1)
+        first = {}
+        for value, customer_id in db.session.execute(
+            select(column, Customer.customer_id).where(column.in_(repeated)).order_by(Customer.customer_id)
+        ):
+            a, b = root(first.setdefault(value, customer_id)), root(customer_id)
+            parent[max(a, b)] = min(a, b)
+
+    groups = {}
+    for customer_id in parent:
+        groups.setdefault(root(customer_id), []).append(customer_id)
+    return sorted(sorted(ids) for ids in groups.values())
+
+
+def merge_duplicates(groups):
+    """
+    Merge each group into its first (oldest) customer, in one transaction
+
+    Returns {deleted customer_id: customer_id it was merged into}.
+    """
+    merged = {loser: ids[0] for ids in groups for loser in ids[1:]}
+    if not merged:
+        return merged
+
+    try:
+        conn = db.session.connection()
+        ids = sorted({customer_id for group in groups for customer_id in group})
+        rows = {}
+        for start in range(0, len(ids), LOOKUP_BATCH):
+            for row in db.session.execute(
+                select(Customer.customer_id, *[Customer.__table__.c[f] for f in FIELDS])
+                .where(Customer.customer_id.in_(ids[start:start + LOOKUP_BATCH]))
+            ):
+                rows[row.customer_id] = row._asdict()
+
+        # The survivor's blanks, from the other customers of its group (oldest first)
+        for group in groups:
+            survivor = rows[group[0]]
+            filled = {}
+            for field in FIELDS:
+                if survivor[field] is None:
+                    filled[field] = next((rows[i][field] for i in group[1:] if rows[i][field] is not None), None)
+            filled = {f: v for f, v in filled.items() if v is not None}
+            if filled:
+                conn.execute(update(Customer.__table__).where(Customer.customer_id == group[0]).values(filled))
+
+        # A customer can have one negotiated price per product: when several of a group
+        # have one, the oldest customer's price is kept
+        prices = CustomerPrice.__table__
+        kept, dropped = set(), []
+        for start in range(0, len(ids), LOOKUP_BATCH):
+            for customer_id, product_id in conn.execute(
+                select(prices.c.customer_id, prices.c.product_id)
+                .where(prices.c.customer_id.in_(ids[start:start + LOOKUP_BATCH]))
+                .order_by(prices.c.customer_id)
+            ):
+                key = (merged.get(customer_id, customer_id), product_id)
+                if key in kept:
+                    dropped.append((customer_id, product_id))
+                kept.add(key)
+        for customer_id, product_id in dropped:
+            conn.execute(delete(prices).where(prices.c.customer_id == customer_id,
+                                              prices.c.product_id == product_id))
+
+        # Repoint everything that references the merged customers: one UPDATE ... SET
+        # customer_id = CASE customer_id WHEN old THEN new ... END per table and batch
+        losers = sorted(merged)
+        for table in (Quotation.__table__, QuotationArchive.__table__, prices):
+            for start in range(0, len(losers), LOOKUP_BATCH):
+                batch = {loser: merged[loser] for loser in losers[start:start + LOOKUP_BATCH]}
+                conn.execute(
+                    update(table).where(table.c.customer_id.in_(batch))
+                    .values(customer_id=case(batch, value=table.c.customer_id))
+                )
+
+        analytics.refresh_customers(conn, merged)
+
+        for start in range(0, len(losers), LOOKUP_BATCH):
+            conn.execute(delete(Customer.__table__)
+                         .where(Customer.customer_id.in_(losers[start:start + LOOKUP_BATCH])))
+        customer_search.index_customers(conn, ids)  # survivors re-indexed, deleted ones dropped
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', nargs='?', help='CSV or .xlsx file of customers')
+    parser.add_argument('--update', action='store_true',
+                        help='fill in existing customers with the non-empty values of the file')
+    parser.add_argument('--merge', action='store_true', help='merge customers with the same RFC or email')
+    parser.add_argument('--dry-run', action='store_true', help='with --merge: only list the duplicates')
+    args = parser.parse_args()
+
+    if not args.file and not args.merge:
+        parser.print_usage()
+        sys.exit(1)
+
+    app = create_app()
+
+    if args.file:
+        importer = CustomerImporter(app)
+        if not importer.import_customers(args.file, update_existing=args.update):
+            print("\n❌ Import failed!")
+            sys.exit(1)
+        print("\n✅ Import completed successfully!")
+
+    if args.merge:
+        with app.app_context():
+            groups = duplicate_groups()
+            if not groups:
+                print("✅ No duplicate customers")
+                return
+
+            names = dict(db.session.execute(
+                select(Customer.customer_id, Customer.nombre_empresa)
+                .where(Customer.customer_id.in_([i for group in groups for i in group]))
+            ).all())
+            print(f"🔍 {len(groups)} groups of duplicate customers\n")
+            for group in groups:
+                print(f"   {group[0]} {names[group[0]]}  <-  "
+                      + ', '.join(f"{i} {names[i]}" for i in group[1:]))
+
+            if args.dry_run:
+                print("\n(dry run, nothing merged)")
+                return
+
+            merged = merge_duplicates(groups)
+            print(f"\n✅ {len(merged)} customers merged into {len(groups)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Customer search
+
+Searching customers with ilike('%term%') over four columns reads every row
+of the table, for every keystroke of a typeahead. Instead each customer's
+nombre_empresa, contacto_nombre, email and rfc are split into words and
+every word into trigrams, with two PAD characters in front and one behind:
+"acme" -> __a _ac acm cme me_. customer_trigrams holds one row per
+distinct trigram of each customer, keyed (gram, customer_id).
+
+A search term is cut the same way, without the trailing PAD since the last
+word may still be being typed. The customers that share at least
+CUSTOMER_SEARCH_MIN_SHARE of the term's trigrams are found with an indexed
+IN, grouped by customer and ranked by how many they share, then shorter
+names first (closer to the term when both contain all of it). So a term
+matches the start or the middle of a word ("presa" finds "Empresa") and
+survives a typo or two ("empressa", "empersa"). A whole RFC or email is
+looked up directly on its own index instead.
+
+The same rules work on MySQL and SQLite, so there is no FULLTEXT parser
+to configure. The index follows every Customer saved through the ORM.
+Writes that bypass it call index_customers() themselves, and
+    python customer_search.py rebuild
+recomputes the whole table.
+"""
+
+import argparse
+import math
+import re
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import and_, delete, event, func, insert, literal, select
+
+from models import db, Customer, CustomerTrigram
+
+PAD = '_'  # not a letter or digit, so it never appears inside a word
+
+SEARCHABLE = ('nombre_empresa', 'contacto_nombre', 'email', 'rfc')
+
+BATCH = 1000  # customers indexed per INSERT
+
+FREQUENCY_CAP = 1000  # grams are counted up to this; above it a term's rarest grams are too common to start from
+
+
+def words(text):
+    """Lowercase ASCII words and numbers"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def trigrams(text, partial=False):
+    """Distinct trigrams of the words of text; partial: the last word may be incomplete"""
+    grams = set()
+    for word in words(text):
+        padded = PAD * 2 + word + ('' if partial else PAD)
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def customer_trigrams(row):
+    """{'customer_id', 'gram'} rows for a customer (any object with the SEARCHABLE attributes)"""
+    text = ' '.join(filter(None, (getattr(row, field) for field in SEARCHABLE)))
+    return [{'customer_id': row.customer_id, 'gram': gram} for gram in sorted(trigrams(text))]
+
+
+def index_customers(conn, customer_ids):
+    """Recompute the trigrams of these customers; ids that no longer exist lose theirs"""
+    table = CustomerTrigram.__table__
+    ids = sorted(set(customer_ids))
+    for start in range(0, len(ids), BATCH):
+        batch = ids[start:start + BATCH]
+        conn.execute(delete(table).where(table.c.customer_id.in_(batch)))
+        rows = conn.execute(
+            select(Customer.customer_id, *[Customer.__table__.c[f] for f in SEARCHABLE])
+            .where(Customer.customer_id.in_(batch))
+        )
+        grams = [gram for row in rows for gram in customer_trigrams(row)]
+        if grams:
+            conn.execute(insert(table), grams)
+
+
+def index_missing(conn):
+    """Index the customers that have no trigrams yet (added with bulk INSERTs)"""
+    table = CustomerTrigram.__table__
+    ids = conn.execute(
+        select(Customer.customer_id).where(~select(table.c.customer_id)
+                                           .where(table.c.customer_id == Customer.customer_id).exists())
+    ).scalars().all()
+    index_customers(conn, ids)
+    return len(ids)
+
+
+def rebuild(conn):
+    """Recompute the whole index"""
+    conn.execute(delete(CustomerTrigram.__table__))
+    return index_missing(conn)
+
+
+@event.listens_for(Customer, 'after_insert')
+@event.listens_for(Customer, 'after_update')
+def _index_saved(mapper, connection, customer):
+    state = db.inspect(customer)
+    if any(state.attrs[field].history.has_changes() for field in SEARCHABLE):
+        table = CustomerTrigram.__table__
+        connection.execute(delete(table).where(table.c.customer_id == customer.customer_id))
+        grams = customer_trigrams(customer)
+        if grams:
+            connection.execute(insert(table), grams)
+
+
+@event.listens_for(Customer, 'after_delete')
+def _forget_deleted(mapper, connection, customer):
+    table = CustomerTrigram.__table__
+    connection.execute(delete(table).where(table.c.customer_id == customer.customer_id))
+
+
+def exact_condition(term):
+    """Customer.rfc == / Customer.email == when term is a whole RFC or email, else None"""
+    rfc, email = Customer.normalize_rfc(term), Customer.normalize_email(term)
+    if rfc and Customer.RFC_PATTERN.match(rfc):
+        return Customer.rfc == rfc
+    local, at, domain = (email or '').partition('@')
+    if local and at and '.' in domain and ' ' not in email:
+        return Customer.email == email
+    return None
+
+
+def search(term, limit=None):
+    """
+    Customers matching term, best first, at most limit (default CUSTOMER_SEARCH_LIMIT)
+
+    Rows have the Customer columns plus `coincidencia`: the share of the
+    term's trigrams the customer has (1.0 for exact RFC / email matches).
+    """
+    limit = limit or current_app.config['CUSTOMER_SEARCH_LIMIT']
+    columns = [Customer.customer_id, Customer.nombre_empresa, Customer.contacto_nombre, Customer.email,
+               Customer.telefono, Customer.rfc, Customer.nivel_precio]
+
+    exact = exact_condition(term)
+    if exact is not None:
+        return db.session.execute(
+            select(*columns, literal(1.0).label('coincidencia'))
+            .where(exact).order_by(Customer.customer_id).limit(limit)
+        ).all()
+
+    grams = sorted(trigrams(term, partial=True))
+    if not grams:
+        return []
+    needed = max(1, math.ceil(len(grams) * current_app.config['CUSTOMER_SEARCH_MIN_SHARE']))
+
+    # A customer with `needed` of the term's grams has at least one of any
+    # len(grams) - needed + 1 of them. When the rarest ones are rare enough,
+    # only the customers that have one are counted; otherwise (every gram is
+    # common) every posting of the term's grams is.
+    frequency = _frequencies(grams)
+    rare = sorted(grams, key=lambda gram: frequency[gram])[:len(grams) - needed + 1]
+
+    table = CustomerTrigram.__table__
+    if sum(frequency[gram] for gram in rare) < FREQUENCY_CAP:
+        candidates = select(table.c.customer_id).where(table.c.gram.in_(rare)).distinct().subquery()
+        grams_of = table.alias('grams_of')
+        hits = (
+            select(candidates.c.customer_id, func.count().label('hits'))
+            .join(grams_of, and_(grams_of.c.customer_id == candidates.c.customer_id, grams_of.c.gram.in_(grams)))
+            .group_by(candidates.c.customer_id)
+        )
+    else:
+        hits = select(table.c.customer_id, func.count().label('hits')).where(table.c.gram.in_(grams)) \
+            .group_by(table.c.customer_id)
+    hits = hits.having(func.count() >= needed).subquery()
+
+    return db.session.execute(
+        select(*columns, (hits.c.hits * 1.0 / len(grams)).label('coincidencia'))
+        .join(hits, hits.c.customer_id == Customer.customer_id)
+        .order_by(hits.c.hits.desc(), func.length(Customer.nombre_empresa), Customer.nombre_empresa,
+                  Customer.customer_id)
+        .limit(limit)
+    ).all()
+
+
+def _frequencies(grams):
+    """{gram: customers that have it, counted up to FREQUENCY_CAP}, in one query"""
+    table = CustomerTrigram.__table__
+    counts = [
+        select(func.count()).select_from(
+            select(literal(1)).where(table.c.gram == gram).limit(FREQUENCY_CAP).subquery()
+        ).scalar_subquery()
+        for gram in grams
+    ]
+    return dict(zip(grams, db.session.execute(select(*counts)).one()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('rebuild', help='recompute the whole index')
+    find = commands.add_parser('search', help='search customers')
+    find.add_argument('term')
+    find.add_argument('--limite', type=int, default=20)
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        if args.command == 'rebuild':
+            indexed = rebuild(db.session.connection())
+            db.session.commit()
+            rows = db.session.query(func.count()).select_from(CustomerTrigram).scalar()
+            print(f"✓ {indexed} customers indexed, {rows} trigrams")
+            return
+
+        results = search(args.term, args.limite)
+        for row in results:
+            print(f"  {row.coincidencia:5.0%}  {row.customer_id:>6}  {row.nombre_empresa}"
+                  f"  ({row.contacto_nombre or '-'}, {row.email or '-'}, {row.rfc or '-'})")
+        if not results:
+            print("No customers found")
+
+
+if __name__ == '__main__':
+    main()
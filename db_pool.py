@@ -0,0 +1,74 @@
+"""
+Connection pool settings for the SQLAlchemy engine
+"""
+
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError
+
+
+def engine_options(config):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* / WEB_* settings
+
+    Every worker process owns its own pool, so the total number of MySQL
+    connections is workers * (pool_size + max_overflow). The pool is sized
+    so that total never exceeds DB_MAX_CONNECTIONS.
+    """
+    options = {
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': False,
+    }
+
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return options
+
+    workers = max(1, config['WEB_CONCURRENCY'])
+    per_worker = max(1, config['DB_MAX_CONNECTIONS'] // workers)
+
+    pool_size = config['DB_POOL_SIZE'] or config['WEB_THREADS']
+    pool_size = max(1, min(pool_size, per_worker))
+    max_overflow = max(0, min(config['DB_MAX_OVERFLOW'], per_worker - pool_size))
+
+    options.update({
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    })
+    return options
+
+
+def install_liveness_check(engine, idle_seconds):
+    """
+    Ping a pooled connection only when it has been idle for idle_seconds
+
+    pool_pre_ping sends a SELECT 1 on every checkout, which is one extra
+    round-trip per request. Connections that were checked in a moment ago
+    are known to be alive, so only stale ones are pinged. A failed ping
+    raises DisconnectionError, which makes the pool discard the connection
+    and transparently retry with a fresh one.
+    """
+    if idle_seconds is None or idle_seconds < 0:
+        return
+
+    @event.listens_for(engine, 'checkin')
+    def _mark_checkin(dbapi_connection, connection_record):
+        connection_record.info['last_checkin'] = time.monotonic()
+
+    @event.listens_for(engine, 'checkout')
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get('last_checkin')
+        if last_checkin is None or time.monotonic() - last_checkin < idle_seconds:
+            return
+
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        except Exception as e:
+            raise DisconnectionError(f'Stale connection: {e}')
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
@@ -0,0 +1,217 @@
+"""
+Near-duplicate products
+
+The same article often ends up in the catalog twice under different
+claves, through imports or by hand. This finds pairs of products whose
+tipo_producto + descripcion + medidas read almost the same:
+
+    python duplicates.py                   # pairs at least 90% alike
+    python duplicates.py --umbral 0.8 --csv duplicados.csv
+
+Each product's text is normalized (lowercase, no accents, "27 X 34" ->
+"27x34") and turned into its set of character trigrams. The similarity of
+two products is the Jaccard index of their sets: shared trigrams over all
+trigrams. Comparing every pair would be n² comparisons, so candidates come
+from MinHash locality-sensitive hashing, all in NumPy arrays:
+  - HASHES min-hashes per product; two products agree on each one with
+    probability equal to their similarity
+  - the signature is cut into BANDS bands of ROWS hashes; products that
+    agree on a whole band are candidates
+  - each candidate pair's exact similarity is then computed and filtered
+A pair at 0.9 becomes a candidate with probability ~98%, one at 0.7 with
+~6%. Below ~0.8 pairs start to be missed, so lower --umbral finds some
+of them, not all.
+"""
+
+import argparse
+import csv
+import re
+import unicodedata
+
+from sqlalchemy import select
+
+from models import db, Product
+
+# numpy is imported inside the functions that use it, like pandas in import_csv.py
+
+DEFAULT_THRESHOLD = 0.9
+
+BANDS = 20
+ROWS = 16
+HASHES = BANDS * ROWS
+
+PRIME = (1 << 31) - 1  # modulus of the min-hash functions; a * code stays below 2**55
+SEED = 2024  # fixed, so runs are reproducible
+PAIRS_CHUNK = 50_000  # candidate pairs whose similarity is computed at once
+
+
+def normalize(text):
+    """Lowercase ASCII words and numbers, single spaces; sizes written as 27x34"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    text = re.sub(r'[^a-z0-9.]+', ' ', text)
+    text = re.sub(r'(\d)\s*x\s*(?=\d)', r'\1x', text)
+    return f" {' '.join(text.split())} "
+
+
+def product_texts():
+    """(ids, claves, texts) of every product"""
+    rows = db.session.execute(
+        select(Product.id, Product.clave_producto, Product.tipo_producto, Product.descripcion, Product.medidas)
+        .order_by(Product.id)
+    ).all()
+    return ([r.id for r in rows], [r.clave_producto for r in rows],
+            [normalize(' '.join(filter(None, (r.tipo_producto, r.descripcion, r.medidas)))) for r in rows])
+
+
+def trigrams(texts):
+    """
+    Sorted, de-duplicated (doc, trigram) arrays
+
+    The texts are ASCII after normalize(), so a trigram's three bytes are
+    its exact 24-bit code: no hashing collisions.
+    """
+    import numpy as np
+
+    data = np.frombuffer(''.join(texts).encode('ascii'), dtype=np.uint8).astype(np.int32)
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    doc_of_byte = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+
+    codes = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+    inside = doc_of_byte[:-2] == doc_of_byte[2:]  # trigrams spanning two texts are dropped
+
+    keys = (doc_of_byte[:-2][inside] << 24) | codes[inside]
+    del data, codes, doc_of_byte, inside
+    keys = np.unique(keys)
+    return keys >> 24, keys & 0xFFFFFF
+
+
+def minhash(docs, grams, n_docs):
+    """(n_docs, HASHES) signature matrix; docs must be sorted and each doc have trigrams"""
+    import numpy as np
+
+    rng = np.random.default_rng(SEED)
+    vocabulary, gram_index = np.unique(grams, return_inverse=True)
+    starts = np.searchsorted(docs, np.arange(n_docs))
+
+    # h(x) = (a * x + b) mod PRIME, evaluated once per distinct trigram
+    a = rng.integers(1, PRIME, HASHES, dtype=np.int64)
+    b = rng.integers(0, PRIME, HASHES, dtype=np.int64)
+    signatures = np.empty((n_docs, HASHES), dtype=np.uint32)
+    for k in range(HASHES):
+        hashed = ((vocabulary * a[k] + b[k]) % PRIME).astype(np.uint32)
+        signatures[:, k] = np.minimum.reduceat(hashed[gram_index], starts)
+    return signatures
+
+
+def _group_pairs(order, keys):
+    """All (i, j) pairs among positions of `order` whose sorted keys are equal"""
+    import numpy as np
+
+    sorted_keys = keys[order]
+    run_start = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    run_size = np.diff(np.r_[run_start, len(order)])
+    position = np.arange(len(order)) - np.repeat(run_start, run_size)
+    following = np.repeat(run_size, run_size) - position - 1  # partners after each element
+
+    first = np.repeat(np.arange(len(order)), following)
+    step = np.arange(len(first)) - np.repeat(np.cumsum(following) - following, following) + 1
+    i, j = order[first], order[first + step]
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def candidate_pairs(signatures):
+    """(i, j) with i < j, for products that share at least one band"""
+    import numpy as np
+
+    n_docs = len(signatures)
+    mixers = np.random.default_rng(SEED + 1).integers(1, 1 << 62, ROWS, dtype=np.uint64) | np.uint64(1)
+    found = []
+    for band in range(BANDS):
+        block = signatures[:, band * ROWS:(band + 1) * ROWS]
+        keys = (block.astype(np.uint64) * mixers).sum(axis=1)  # wraps around; a collision only adds a candidate
+        i, j = _group_pairs(np.argsort(keys, kind='stable'), keys)
+        found.append(i.astype(np.int64) * n_docs + j)
+    codes = np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+    return codes // n_docs, codes % n_docs
+
+
+def jaccard(i, j, docs, grams, n_docs):
+    """Exact trigram Jaccard index of each (i[k], j[k]) pair"""
+    import numpy as np
+
+    starts = np.searchsorted(docs, np.arange(n_docs + 1))
+    sizes = np.diff(starts)
+    result = np.empty(len(i))
+    for chunk in range(0, len(i), PAIRS_CHUNK):
+        ci, cj = i[chunk:chunk + PAIRS_CHUNK], j[chunk:chunk + PAIRS_CHUNK]
+        pair = np.arange(len(ci), dtype=np.int64)
+
+        def expand(side):
+            # (pair, trigram) keys for every trigram of each pair's `side` product
+            counts = sizes[side]
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            return (np.repeat(pair, counts) << 24) | grams[np.repeat(starts[side], counts) + offsets]
+
+        keys_i, keys_j = expand(ci), expand(cj)
+        shared = np.bincount(keys_i[np.isin(keys_i, keys_j, assume_unique=True)] >> 24, minlength=len(ci))
+        result[chunk:chunk + PAIRS_CHUNK] = shared / (sizes[ci] + sizes[cj] - shared)
+    return result
+
+
+def find_duplicates(texts, threshold=DEFAULT_THRESHOLD):
+    """(i, j, similarity) arrays of text index pairs at or above threshold, most alike first"""
+    import numpy as np
+
+    # A normalized text is at least two spaces; texts without a trigram can't be compared
+    keep = np.flatnonzero([len(t) > 2 for t in texts])
+    docs, grams = trigrams([texts[k] for k in keep])
+    n_docs = len(keep)
+    if n_docs < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+
+    i, j = candidate_pairs(minhash(docs, grams, n_docs))
+    similarity = jaccard(i, j, docs, grams, n_docs)
+    close = similarity >= threshold
+    i, j, similarity = i[close], j[close], similarity[close]
+
+    order = np.lexsort((j, i, -similarity))
+    return keep[i[order]], keep[j[order]], similarity[order]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--umbral', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'minimum similarity, 0 to 1 (default {DEFAULT_THRESHOLD})')
+    parser.add_argument('--limite', type=int, default=50, help='pairs to print (default 50)')
+    parser.add_argument('--csv', help='write every pair found to this CSV file')
+    args = parser.parse_args()
+
+    from time import perf_counter
+
+    from app import create_app
+
+    with create_app().app_context():
+        started = perf_counter()
+        ids, claves, texts = product_texts()
+        print(f"🔍 Comparing {len(ids)} products (similarity >= {args.umbral:.0%})...")
+        first, second, similarity = find_duplicates(texts, args.umbral)
+        print(f"✓ {len(similarity)} pairs found in {perf_counter() - started:.1f}s\n")
+
+        for a, b, s in list(zip(first, second, similarity))[:args.limite]:
+            print(f"  {s:5.0%}  {claves[a]:<20} {claves[b]:<20} {texts[a].strip()[:60]}")
+        if len(similarity) > args.limite:
+            print(f"  ... and {len(similarity) - args.limite} more")
+
+        if args.csv:
+            with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['similitud', 'id_a', 'clave_a', 'id_b', 'clave_b', 'texto_a', 'texto_b'])
+                for a, b, s in zip(first, second, similarity):
+                    writer.writerow([f'{s:.3f}', ids[a], claves[a], ids[b], claves[b],
+                                     texts[a].strip(), texts[b].strip()])
+            print(f"\n📄 {len(similarity)} pairs written to {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
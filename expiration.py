@@ -0,0 +1,105 @@
+"""
+Expiring quotations
+
+A Borrador or Enviada quotation is valid until vence_en (fecha +
+vigencia_dias). expire_quotations() marks the ones past it as Vencida, so
+the list, the reports and the rollups show what they are without every
+reader comparing dates. scheduler.py runs it every EXPIRE_EVERY_SECONDS.
+
+It works in batches of EXPIRE_BATCH quotations, one short transaction
+each, so rows are never locked for long however many are due: the ids come
+from a range scan of ix_quotations_status_vence_en, one UPDATE sets the
+status and bumps version (a builder page still open on the quotation gets
+a 409 instead of editing it), then the rollups of those quotations are
+refreshed (analytics.py). The UPDATE repeats the conditions, so a
+quotation accepted in between keeps its status.
+
+Vencida is final. To quote the same products again, use Duplicar.
+
+    python expiration.py            # expire what is due now
+    python expiration.py --dry-run  # only count
+"""
+
+import argparse
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select, update
+
+import analytics
+from models import db, Quotation
+
+
+def _due_ids(status, now, limit):
+    # status = ? AND vence_en < ? is a range scan of ix_quotations_status_vence_en
+    return db.session.execute(
+        select(Quotation.quotation_id)
+        .where(Quotation.status == status, Quotation.vence_en < now)
+        .order_by(Quotation.vence_en)
+        .limit(limit)
+    ).scalars().all()
+
+
+def count_due(now=None):
+    """{open status: quotations past vence_en}"""
+    now = now or datetime.utcnow()
+    return {
+        status: db.session.query(func.count(Quotation.quotation_id))
+        .filter(Quotation.status == status, Quotation.vence_en < now).scalar()
+        for status in Quotation.OPEN_STATUSES
+    }
+
+
+def expire_batch(ids, now):
+    """Mark these quotations Vencida if they are still open and past vence_en, in one transaction"""
+    try:
+        expired = db.session.execute(
+            update(Quotation)
+            .where(Quotation.quotation_id.in_(ids), Quotation.status.in_(Quotation.OPEN_STATUSES),
+                   Quotation.vence_en < now)
+            .values(status='Vencida', version=Quotation.version + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        analytics.refresh_quotations(db.session.connection(), ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return expired
+
+
+def expire_quotations(batch_size=None):
+    """Mark every open quotation past vence_en as Vencida; returns how many"""
+    batch_size = batch_size or current_app.config['EXPIRE_BATCH']
+    now = datetime.utcnow()
+
+    expired = 0
+    for status in Quotation.OPEN_STATUSES:
+        while True:
+            ids = _due_ids(status, now, batch_size)
+            if not ids:
+                break
+            expired += expire_batch(ids, now)
+    return expired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help='only count the quotations that are due')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        due = count_due()
+        for status, count in due.items():
+            print(f"  {status:<10} {count:>8} past vence_en")
+        if args.dry_run:
+            return
+
+        print("\n🔄 Expiring...")
+        print(f"\n✅ {expire_quotations()} quotations marked as Vencida")
+
+
+if __name__ == '__main__':
+    main()
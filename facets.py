@@ -0,0 +1,209 @@
+"""
+Facet filters for the product list
+
+The sidebar next to the product table lists, for every facet, the values
+in the catalog and how many products match each one given the search and
+the other active filters. Those counts are GROUP BY queries over the whole
+products table, so they are cached in-process keyed on the catalog version
+(models.CatalogVersion, bumped by every transaction that changes products
+or choices). Until the catalog changes a page load costs one primary-key
+read for the whole sidebar.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app, url_for
+from sqlalchemy import and_, case, func
+
+from models import db, Product, ImpresionChoice, ColorsChoice, CatalogVersion
+
+# (key, lower bound, upper bound or None, label)
+PRICE_RANGES = [
+    ('0-50', 0, 50, '$0 - $50'),
+    ('50-100', 50, 100, '$50 - $100'),
+    ('100-250', 100, 250, '$100 - $250'),
+    ('250-500', 250, 500, '$250 - $500'),
+    ('500+', 500, None, '$500 o más'),
+]
+
+# URL parameter -> sidebar title, in display order
+FACETS = OrderedDict([
+    ('tipo', 'Tipo de producto'),
+    ('material', 'Material'),
+    ('impresion', 'Impresión'),
+    ('colores', 'Color'),
+    ('precio', 'Precio unitario'),
+])
+
+OPTION_LIMIT = 12  # most frequent values shown per facet
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+def active_filters(args):
+    """The valid facet filters in the request arguments"""
+    filters = {}
+    for key in FACETS:
+        value = args.get(key, '', type=str).strip()
+        if not value:
+            continue
+        if key in ('impresion', 'colores') and not value.isdigit():
+            continue
+        if key == 'precio' and value not in {r[0] for r in PRICE_RANGES}:
+            continue
+        filters[key] = value
+    return filters
+
+
+def normalize_search(value):
+    """The search text as the list filters on it: trimmed, inner runs of spaces collapsed"""
+    return ' '.join((value or '').split())
+
+
+def base_conditions(search, available):
+    """Conditions for the text search and the available yes/no filter"""
+    conditions = []
+    if search:
+        conditions.append(
+            (Product.clave_producto.ilike(f'%{search}%')) |
+            (Product.tipo_producto.ilike(f'%{search}%')) |
+            (Product.descripcion.ilike(f'%{search}%'))
+        )
+    if available == 'yes':
+        conditions.append(Product.available == True)
+    elif available == 'no':
+        conditions.append(Product.available == False)
+    return conditions
+
+
+def _price_condition(value):
+    for key, low, high, _ in PRICE_RANGES:
+        if key == value:
+            if high is None:
+                return Product.precio_unitario >= low
+            return and_(Product.precio_unitario >= low, Product.precio_unitario < high)
+
+
+def facet_conditions(filters, skip=None):
+    """Conditions for the facet filters, leaving out the facet named skip"""
+    conditions = []
+    for key, value in filters.items():
+        if key == skip:
+            continue
+        if key == 'tipo':
+            conditions.append(Product.tipo_producto == value)
+        elif key == 'material':
+            conditions.append(Product.material == value)
+        elif key == 'impresion':
+            conditions.append(Product.impresion_id == int(value))
+        elif key == 'colores':
+            conditions.append(Product.colores_id == int(value))
+        elif key == 'precio':
+            conditions.append(_price_condition(value))
+    return conditions
+
+
+def _count_column(column, conditions):
+    rows = (db.session.query(column, func.count(Product.id))
+            .filter(column.isnot(None), column != '', *conditions)
+            .group_by(column).all())
+    return [(value, value, count) for value, count in rows]
+
+
+def _count_choice(choice, foreign_key, conditions):
+    rows = (db.session.query(choice.id, choice.nombre, func.count(Product.id))
+            .join(Product, foreign_key == choice.id)
+            .filter(*conditions)
+            .group_by(choice.id, choice.nombre).all())
+    return [(str(c_id), nombre, count) for c_id, nombre, count in rows]
+
+
+def _count_prices(conditions):
+    bucket = case(
+        *[(_price_condition(key), key) for key, _, high, _ in PRICE_RANGES if high is not None],
+        else_=PRICE_RANGES[-1][0],
+    )
+    counts = dict(db.session.query(bucket, func.count(Product.id)).filter(*conditions).group_by(bucket).all())
+    return [(key, label, counts[key]) for key, _, _, label in PRICE_RANGES if counts.get(key)]
+
+
+def compute_facets(search, available, filters):
+    """{facet: [(value, label, count), ...]}, each facet counted without its own filter"""
+    base = base_conditions(search, available)
+    facets = {}
+    for key in FACETS:
+        conditions = base + facet_conditions(filters, skip=key)
+        if key == 'tipo':
+            options = _count_column(Product.tipo_producto, conditions)
+        elif key == 'material':
+            options = _count_column(Product.material, conditions)
+        elif key == 'impresion':
+            options = _count_choice(ImpresionChoice, Product.impresion_id, conditions)
+        elif key == 'colores':
+            options = _count_choice(ColorsChoice, Product.colores_id, conditions)
+        else:
+            facets[key] = _count_prices(conditions)
+            continue
+        options.sort(key=lambda o: (-o[2], o[1]))
+        facets[key] = options
+    return facets
+
+
+def facet_counts(search, available, filters):
+    """
+    compute_facets(), served from the cache while the catalog version is unchanged
+
+    search must already be normalize_search()'d: it is part of the key as is,
+    so the key matches exactly what the query filters on.
+    """
+    size = current_app.config['FACET_CACHE_SIZE']
+    version = CatalogVersion.current() if size else None
+    if version is None:
+        return compute_facets(search, available, filters)
+
+    key = (version, search, available, tuple(sorted(filters.items())))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    facets = compute_facets(search, available, filters)
+
+    with _cache_lock:
+        _cache[key] = facets
+        while len(_cache) > size:
+            _cache.popitem(last=False)
+    return facets
+
+
+def _index_url(args, key, value):
+    """The product list with facet key set to value (None clears it), back on page 1"""
+    args = {k: v for k, v in args.items() if v and k != key}
+    if value is not None:
+        args[key] = value
+    return url_for('main.index', **args)
+
+
+def sidebar(facets, filters, args):
+    """Facets as the template shows them; args are the current list arguments, for the links"""
+    groups = []
+    for key, title in FACETS.items():
+        options = facets.get(key, [])
+        selected = filters.get(key)
+        shown = options[:OPTION_LIMIT]
+        if selected and all(value != selected for value, _, _ in shown):
+            shown += [o for o in options if o[0] == selected]
+        if not shown:
+            continue
+        groups.append({
+            'key': key,
+            'title': title,
+            'selected': selected,
+            'clear_url': _index_url(args, key, None),
+            'options': [{'label': label, 'count': count, 'active': value == selected,
+                         'url': _index_url(args, key, None if value == selected else value)}
+                        for value, label, count in shown],
+        })
+    return groups
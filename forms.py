@@ -3,6 +3,13 @@ from wtforms import StringField, TextAreaField, IntegerField, DecimalField, Sele
 from wtforms.validators import DataRequired, Length, Optional, NumberRange, Regexp
 from models import ImpresionChoice, ColorsChoice
 from email_validator import validate_email, EmailNotValidError
+
+
+def choice_id(value):
+    """SelectField coerce for foreign key choices; the placeholder option becomes None"""
+    return int(value) if value not in ('', None) else None
+
+
 class ProductForm(FlaskForm):
     """Form for creating and editing products"""
 
@@ -34,12 +41,14 @@ class ProductForm(FlaskForm):
     impresion = SelectField(
         'Tipo de Impresión',
         choices=[],  # Will be populated dynamically
+        coerce=choice_id,
         validators=[DataRequired(message='Seleccione una opción')]
     )
 
     colores = SelectField(
         'Color',
         choices=[],  # Will be populated dynamically
+        coerce=choice_id,
         validators=[DataRequired(message='Seleccione un color')]
     )
 
@@ -86,8 +95,10 @@ class ProductForm(FlaskForm):
         self.colores.choices = ColorsChoice.get_choices()
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField
+from flask_wtf.file import FileField, FileAllowed, FileRequired
+from wtforms import StringField, SelectField, SubmitField
 from wtforms.validators import Optional, Length, Email
+from models import Customer, ImportJob
 
 class CustomerForm(FlaskForm):
     nombre_empresa = StringField(
@@ -115,4 +126,24 @@ class CustomerForm(FlaskForm):
         validators=[Optional(), Length(max=15)]
     )
 
-    submit = SubmitField('Guardar Cliente')
\ No newline at end of file
+    nivel_precio = SelectField(
+        'Lista de Precios',
+        choices=[(tier, label) for tier, (label, _) in Customer.TIERS.items()],
+        default='unitario'
+    )
+
+    submit = SubmitField('Guardar Cliente')
+
+
+class ImportForm(FlaskForm):
+    """Catalog upload, imported in the background by import_jobs.py"""
+
+    archivo = FileField(
+        'Archivo (.csv o .xlsx)',
+        validators=[FileRequired(message='Seleccione un archivo'),
+                    FileAllowed(['csv', 'xlsx'], message='Solo archivos .csv o .xlsx')]
+    )
+
+    modo = SelectField('Modo', choices=list(ImportJob.MODES.items()), default='nuevos')
+
+    submit = SubmitField('Importar')
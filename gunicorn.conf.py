@@ -0,0 +1,28 @@
+"""
+Gunicorn settings, read with: gunicorn -c gunicorn.conf.py wsgi:app
+
+WEB_CONCURRENCY and WEB_THREADS are also used by db_pool.engine_options()
+to size each worker's connection pool, so keep them in the environment
+rather than passing -w / --threads on the command line.
+"""
+
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+# Thread budget: an open import progress page holds one thread while it
+# streams (Server-Sent Events). import_jobs.py lets each worker stream to at
+# most threads // 2 pages, for up to 60 s before the browser reconnects, so
+# the other half always serves normal requests.
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+keepalive = 5
+
+# Recycle workers now and then so a slow leak can't grow forever
+max_requests = 2000
+max_requests_jitter = 200
+
+# Requests are logged by the app itself (logs.py, JSON with route, duration and
+# query count); set GUNICORN_ACCESSLOG=- to also get gunicorn's access log
+accesslog = os.getenv('GUNICORN_ACCESSLOG')
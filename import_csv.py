@@ -1,38 +1,139 @@
 """
 CSV Import Script for Flask Price List Application
-Imports products from CSV file to MySQL database
+Imports products from a CSV or Excel (.xlsx) file to MySQL database
 """
 
-import csv
+import logging
+import math
 import sys
 import os
-from decimal import Decimal, InvalidOperation
+import unicodedata
 from datetime import datetime
-import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from decimal import Decimal, InvalidOperation
 from dotenv import load_dotenv
+from sqlalchemy import delete, exists, func, insert, literal, select, update
 
 # Load environment variables
 load_dotenv()
 
 # Import models
-from models import db, Product
-from app import app
+from models import db, Product, ProductStaging, ProductTierPrice, ImpresionChoice, ColorsChoice, CatalogVersion
+from app import create_app
+import price_checks
+
+# pandas is imported inside read_csv(): it takes longer to import than
+# the rest of the app combined, and the menu path never needs it.
+# openpyxl likewise, inside read_xlsx().
+
+log = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['clave_producto', 'nombre_producto', 'precio_unitario']
+
+# File header (lowercased, without accents, spaces as _) -> importer column.
+# Headers not listed here are used as they are; products_template.csv and the
+# supplier spreadsheets use the names on the left.
+COLUMN_ALIASES = {
+    'producto': 'clave_producto',
+    'clave': 'clave_producto',
+    'nombre': 'nombre_producto',
+    'tipo_producto': 'nombre_producto',
+    'precio_promocion7': 'precio_promocion',
+    'disponible': 'available',
+}
+
+# products_staging choice name column -> (products id column, choice model)
+STAGED_CHOICES = {
+    'impresion': ('impresion_id', ImpresionChoice),
+    'colores': ('colores_id', ColorsChoice),
+}
+
+# Columns copied as they are from products_staging into products by swap_staged()
+STAGED_COLUMNS = [c.name for c in ProductStaging.__table__.columns if c.name not in ('id', *STAGED_CHOICES)]
+
+STAGING_BATCH = 1000  # rows per INSERT into products_staging
+
+PROGRESS_EVERY = 500  # rows between progress callbacks
+
+ERROR_EXAMPLES = 5  # claves listed per failed price check of a whole file
+
+
+def is_blank(value):
+    """True for None, empty strings and the NaN pandas uses for empty cells"""
+    if value is None or value == '':
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+
+def column_name(header, aliases=COLUMN_ALIASES):
+    """The importer column a file header maps to, None for an empty header"""
+    if is_blank(header):
+        return None
+    name = unicodedata.normalize('NFKD', str(header)).encode('ascii', 'ignore').decode('ascii')
+    name = '_'.join(name.strip().lower().split())
+    return aliases.get(name, name)
 
 
 class CSVImporter:
     """Handle CSV import operations"""
 
-    def __init__(self):
+    # Other importers (customer_import.py) reuse the file reading with their own columns
+    required_columns = REQUIRED_COLUMNS
+    column_aliases = COLUMN_ALIASES
+
+    def __init__(self, app=None, verbose=True, progress=None):
+        self.app = app
+        self.verbose = verbose  # False: no per-row output, for imports run from the web
+        self.progress = progress  # called with the importer every PROGRESS_EVERY rows
+        self.processed = 0
         self.imported = 0
         self.skipped = 0
         self.errors = 0
+        self.warnings = 0
         self.error_details = []
+        self.failure = None  # why the import stopped, when it returns False
+        self.choice_ids = {}  # (model, lowercased nombre) -> id
+
+    def say(self, message=''):
+        if self.verbose:
+            print(message)
+
+    def fail(self, message):
+        """Record why the import stopped; printed, or logged when not verbose"""
+        self.failure = message
+        if self.verbose:
+            print(f"\n❌ {message}")
+        else:
+            log.error("Import failed: %s", message)
+        return False
+
+    def count_row(self):
+        self.processed += 1
+        if self.progress is not None and self.processed % PROGRESS_EVERY == 0:
+            self.progress(self)
+
+    def choice_id(self, model, value):
+        """Id of the choice named value, creating it if the catalog doesn't have it yet"""
+        nombre = self.clean_string(value)
+        if nombre is None:
+            return None
+
+        if not self.choice_ids:
+            for m in (ImpresionChoice, ColorsChoice):
+                for c_id, c_nombre in db.session.query(m.id, m.nombre):
+                    self.choice_ids[(m, c_nombre.strip().lower())] = c_id
+
+        key = (model, nombre.lower())
+        if key not in self.choice_ids:
+            choice = model(nombre=nombre, activo=True, orden=0)
+            db.session.add(choice)
+            db.session.flush()
+            self.choice_ids[key] = choice.id
+            log.info("New %s '%s'", model.__tablename__, nombre)
+        return self.choice_ids[key]
 
     def clean_decimal(self, value):
         """Convert value to Decimal, handling various formats"""
-        if pd.isna(value) or value == '' or value is None:
+        if is_blank(value):
             return None
 
         try:
@@ -45,7 +146,7 @@ class CSVImporter:
 
     def clean_integer(self, value):
         """Convert value to integer"""
-        if pd.isna(value) or value == '' or value is None:
+        if is_blank(value):
             return None
 
         try:
@@ -55,13 +156,13 @@ class CSVImporter:
 
     def clean_string(self, value):
         """Clean string value"""
-        if pd.isna(value) or value is None:
+        if is_blank(value):
             return None
         return str(value).strip() if str(value).strip() != '' else None
 
     def clean_boolean(self, value):
         """Convert value to boolean"""
-        if pd.isna(value) or value == '' or value is None:
+        if is_blank(value):
             return True  # Default to available
 
         if isinstance(value, bool):
@@ -70,80 +171,219 @@ class CSVImporter:
         value_str = str(value).lower().strip()
         return value_str in ['yes', 'sí', 'si', 'true', '1', 'disponible', 'available']
 
+    def read_csv(self, csv_file_path):
+        """The CSV as a DataFrame, or None if it can't be read or lacks required columns"""
+        import pandas as pd
+
+        # Read CSV with pandas (handles encoding better)
+        self.say("\n📖 Reading CSV file...")
+
+        # Try different encodings
+        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
+        df = None
+
+        for encoding in encodings:
+            try:
+                df = pd.read_csv(csv_file_path, encoding=encoding)
+                self.say(f"✓ Successfully read with {encoding} encoding")
+                break
+            except UnicodeDecodeError:
+                continue
+
+        if df is None:
+            self.fail("Could not read CSV file with any encoding")
+            return None
+
+        self.say(f"✓ Found {len(df)} rows")
+
+        # Display column names
+        self.say(f"\n📋 Columns found: {list(df.columns)}")
+
+        df = df.rename(columns=lambda header: column_name(header, self.column_aliases))
+        if self.missing_columns(df.columns):
+            return None
+
+        return df
+
+    def missing_columns(self, columns):
+        missing = [col for col in self.required_columns if col not in columns]
+        if missing:
+            self.fail(f"Missing required columns: {missing}")
+            self.say(f"   Required: {self.required_columns} (or {sorted(self.column_aliases)})")
+        return missing
+
+    def read_xlsx(self, xlsx_file_path):
+        """
+        (row number, {column: value}) for the rows of the first worksheet, or None
+
+        The workbook is opened read-only, which streams rows from the file
+        instead of building every cell in memory, so a 100k-row price list
+        costs about as much memory as one row.
+        """
+        from openpyxl import load_workbook
+
+        self.say("\n📖 Reading XLSX file...")
+        workbook = load_workbook(xlsx_file_path, read_only=True, data_only=True)
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()  # some exporters write a wrong sheet size
+        rows = sheet.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            self.fail("The worksheet is empty")
+            workbook.close()
+            return None
+
+        self.say(f"✓ Sheet '{sheet.title}'")
+        self.say(f"\n📋 Columns found: {[h for h in header if not is_blank(h)]}")
+
+        columns = [column_name(h, self.column_aliases) for h in header]
+        if self.missing_columns(columns):
+            workbook.close()
+            return None
+
+        def stream():
+            try:
+                for row_num, values in enumerate(rows, 2):
+                    if all(is_blank(v) for v in values):
+                        continue
+                    yield row_num, {c: v for c, v in zip(columns, values) if c}
+            finally:
+                workbook.close()
+
+        return stream()
+
+    def read_rows(self, file_path):
+        """(row number, row) pairs from a .xlsx or CSV file, or None if it can't be imported"""
+        if file_path.lower().endswith('.xlsx'):
+            return self.read_xlsx(file_path)
+
+        df = self.read_csv(file_path)
+        if df is None:
+            return None
+        # +2 because Excel/CSV rows start at 1 and we have header
+        return ((index + 2, row) for index, row in df.iterrows())
+
+    # Per-row messages go to the log, not stdout: writing a line per row is
+    # slower than importing it. The summary lists the first errors, and
+    # LOG_LEVELS=import_csv=DEBUG shows every row.
+
+    def error(self, message, level=logging.ERROR):
+        self.errors += 1
+        self.error_details.append(message)
+        log.log(level, message)
+
+    def warn(self, message):
+        """A price check that doesn't stop the row; listed with the errors, not counted as one"""
+        self.warnings += 1
+        self.error_details.append(f"Aviso: {message}")
+        log.warning(message)
+
+    def prices_ok(self, values, row_num):
+        """Run the price checks (price_checks.py) on one row; False if an error-level rule fails"""
+        ok = True
+        for code, severity, message in price_checks.check_values(values):
+            if severity == 'error':
+                self.error(f"Row {row_num}: {message} for '{values['clave_producto']}' ({code})")
+                ok = False
+            else:
+                self.warn(f"Row {row_num}: {message} for '{values['clave_producto']}' ({code})")
+        return ok
+
+    def check_staged_prices(self):
+        """Price checks over the whole staging table at once; False if any row breaks an error-level rule"""
+        checked, elapsed, results = price_checks.check_table(ProductStaging.__table__, limit=ERROR_EXAMPLES)
+        self.say(f"✓ Checked the prices of {checked} products in {elapsed:.0f} ms")
+        ok = True
+        for result in results:
+            claves = ', '.join(p['clave_producto'] for p in result['productos'])
+            more = f" and {result['total'] - ERROR_EXAMPLES} more" if result['total'] > ERROR_EXAMPLES else ''
+            message = f"{result['mensaje']} ({result['code']}): {result['total']} products, {claves}{more}"
+            if result['severidad'] == 'error':
+                self.error(message)
+                ok = False
+            else:
+                self.warn(message)
+        return ok
+
+    def row_values(self, row, row_num, clave):
+        """
+        Product column values for a CSV row, or None (error recorded) if it is invalid
+
+        impresion / colores are the names as in the file: resolve_choices()
+        turns them into ids once the row has passed every check, so a
+        rejected row never adds catalog entries.
+        """
+        # Prices (required: precio_unitario)
+        precio_unitario = self.clean_decimal(row['precio_unitario'])
+        if precio_unitario is None:
+            self.error(f"Row {row_num}: Invalid precio_unitario for '{clave}'")
+            return None
+
+        return {
+            'clave_producto': clave,
+            'tipo_producto': self.clean_string(row['nombre_producto']) or 'Sin nombre',
+            'descripcion': self.clean_string(row.get('descripcion')),
+            'medidas': self.clean_string(row.get('medidas')),
+            'material': self.clean_string(row.get('material')),
+            'empaque': self.clean_integer(row.get('empaque')),
+            'precio_unitario': precio_unitario,
+            'precio_mayorista': self.clean_decimal(row.get('precio_mayorista')),
+            'precio_cliente': self.clean_decimal(row.get('precio_cliente')),
+            'precio_promocion': self.clean_decimal(row.get('precio_promocion')),
+            'precio_cliente_mayorista': self.clean_decimal(row.get('precio_cliente_mayorista')),
+            'impresion': self.clean_string(row.get('impresion')),
+            'colores': self.clean_string(row.get('colores')),
+            'available': self.clean_boolean(row.get('available', True)),
+        }
+
+    def resolve_choices(self, values):
+        """Replace the impresion / colores names in row_values() by choice ids, creating new choices"""
+        values['impresion_id'] = self.choice_id(ImpresionChoice, values.pop('impresion'))
+        values['colores_id'] = self.choice_id(ColorsChoice, values.pop('colores'))
+        return values
+
     def import_from_csv(self, csv_file_path, skip_duplicates=True, update_existing=False):
         """
-        Import products from CSV file
+        Import products from a CSV or .xlsx file
 
         Args:
-            csv_file_path: Path to CSV file
+            csv_file_path: Path to CSV or .xlsx file
             skip_duplicates: Skip if clave_producto exists (default: True)
             update_existing: Update existing products (default: False)
         """
 
-        print("=" * 70)
-        print("CSV IMPORT TO MYSQL DATABASE")
-        print("=" * 70)
-        print(f"File: {csv_file_path}")
-        print(f"Skip duplicates: {skip_duplicates}")
-        print(f"Update existing: {update_existing}")
-        print("=" * 70)
+        self.say("=" * 70)
+        self.say("CSV IMPORT TO MYSQL DATABASE")
+        self.say("=" * 70)
+        self.say(f"File: {csv_file_path}")
+        self.say(f"Skip duplicates: {skip_duplicates}")
+        self.say(f"Update existing: {update_existing}")
+        self.say("=" * 70)
 
         # Check file exists
         if not os.path.exists(csv_file_path):
-            print(f"❌ Error: File not found: {csv_file_path}")
-            return False
+            return self.fail(f"Error: File not found: {csv_file_path}")
 
         try:
-            # Read CSV with pandas (handles encoding better)
-            print("\n📖 Reading CSV file...")
-
-            # Try different encodings
-            encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-            df = None
-
-            for encoding in encodings:
-                try:
-                    df = pd.read_csv(csv_file_path, encoding=encoding)
-                    print(f"✓ Successfully read with {encoding} encoding")
-                    break
-                except UnicodeDecodeError:
-                    continue
-
-            if df is None:
-                print("❌ Could not read CSV file with any encoding")
-                return False
-
-            print(f"✓ Found {len(df)} rows")
-
-            # Display column names
-            print(f"\n📋 Columns found: {list(df.columns)}")
-
-            # Required columns
-            required_columns = ['clave_producto', 'nombre_producto', 'precio_unitario']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-
-            if missing_columns:
-                print(f"❌ Missing required columns: {missing_columns}")
-                print(f"   Required: {required_columns}")
+            rows = self.read_rows(csv_file_path)
+            if rows is None:
                 return False
 
             # Import with Flask app context
+            app = self.app or create_app()
             with app.app_context():
-                print("\n🔄 Starting import...")
-                print("-" * 70)
-
-                for index, row in df.iterrows():
-                    row_num = index + 2  # +2 because Excel/CSV rows start at 1 and we have header
+                self.say("\n🔄 Starting import...")
+                self.say("-" * 70)
 
+                for row_num, row in rows:
+                    self.count_row()
                     try:
                         # Get clave_producto
                         clave = self.clean_string(row['clave_producto'])
 
                         if not clave:
-                            self.errors += 1
-                            error_msg = f"Row {row_num}: Missing clave_producto"
-                            self.error_details.append(error_msg)
-                            print(f"⚠️  {error_msg}")
+                            self.error(f"Row {row_num}: Missing clave_producto", level=logging.WARNING)
                             continue
 
                         # Check if product exists
@@ -152,45 +392,25 @@ class CSVImporter:
                         if existing_product:
                             if skip_duplicates and not update_existing:
                                 self.skipped += 1
-                                print(f"⊘  Row {row_num}: Skipped '{clave}' (already exists)")
+                                log.debug("Row %s: Skipped '%s' (already exists)", row_num, clave)
                                 continue
                             elif update_existing:
                                 product = existing_product
-                                print(f"🔄 Row {row_num}: Updating '{clave}'")
+                                log.debug("Row %s: Updating '%s'", row_num, clave)
                             else:
                                 self.skipped += 1
                                 continue
                         else:
                             product = Product()
-                            print(f"✓  Row {row_num}: Creating '{clave}'")
-
-                        # Set product data
-                        product.clave_producto = clave
-                        product.nombre_producto = self.clean_string(row['nombre_producto']) or 'Sin nombre'
-                        product.descripcion = self.clean_string(row.get('descripcion'))
-                        product.medidas = self.clean_string(row.get('medidas'))
-                        product.material = self.clean_string(row.get('material'))
-                        product.empaque = self.clean_integer(row.get('empaque'))
-                        product.impresion = self.clean_string(row.get('impresion'))
-                        product.colores = self.clean_string(row.get('colores'))
-
-                        # Prices (required: precio_unitario)
-                        precio_unitario = self.clean_decimal(row['precio_unitario'])
-                        if precio_unitario is None:
-                            self.errors += 1
-                            error_msg = f"Row {row_num}: Invalid precio_unitario for '{clave}'"
-                            self.error_details.append(error_msg)
-                            print(f"❌ {error_msg}")
-                            continue
+                            log.debug("Row %s: Creating '%s'", row_num, clave)
 
-                        product.precio_unitario = precio_unitario
-                        product.precio_mayorista = self.clean_decimal(row.get('precio_mayorista'))
-                        product.precio_cliente = self.clean_decimal(row.get('precio_cliente'))
-                        product.precio_promocion = self.clean_decimal(row.get('precio_promocion'))
-                        product.precio_cliente_mayorista = self.clean_decimal(row.get('precio_cliente_mayorista'))
+                        values = self.row_values(row, row_num, clave)
+                        if values is None or not self.prices_ok(values, row_num):
+                            continue
 
-                        # Availability
-                        product.available = self.clean_boolean(row.get('available', True))
+                        # Set product data; choices only now that the row is accepted
+                        for column, value in self.resolve_choices(values).items():
+                            setattr(product, column, value)
 
                         # Add to session
                         if not existing_product:
@@ -201,54 +421,221 @@ class CSVImporter:
                         # Commit every 50 records
                         if self.imported % 50 == 0:
                             db.session.commit()
-                            print(f"   💾 Committed {self.imported} products...")
+                            self.say(f"   💾 Committed {self.imported} products...")
 
                     except Exception as e:
-                        self.errors += 1
-                        error_msg = f"Row {row_num}: {str(e)}"
-                        self.error_details.append(error_msg)
-                        print(f"❌ {error_msg}")
+                        self.error(f"Row {row_num}: {str(e)}")
                         db.session.rollback()
+                        self.choice_ids = {}  # choices created since the last commit are gone
                         continue
 
                 # Final commit
                 try:
                     db.session.commit()
-                    print("\n💾 Final commit completed")
+                    self.say("\n💾 Final commit completed")
                 except Exception as e:
-                    print(f"❌ Final commit error: {e}")
                     db.session.rollback()
-                    return False
+                    return self.fail(f"Final commit error: {e}")
 
             # Print summary
             self.print_summary()
             return True
 
         except Exception as e:
-            print(f"\n❌ Import failed: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            self.fail(f"Import failed: {str(e)}")
+            log.exception("Import of %s failed", csv_file_path)
+            return False
+
+    def replace_from_csv(self, csv_file_path):
+        """
+        Replace the whole catalog with the CSV or .xlsx file
+
+        Valid rows are bulk-loaded into products_staging; products itself is
+        only touched by swap_staged(), a single transaction, so pages keep
+        serving the old catalog until it commits. New impresion / colores
+        names are created there too. Any invalid row aborts before the swap
+        and leaves the catalog, choices included, as it was.
+        """
+
+        self.say("=" * 70)
+        self.say("CSV CATALOG REPLACE")
+        self.say("=" * 70)
+        self.say(f"File: {csv_file_path}")
+        self.say("=" * 70)
+
+        if not os.path.exists(csv_file_path):
+            return self.fail(f"Error: File not found: {csv_file_path}")
+
+        try:
+            rows = self.read_rows(csv_file_path)
+            if rows is None:
+                return False
+
+            app = self.app or create_app()
+            with app.app_context():
+                self.say("\n📥 Loading staging table...")
+                ProductStaging.__table__.create(db.engine, checkfirst=True)  # databases from before init-db had it
+                db.session.execute(delete(ProductStaging))
+
+                batch, seen = [], set()
+                for row_num, row in rows:
+                    self.count_row()
+                    clave = self.clean_string(row['clave_producto'])
+                    if not clave:
+                        self.error(f"Row {row_num}: Missing clave_producto", level=logging.WARNING)
+                        continue
+                    if clave.lower() in seen:
+                        self.error(f"Row {row_num}: Duplicate clave_producto '{clave}'")
+                        continue
+
+                    values = self.row_values(row, row_num, clave)
+                    if values is None:
+                        continue
+
+                    seen.add(clave.lower())
+                    batch.append(values)  # choice names, resolved by swap_staged()
+                    if len(batch) >= STAGING_BATCH:
+                        db.session.execute(insert(ProductStaging), batch)
+                        self.say(f"   💾 Staged {len(seen)} products...")
+                        batch = []
+
+                if batch:
+                    db.session.execute(insert(ProductStaging), batch)
+                db.session.commit()
+                self.say(f"✓ Staged {len(seen)} products")
+
+                if self.errors:
+                    self.fail("Invalid rows found, the catalog was NOT replaced")
+                    self.print_summary()
+                    return False
+                if not seen:
+                    return self.fail("The file has no products, the catalog was NOT replaced")
+
+                self.say("\n🔍 Checking prices...")
+                if not self.check_staged_prices():
+                    self.fail("Prices failed the checks, the catalog was NOT replaced")
+                    self.print_summary()
+                    return False
+
+                self.say("\n🔀 Swapping catalog...")
+                if self.progress is not None:
+                    self.progress(self)
+                counts = swap_staged()
+
+            self.imported = len(seen)
+            self.say(f"✓ Updated: {counts['updated']}  New: {counts['inserted']}  "
+                  f"Deactivated: {counts['deactivated']}  New choices: {counts['choices']}")
+            self.print_summary()
+            return True
+
+        except Exception as e:
+            self.fail(f"Replace failed, the catalog was not changed: {str(e)}")
+            log.exception("Import of %s failed", csv_file_path)
             return False
 
     def print_summary(self):
         """Print import summary"""
-        print("\n" + "=" * 70)
-        print("IMPORT SUMMARY")
-        print("=" * 70)
-        print(f"✓ Successfully imported: {self.imported}")
-        print(f"⊘ Skipped (duplicates):  {self.skipped}")
-        print(f"❌ Errors:                {self.errors}")
-        print(f"📊 Total processed:       {self.imported + self.skipped + self.errors}")
-        print("=" * 70)
+        self.say("\n" + "=" * 70)
+        self.say("IMPORT SUMMARY")
+        self.say("=" * 70)
+        self.say(f"✓ Successfully imported: {self.imported}")
+        self.say(f"⊘ Skipped (duplicates):  {self.skipped}")
+        self.say(f"❌ Errors:                {self.errors}")
+        self.say(f"⚠️  Warnings:              {self.warnings}")
+        self.say(f"📊 Total processed:       {self.imported + self.skipped + self.errors}")
+        self.say("=" * 70)
 
         if self.error_details:
-            print("\n⚠️  ERROR DETAILS:")
-            print("-" * 70)
+            self.say("\n⚠️  ERROR DETAILS:")
+            self.say("-" * 70)
             for error in self.error_details[:10]:  # Show first 10 errors
-                print(f"  • {error}")
+                self.say(f"  • {error}")
 
             if len(self.error_details) > 10:
-                print(f"  ... and {len(self.error_details) - 10} more errors")
+                self.say(f"  ... and {len(self.error_details) - 10} more errors")
+
+
+def add_staged_choices(now):
+    """Create the impresion / colores choices named in products_staging that don't exist yet; returns how many"""
+    staging = ProductStaging.__table__
+    added = 0
+    for name_column, (_, model) in STAGED_CHOICES.items():
+        known = {n.strip().lower() for n in db.session.execute(select(model.nombre)).scalars()}
+        new = {}
+        for nombre in db.session.execute(
+            select(staging.c[name_column]).where(staging.c[name_column].isnot(None)).distinct()
+        ).scalars():
+            if nombre.lower() not in known:
+                new.setdefault(nombre.lower(), nombre)
+        if new:
+            db.session.execute(insert(model), [{'nombre': nombre, 'activo': True, 'orden': 0, 'created_at': now}
+                                               for nombre in new.values()])
+            added += len(new)
+    return added
+
+
+def staged_values():
+    """{products column: value from products_staging}, choice names looked up as ids"""
+    staging = ProductStaging.__table__
+    values = {column: staging.c[column] for column in STAGED_COLUMNS}
+    for name_column, (id_column, model) in STAGED_CHOICES.items():
+        choices = model.__table__
+        values[id_column] = (
+            select(func.min(choices.c.id))
+            .where(func.lower(func.trim(choices.c.nombre)) == func.lower(staging.c[name_column]))
+            .scalar_subquery()
+        )
+    return values
+
+
+def swap_staged():
+    """
+    Make products match products_staging in one transaction
+
+    Existing claves are updated, new ones inserted and products missing
+    from the staging table are deactivated, never deleted, so quotations
+    that reference them keep working. New impresion / colores names are
+    added to the choice tables in the same transaction, so an import that
+    stops before the swap leaves the catalog exactly as it was. Returns
+    the row counts.
+    """
+    products, staging = Product.__table__, ProductStaging.__table__
+    now = datetime.utcnow()
+
+    try:
+        choices = add_staged_choices(now)
+        values = staged_values()
+
+        updated = db.session.execute(
+            update(products)
+            .where(products.c.clave_producto == staging.c.clave_producto)
+            .values({**{column: value for column, value in values.items() if column != 'clave_producto'},
+                     'updated_at': now})
+        ).rowcount
+
+        new_rows = select(*values.values(), literal(now), literal(now)).where(
+            ~exists().where(products.c.clave_producto == staging.c.clave_producto)
+        )
+        inserted = db.session.execute(
+            insert(products).from_select([*values, 'created_at', 'updated_at'], new_rows)
+        ).rowcount
+
+        deactivated = db.session.execute(
+            update(products)
+            .where(products.c.available == True,
+                   ~exists().where(staging.c.clave_producto == products.c.clave_producto))
+            .values(available=False, updated_at=now)
+        ).rowcount
+
+        ProductTierPrice.rebuild(db.session.connection())
+        CatalogVersion.bump(db.session.connection())
+        db.session.execute(delete(staging))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {'updated': updated, 'inserted': inserted, 'deactivated': deactivated, 'choices': choices}
 
 
 def main():
@@ -264,49 +651,42 @@ def main():
     # Check if file exists
     if not os.path.exists(csv_file):
         print(f"❌ Error: File '{csv_file}' not found")
-        print(f"\nUsage: python import_csv.py [csv_file_path]")
+        print(f"\nUsage: python import_csv.py [csv_or_xlsx_file_path]")
         print(f"Example: python import_csv.py products.csv")
+        print(f"         python import_csv.py lista_proveedor.xlsx")
         sys.exit(1)
 
     # Options
     print("\n🔧 Import Options:")
     print("  1. Import new products only (skip duplicates)")
     print("  2. Import and update existing products")
-    print("  3. Replace all products (delete and reimport)")
+    print("  3. Replace catalog (products missing from the file are deactivated)")
 
     choice = input("\nSelect option (1-3) [default: 1]: ").strip() or '1'
 
     skip_duplicates = True
     update_existing = False
-    delete_all = False
+    replace = False
 
     if choice == '2':
         skip_duplicates = False
         update_existing = True
     elif choice == '3':
-        confirm = input("⚠️  This will DELETE all existing products. Continue? (yes/no): ")
+        confirm = input("⚠️  Products missing from the file will be DEACTIVATED. Continue? (yes/no): ")
         if confirm.lower() == 'yes':
-            delete_all = True
+            replace = True
         else:
             print("❌ Cancelled")
             sys.exit(0)
 
-    # Delete all if requested
-    if delete_all:
-        with app.app_context():
-            print("\n🗑️  Deleting all existing products...")
-            try:
-                deleted = Product.query.delete()
-                db.session.commit()
-                print(f"✓ Deleted {deleted} products")
-            except Exception as e:
-                print(f"❌ Error deleting products: {e}")
-                db.session.rollback()
-                sys.exit(1)
+    app = create_app()
 
     # Create importer and run
-    importer = CSVImporter()
-    success = importer.import_from_csv(csv_file, skip_duplicates, update_existing)
+    importer = CSVImporter(app)
+    if replace:
+        success = importer.replace_from_csv(csv_file)
+    else:
+        success = importer.import_from_csv(csv_file, skip_duplicates, update_existing)
 
     if success:
         print("\n✅ Import completed successfully!")
@@ -0,0 +1,175 @@
+"""
+Catalog imports started from the web
+
+The upload page saves the file and inserts an ImportJob row. A background
+thread in the same process runs CSVImporter on the file and writes its
+counters to the row every PROGRESS_EVERY rows (import_csv.py). The status
+page follows the row over Server-Sent Events (events()). The state lives
+in the database, so any worker can serve the stream and the upload
+request returns as soon as the file is saved.
+
+Only one import runs at a time, since they share products_staging. A new
+job is inserted holding running_slot = 1, which has a unique index. If
+two uploads arrive together, only one INSERT succeeds, whichever worker
+handles them. The slot is released (NULL) when the job finishes or is
+found stale.
+
+A progress stream keeps one of the worker's WEB_THREADS busy. Each
+worker serves at most half of its threads as streams, and each stream
+ends after STREAM_SECONDS. EventSource reconnects by itself, so the page
+doesn't notice. A stream refused because the worker is at its limit asks
+the browser to retry a little later.
+
+The job is a thread of the web worker that received the upload. If that
+worker exits (deploy, gunicorn max_requests) the import stops, its
+heartbeat (updated_at) goes stale and after STALE_SECONDS it is marked as
+failed.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ImportJob
+
+RUNNING = ('En cola', 'Importando')
+
+STALE_SECONDS = 600  # no progress for this long: the worker running the job is gone
+POLL_SECONDS = 1
+STREAM_SECONDS = 60  # then the stream closes and EventSource reconnects
+RETRY_MS = 3000  # reconnect delay sent when this worker already serves its share of streams
+ERROR_LINES = 20  # errors kept on the job row
+
+
+def expire_stale():
+    """Mark jobs whose worker died as failed"""
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+    db.session.execute(
+        update(ImportJob)
+        .where(ImportJob.status.in_(RUNNING), ImportJob.updated_at < cutoff)
+        .values(status='Fallida', mensaje='Interrumpida: el proceso que importaba se detuvo',
+                finished_at=datetime.utcnow(), running_slot=None)
+    )
+    db.session.commit()
+
+
+def running_job():
+    """The import in progress, if any; only one runs at a time since they share products_staging"""
+    expire_stale()
+    return ImportJob.query.filter(ImportJob.status.in_(RUNNING)).order_by(ImportJob.id.desc()).first()
+
+
+def start(upload, modo):
+    """
+    Claim the import slot, save the uploaded file and import it in a background thread
+
+    Returns the new ImportJob, or None if another import holds the slot.
+    """
+    expire_stale()
+    job = ImportJob(archivo=upload.filename[:255], modo=modo, running_slot=1)
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:  # running_slot is taken: another import is running
+        db.session.rollback()
+        return None
+
+    try:
+        suffix = os.path.splitext(upload.filename)[1].lower()
+        fd, path = tempfile.mkstemp(prefix='import_', suffix=suffix)
+        with os.fdopen(fd, 'wb') as f:
+            upload.save(f)
+    except Exception as e:
+        job.status, job.mensaje, job.finished_at, job.running_slot = 'Fallida', str(e)[:255], datetime.utcnow(), None
+        db.session.commit()
+        raise
+
+    app = current_app._get_current_object()
+    threading.Thread(target=run, args=(app, job.id, path, modo), name=f'import-{job.id}', daemon=True).start()
+    return job
+
+
+def save_progress(job_id, importer, **values):
+    """Copy the importer's counters to the job row and commit"""
+    db.session.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id)
+        .values(procesadas=importer.processed, importadas=importer.imported, omitidas=importer.skipped,
+                errores=importer.errors,
+                detalle_errores='\n'.join(importer.error_details[:ERROR_LINES]) or None,
+                updated_at=datetime.utcnow(), **values)
+    )
+    db.session.commit()
+
+
+def run(app, job_id, path, modo):
+    """Thread body: import the file, then record the outcome and delete it"""
+    from import_csv import CSVImporter  # import_csv imports the app module
+
+    # The importer calls progress inside its own app context, so this commits on its session
+    importer = CSVImporter(app, verbose=False, progress=lambda imp: save_progress(job_id, imp))
+    try:
+        with app.app_context():
+            save_progress(job_id, importer, status='Importando', started_at=datetime.utcnow())
+
+        if modo == 'reemplazar':
+            ok = importer.replace_from_csv(path)
+        else:
+            ok = importer.import_from_csv(path, skip_duplicates=(modo == 'nuevos'),
+                                         update_existing=(modo == 'actualizar'))
+    except Exception as e:
+        ok = importer.fail(f"Import failed: {e}")
+    finally:
+        os.remove(path)
+
+    with app.app_context():
+        save_progress(job_id, importer, status='Terminada' if ok else 'Fallida',
+                      mensaje=importer.failure[:255] if importer.failure else None,
+                      finished_at=datetime.utcnow(), running_slot=None)
+
+
+_streams = None
+_streams_lock = threading.Lock()
+
+
+def _stream_slots():
+    """This worker's semaphore of progress streams: half its threads, so pages still get the rest"""
+    global _streams
+    with _streams_lock:
+        if _streams is None:
+            _streams = threading.BoundedSemaphore(max(1, current_app.config['WEB_THREADS'] // 2))
+    return _streams
+
+
+def events(job_id):
+    """SSE stream of the job's to_dict(), every POLL_SECONDS until it finishes or STREAM_SECONDS pass"""
+    slots = _stream_slots()
+    if not slots.acquire(blocking=False):
+        yield f"retry: {RETRY_MS}\n\n"  # this worker is busy streaming; the browser reconnects later
+        return
+
+    try:
+        started = time.monotonic()
+        while time.monotonic() - started < STREAM_SECONDS:
+            job = db.session.get(ImportJob, job_id)
+            if job is None:
+                return
+            if not job.finished and job.updated_at < datetime.utcnow() - timedelta(seconds=STALE_SECONDS):
+                expire_stale()
+                continue
+            data = job.to_dict()
+            db.session.rollback()  # end the read transaction, or the next poll sees the same snapshot
+
+            yield f"data: {json.dumps(data)}\n\n"
+            if data['finished']:
+                return
+            time.sleep(POLL_SECONDS)
+    finally:
+        slots.release()
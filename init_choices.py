@@ -2,7 +2,7 @@
 Initialize choice tables with default values
 """
 
-from app import app
+from app import create_app
 from models import db, ImpresionChoice, ColorsChoice
 
 
@@ -95,7 +95,7 @@ def main():
     print("INITIALIZING CHOICE TABLES")
     print("=" * 60)
 
-    with app.app_context():
+    with create_app().app_context():
         # Create tables if they don't exist
         db.create_all()
 
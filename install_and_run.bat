@@ -38,6 +38,14 @@ if not exist ".env" (
     echo ✅ .env file created
 )
 
+REM Build CSS/JS bundles (works offline, sources are in static\vendor)
+echo 🎨 Building static assets...
+python build_assets.py
+
+REM Create database tables
+echo 🗄️  Creating database tables...
+flask --app app init-db
+
 echo.
 echo ✅ Setup complete!
 echo.
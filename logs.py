@@ -0,0 +1,145 @@
+"""
+Logging that stays off the request path
+
+Handlers that write to a terminal or a file block the thread that logs
+until the write finishes. Here every logger in the process goes through
+one QueueHandler: a log call only formats the message and appends it to
+an in-memory queue. A QueueListener thread takes records off the queue
+and does the writing (stderr, or LOG_FILE).
+
+Every request is logged once, by the 'request' logger, with its method,
+route, endpoint, status, duration in ms and number of SQL statements.
+With LOG_FORMAT=json (the default) each record is one JSON object per
+line, so the request fields can be filtered and aggregated. LOG_FORMAT=text
+is easier to read while developing.
+
+Levels: LOG_LEVEL for everything, LOG_LEVELS to override per logger
+(module name), e.g.
+    LOG_LEVELS=request=WARNING,import_csv=DEBUG,sqlalchemy.engine=INFO
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+log = logging.getLogger('request')
+
+# Attributes every LogRecord has; anything else was passed with extra= and goes in the output
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves the formatting to the listener thread
+
+    The stock prepare() formats the message and copies the record in the
+    logging thread. Only tracebacks need that, since they reference live
+    frames; other arguments are formatted later, so log calls must not pass
+    objects that change afterwards.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            return super().prepare(record)
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and the extra= fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure(config):
+    """Route every logger through the queue; once per process, later calls only update the levels"""
+    global _listener
+
+    root = logging.getLogger()
+    root.setLevel(config['LOG_LEVEL'])
+    for name, level in config['LOG_LEVELS'].items():
+        logging.getLogger(name).setLevel(level)
+
+    if _listener is not None:
+        return
+
+    if config['LOG_FILE']:
+        handler = logging.handlers.WatchedFileHandler(config['LOG_FILE'], encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    if config['LOG_FORMAT'] == 'json':
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(name)s: %(message)s'))
+
+    records = queue.SimpleQueue()  # unbounded: a log call never waits for the writer
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(DeferredQueueHandler(records))
+
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # writes what is still queued
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+    g.query_count = 0
+
+
+def _log_request(response):
+    if log.isEnabledFor(logging.INFO):
+        duration = (time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000
+        req = request._get_current_object()
+        method, path, status = req.method, req.path, response.status_code
+        log.info('%s %s %s %.1fms', method, path, status, duration, extra={
+            'method': method,
+            'path': path,
+            'route': req.url_rule.rule if req.url_rule else None,
+            'endpoint': req.endpoint,
+            'status': status,
+            'duration_ms': round(duration, 2),
+            'queries': g.get('query_count', 0),
+        })
+    return response
+
+
+def count_queries(engine):
+    """Count the statements each request runs on this engine, for the request log"""
+    if not event.contains(engine, 'before_cursor_execute', _count_query):
+        event.listen(engine, 'before_cursor_execute', _count_query)
+
+
+def init_app(app):
+    """
+    Call first in create_app: before anything logs, so Flask doesn't add its
+    own stderr handler to app.logger, and before the other after_request
+    hooks, which then run before this one and count in the duration.
+    """
+    configure(app.config)
+    app.before_request(_start_timer)
+    app.after_request(_log_request)
@@ -2,8 +2,8 @@
 Command-line tool to manage dropdown choices
 """
 
-from app import app
-from models import db, ImpresionChoice, ColorsChoice
+from app import create_app
+from models import db, Product, ImpresionChoice, ColorsChoice
 
 
 def list_impresion_choices():
@@ -149,6 +149,12 @@ def delete_choice(choice_type):
         print("❌ Choice not found")
         return
 
+    column = Product.impresion_id if choice_type == 'impresion' else Product.colores_id
+    in_use = Product.query.filter(column == choice.id).count()
+    if in_use:
+        print(f"❌ '{choice.nombre}' is used by {in_use} products, deactivate it instead")
+        return
+
     confirm = input(f"Delete '{choice.nombre}'? (yes/no): ").strip().lower()
 
     if confirm == 'yes':
@@ -206,5 +212,5 @@ def main_menu():
 
 
 if __name__ == '__main__':
-    with app.app_context():
+    with create_app().app_context():
         main_menu()
\ No newline at end of file
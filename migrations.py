@@ -0,0 +1,324 @@
+"""
+Schema upgrades for existing databases
+
+db.create_all() only creates missing tables; it never adds columns or
+indexes to tables that already exist. Every migration below checks the
+live schema first, so upgrade() is safe to run any number of times.
+It runs as part of `flask --app app init-db`.
+"""
+
+from sqlalchemy import bindparam, func, inspect, select, text
+
+import analytics
+import customer_search
+from models import (db, CatalogVersion, Customer, CustomerPrice, CustomerTrigram, ImportJob, Product,
+                    ProductStaging, ProductTierPrice, Quotation, QuotationArchive, QuotationDetail,
+                    QuotationDetailArchive, QuotationTemplate, QuotationTemplateDetail, RollupCustomerMonth,
+                    ScheduledJob)
+
+
+def _columns(conn, table):
+    return {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def _create_missing_indexes(conn, model):
+    """Create the indexes declared on the model that the table doesn't have yet"""
+    existing = {i['name'] for i in inspect(conn).get_indexes(model.__tablename__)}
+    created = False
+    for index in model.__table__.indexes:
+        if index.name not in existing:
+            index.create(conn)
+            created = True
+    return created
+
+
+def _add_days(conn, date_column, days_column):
+    """SQL for date_column + days_column days in the connection's dialect"""
+    if conn.dialect.name == 'sqlite':
+        return f"datetime({date_column}, '+' || {days_column} || ' days')"
+    return f"DATE_ADD({date_column}, INTERVAL {days_column} DAY)"
+
+
+def _add_foreign_key_column(conn, table, column, ref_table):
+    """Nullable INTEGER column referencing ref_table.id"""
+    if conn.dialect.name == 'sqlite':
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER REFERENCES {ref_table} (id)'))
+    else:  # MySQL parses but ignores an inline REFERENCES, the constraint must be explicit
+        conn.execute(text(
+            f'ALTER TABLE {table} ADD COLUMN {column} INTEGER NULL, '
+            f'ADD CONSTRAINT fk_{table}_{column} FOREIGN KEY ({column}) REFERENCES {ref_table} (id)'
+        ))
+
+
+def add_quotation_version(conn):
+    """quotations.version, the optimistic lock used by the builder API"""
+    if 'version' in _columns(conn, 'quotations'):
+        return False
+
+    conn.execute(text('ALTER TABLE quotations ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+    return True
+
+
+def add_quotation_vence_en(conn):
+    """quotations.vence_en, backfilled in one UPDATE, plus the listing indexes"""
+    changed = False
+
+    if 'vence_en' not in _columns(conn, 'quotations'):
+        conn.execute(text('ALTER TABLE quotations ADD COLUMN vence_en DATETIME'))
+        conn.execute(text(
+            'UPDATE quotations SET vence_en = '
+            + _add_days(conn, 'fecha', 'COALESCE(vigencia_dias, 15)')
+            + ' WHERE fecha IS NOT NULL'
+        ))
+        changed = True
+
+    return _create_missing_indexes(conn, Quotation) or changed
+
+
+def normalize_product_choices(conn):
+    """products.impresion / colores text -> impresion_id / colores_id foreign keys
+
+    Names that aren't in the choice tables yet are added to them first, so
+    no product loses its value. The backfill is one UPDATE per column, then
+    the text columns are dropped.
+    """
+    changed = False
+
+    for text_column, id_column, choice_table in (('impresion', 'impresion_id', 'impresion_choice'),
+                                                 ('colores', 'colores_id', 'colors_choice')):
+        columns = _columns(conn, 'products')
+        if id_column not in columns:
+            _add_foreign_key_column(conn, 'products', id_column, choice_table)
+            changed = True
+
+        if text_column not in columns:
+            continue
+
+        known = {n.strip().lower() for n in conn.execute(text(f'SELECT nombre FROM {choice_table}')).scalars()}
+        used = conn.execute(text(
+            f"SELECT DISTINCT TRIM({text_column}) FROM products WHERE TRIM({text_column}) <> ''"
+        )).scalars()
+        for nombre in used:
+            if nombre.lower() not in known:
+                known.add(nombre.lower())
+                conn.execute(text(f'INSERT INTO {choice_table} (nombre, activo, orden) VALUES (:nombre, 1, 0)'),
+                             {'nombre': nombre})
+
+        conn.execute(text(
+            f'UPDATE products SET {id_column} = ('
+            f'SELECT MIN(c.id) FROM {choice_table} c WHERE LOWER(c.nombre) = LOWER(TRIM(products.{text_column}))'
+            f') WHERE {id_column} IS NULL AND {text_column} IS NOT NULL'
+        ))
+        conn.execute(text(f'ALTER TABLE products DROP COLUMN {text_column}'))
+        changed = True
+
+    return _create_missing_indexes(conn, Product) or changed
+
+
+def add_product_facets(conn):
+    """catalog_version row and the indexes behind the product list facet filters"""
+    changed = False
+
+    CatalogVersion.__table__.create(conn, checkfirst=True)
+    if conn.execute(text('SELECT COUNT(*) FROM catalog_version')).scalar() == 0:
+        conn.execute(db.insert(CatalogVersion).values(id=1, version=1))
+        changed = True
+
+    return _create_missing_indexes(conn, Product) or changed
+
+
+def add_quotation_detail_product_id(conn):
+    """quotation_details.product_id -> products.id, backfilled from clave_producto
+
+    clave_producto stays as the clave at quoting time. On MySQL its foreign
+    key is dropped (renaming a product no longer touches old quotations)
+    and it is widened to products.clave_producto's length.
+    """
+    changed = False
+
+    if 'product_id' not in _columns(conn, 'quotation_details'):
+        _add_foreign_key_column(conn, 'quotation_details', 'product_id', 'products')
+        if conn.dialect.name == 'sqlite':
+            conn.execute(text(
+                'UPDATE quotation_details SET product_id = ('
+                'SELECT p.id FROM products p WHERE p.clave_producto = quotation_details.clave_producto'
+                ') WHERE product_id IS NULL AND clave_producto IS NOT NULL'
+            ))
+        else:
+            conn.execute(text(
+                'UPDATE quotation_details d JOIN products p ON p.clave_producto = d.clave_producto '
+                'SET d.product_id = p.id WHERE d.product_id IS NULL'
+            ))
+        changed = True
+
+    if conn.dialect.name != 'sqlite':
+        for fk in inspect(conn).get_foreign_keys('quotation_details'):
+            if fk['constrained_columns'] == ['clave_producto']:
+                conn.execute(text(f"ALTER TABLE quotation_details DROP FOREIGN KEY {fk['name']}"))
+                conn.execute(text('ALTER TABLE quotation_details MODIFY clave_producto VARCHAR(100)'))
+                changed = True
+
+    return _create_missing_indexes(conn, QuotationDetail) or changed
+
+
+def add_customer_price_tiers(conn):
+    """customers.nivel_precio, the customer_prices overrides and the filled product_tier_prices matrix"""
+    changed = False
+
+    if 'nivel_precio' not in _columns(conn, 'customers'):
+        conn.execute(text("ALTER TABLE customers ADD COLUMN nivel_precio VARCHAR(20) NOT NULL DEFAULT 'unitario'"))
+        changed = True
+
+    CustomerPrice.__table__.create(conn, checkfirst=True)
+    ProductTierPrice.__table__.create(conn, checkfirst=True)
+    empty = conn.execute(text('SELECT COUNT(*) FROM product_tier_prices')).scalar() == 0
+    if empty and conn.execute(text('SELECT COUNT(*) FROM products')).scalar() > 0:
+        ProductTierPrice.rebuild(conn)
+        changed = True
+
+    return changed
+
+
+def add_import_jobs(conn):
+    """import_jobs, the progress of web uploads"""
+    if inspect(conn).has_table('import_jobs'):
+        return False
+    ImportJob.__table__.create(conn)
+    return True
+
+
+def add_import_running_slot(conn):
+    """import_jobs.running_slot and its unique index, the one-import-at-a-time claim"""
+    if 'running_slot' in _columns(conn, 'import_jobs'):
+        return False
+    conn.execute(text('ALTER TABLE import_jobs ADD COLUMN running_slot INTEGER'))
+    conn.execute(text('CREATE UNIQUE INDEX uq_import_jobs_running_slot ON import_jobs (running_slot)'))
+    return True
+
+
+def stage_choice_names(conn):
+    """products_staging keeps impresion / colores names (resolved by import_csv.swap_staged()), not ids"""
+    if not inspect(conn).has_table('products_staging') or 'impresion' in _columns(conn, 'products_staging'):
+        return False
+    # Only holds rows while a replace-all import runs, so it can be recreated
+    conn.execute(text('DROP TABLE products_staging'))
+    ProductStaging.__table__.create(conn)
+    return True
+
+
+def add_quotation_archive(conn):
+    """quotations_archive / quotation_details_archive, filled by archive.py"""
+    changed = False
+    for model in (QuotationArchive, QuotationDetailArchive):
+        if not inspect(conn).has_table(model.__tablename__):
+            model.__table__.create(conn)
+            changed = True
+    return changed
+
+
+def add_analytics_rollups(conn):
+    """rollup_* tables (analytics.py), filled from the existing quotations"""
+    changed = _create_missing_indexes(conn, Quotation)
+    for model, _ in analytics.ROLLUPS.values():
+        if not inspect(conn).has_table(model.__tablename__):
+            model.__table__.create(conn)
+            changed = True
+    empty = conn.execute(select(func.count()).select_from(RollupCustomerMonth)).scalar() == 0
+    quoted = any(conn.execute(select(func.count()).select_from(model)).scalar()
+                 for model in (QuotationDetail, QuotationDetailArchive))
+    if empty and quoted:
+        analytics.rebuild(conn)
+        changed = True
+    return changed
+
+
+def normalize_customer_lookups(conn):
+    """Customer rfc / email in their normalized form (Customer.normalize_*), then indexed"""
+    customers = Customer.__table__
+    changed = [
+        {'cid': customer_id, 'new_rfc': Customer.normalize_rfc(rfc), 'new_email': Customer.normalize_email(email)}
+        for customer_id, rfc, email in conn.execute(select(customers.c.customer_id, customers.c.rfc, customers.c.email))
+        if (rfc, email) != (Customer.normalize_rfc(rfc), Customer.normalize_email(email))
+    ]
+    if changed:
+        conn.execute(
+            customers.update().where(customers.c.customer_id == bindparam('cid'))
+            .values(rfc=bindparam('new_rfc'), email=bindparam('new_email')),
+            changed,
+        )
+    return _create_missing_indexes(conn, Customer) or bool(changed)
+
+
+def add_customer_search(conn):
+    """customer_trigrams, filled from the existing customers"""
+    changed = False
+    if not inspect(conn).has_table(CustomerTrigram.__tablename__):
+        CustomerTrigram.__table__.create(conn)
+        changed = True
+    if conn.execute(select(func.count()).select_from(CustomerTrigram)).scalar() == 0:
+        changed = customer_search.rebuild(conn) > 0 or changed
+    return changed
+
+
+def add_quotation_templates(conn):
+    """quotation_templates / quotation_template_details, see quotation_copy.py"""
+    changed = False
+    for model in (QuotationTemplate, QuotationTemplateDetail):
+        if not inspect(conn).has_table(model.__tablename__):
+            model.__table__.create(conn)
+            changed = True
+    return changed
+
+
+def add_quotation_expiration(conn):
+    """'Vencida' in the status ENUM of quotations / quotations_archive (MySQL), and scheduled_jobs"""
+    changed = False
+    if conn.dialect.name == 'mysql':  # SQLite stores the Enum as a VARCHAR without a CHECK
+        values = ', '.join(f"'{status}'" for status in Quotation.STATUSES)
+        for table in ('quotations', 'quotations_archive'):
+            status = next(c for c in inspect(conn).get_columns(table) if c['name'] == 'status')
+            if set(Quotation.STATUSES) - set(getattr(status['type'], 'enums', ())):
+                conn.execute(text(f'ALTER TABLE {table} MODIFY status ENUM({values}) NULL'))
+                changed = True
+    if not inspect(conn).has_table(ScheduledJob.__tablename__):
+        ScheduledJob.__table__.create(conn)
+        changed = True
+    return changed
+
+
+# In the order they must run
+MIGRATIONS = [
+    add_quotation_version,
+    add_quotation_vence_en,
+    normalize_product_choices,
+    add_product_facets,
+    add_quotation_detail_product_id,
+    add_customer_price_tiers,
+    add_import_jobs,
+    add_import_running_slot,
+    stage_choice_names,
+    add_quotation_archive,
+    add_analytics_rollups,
+    normalize_customer_lookups,
+    add_customer_search,
+    add_quotation_templates,
+    add_quotation_expiration,
+]
+
+
+def upgrade():
+    """Apply pending migrations; returns the names of the ones that ran"""
+    applied = []
+    with db.engine.begin() as conn:
+        for migration in MIGRATIONS:
+            if migration(conn):
+                applied.append(migration.__name__)
+    return applied
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    with create_app().app_context():
+        for name in upgrade() or ['(nothing to do)']:
+            print(f"  ✓ {name}")
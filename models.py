@@ -1,21 +1,58 @@
+import re
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta
 
-db = SQLAlchemy()
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Customer(db.Model):
     __tablename__ = 'customers'  # IMPORTANT: matches existing table name
 
+    # nivel_precio -> (label, Product price columns tried in order until one is set).
+    # precio_unitario is NOT NULL, so every chain ends there.
+    TIERS = {
+        'unitario': ('Unitario', ('precio_unitario',)),
+        'mayorista': ('Mayorista', ('precio_mayorista', 'precio_unitario')),
+        'cliente': ('Cliente', ('precio_cliente', 'precio_unitario')),
+        'promocion': ('Promoción', ('precio_promocion', 'precio_cliente', 'precio_unitario')),
+        'cliente_mayorista': ('Cliente mayorista', ('precio_cliente_mayorista', 'precio_mayorista', 'precio_unitario')),
+    }
+
     customer_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     nombre_empresa = db.Column(db.String(150))
     contacto_nombre = db.Column(db.String(100))
-    email = db.Column(db.String(100))
+    email = db.Column(db.String(100), index=True)
     telefono = db.Column(db.String(20))
-    rfc = db.Column(db.String(15))
+    rfc = db.Column(db.String(15), index=True)
+    nivel_precio = db.Column(db.String(20), nullable=False, default='unitario', server_default='unitario')
 
     def __repr__(self):
         return f'<Customer {self.nombre_empresa}>'
 
+    # rfc and email are stored normalized, so duplicates and lookups are plain = on the indexes.
+    # A normalized RFC: 3 (company) or 4 (person) letters, yymmdd, 3-character homoclave
+    RFC_PATTERN = re.compile(r'^[A-ZÑ&]{3,4}\d{6}[A-Z0-9]{3}$')
+
+    @staticmethod
+    def normalize_rfc(value):
+        """Uppercase, without spaces or dashes; None when empty"""
+        rfc = ''.join(str(value or '').split()).replace('-', '').upper()
+        return rfc or None
+
+    @staticmethod
+    def normalize_email(value):
+        email = str(value or '').strip().lower()
+        return email or None
+
+    @db.validates('rfc')
+    def _normalize_rfc(self, key, value):
+        return self.normalize_rfc(value)
+
+    @db.validates('email')
+    def _normalize_email(self, key, value):
+        return self.normalize_email(value)
+
     def to_dict(self):
         return {
             'customer_id': self.customer_id,
@@ -24,6 +61,7 @@ class Customer(db.Model):
             'email': self.email,
             'telefono': self.telefono,
             'rfc': self.rfc,
+            'nivel_precio': self.nivel_precio,
         }
 
 class ImpresionChoice(db.Model):
@@ -44,7 +82,7 @@ class ImpresionChoice(db.Model):
         """Get active choices for dropdown"""
         choices = ImpresionChoice.query.filter_by(activo=True).order_by(ImpresionChoice.orden,
                                                                         ImpresionChoice.nombre).all()
-        return [('', 'Seleccionar...')] + [(c.nombre, c.nombre) for c in choices]
+        return [('', 'Seleccionar...')] + [(c.id, c.nombre) for c in choices]
 
 
 class ColorsChoice(db.Model):
@@ -65,32 +103,49 @@ class ColorsChoice(db.Model):
     def get_choices():
         """Get active choices for dropdown"""
         choices = ColorsChoice.query.filter_by(activo=True).order_by(ColorsChoice.orden, ColorsChoice.nombre).all()
-        return [('', 'Seleccionar...')] + [(c.nombre, c.nombre) for c in choices]
+        return [('', 'Seleccionar...')] + [(c.id, c.nombre) for c in choices]
 
 class Product(db.Model):
     __tablename__ = 'products'
 
     id = db.Column(db.Integer,  primary_key=True)
     clave_producto = db.Column(db.String(100), unique=True, nullable=False, index=True)
-    tipo_producto = db.Column(db.String(255), nullable=False)
+    tipo_producto = db.Column(db.String(255), nullable=False, index=True)
     descripcion = db.Column(db.Text)
     medidas = db.Column(db.String(100))
-    material = db.Column(db.String(100))
+    material = db.Column(db.String(100), index=True)
     empaque = db.Column(db.Integer)
-    impresion = db.Column(db.String(50))
-    colores = db.Column(db.String(100))
-    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
+    impresion_id = db.Column(db.Integer, db.ForeignKey('impresion_choice.id'), index=True)
+    colores_id = db.Column(db.Integer, db.ForeignKey('colors_choice.id'), index=True)
+    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False, index=True)
     precio_mayorista = db.Column(db.Numeric(10, 2))
     precio_cliente = db.Column(db.Numeric(10, 2))
     precio_promocion = db.Column(db.Numeric(10, 2))
     precio_cliente_mayorista = db.Column(db.Numeric(10, 2))
     available = db.Column(db.Boolean, default=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # product list order
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Use Product.with_choices() in listings so these come in the same query
+    impresion_choice = db.relationship('ImpresionChoice')
+    colores_choice = db.relationship('ColorsChoice')
+
     def __repr__(self):
         return f'<Product {self.clave_producto}>'
 
+    @staticmethod
+    def with_choices():
+        """Query options that join the impresion / colores names"""
+        return (db.joinedload(Product.impresion_choice), db.joinedload(Product.colores_choice))
+
+    @property
+    def impresion(self):
+        return self.impresion_choice.nombre if self.impresion_choice else None
+
+    @property
+    def colores(self):
+        return self.colores_choice.nombre if self.colores_choice else None
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -100,7 +155,9 @@ class Product(db.Model):
             'medidas': self.medidas,
             'material': self.material,
             'empaque': self.empaque,
+            'impresion_id': self.impresion_id,
             'impresion': self.impresion,
+            'colores_id': self.colores_id,
             'colores': self.colores,
             'precio_unitario': float(self.precio_unitario) if self.precio_unitario else 0,
             'precio_mayorista': float(self.precio_mayorista) if self.precio_mayorista else 0,
@@ -112,33 +169,309 @@ class Product(db.Model):
 
 # ... (Keep existing Customer and Product models exactly as they are) ...
 
+class ProductStaging(db.Model):
+    """Rows of a replace-all import, validated here before the swap into products"""
+    __tablename__ = 'products_staging'
+
+    id = db.Column(db.Integer, primary_key=True)
+    clave_producto = db.Column(db.String(100), unique=True, nullable=False)
+    tipo_producto = db.Column(db.String(255), nullable=False)
+    descripcion = db.Column(db.Text)
+    medidas = db.Column(db.String(100))
+    material = db.Column(db.String(100))
+    empaque = db.Column(db.Integer)
+    # Choice names as in the file; swap_staged() creates the new ones and resolves the ids
+    impresion = db.Column(db.String(100))
+    colores = db.Column(db.String(100))
+    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
+    precio_mayorista = db.Column(db.Numeric(10, 2))
+    precio_cliente = db.Column(db.Numeric(10, 2))
+    precio_promocion = db.Column(db.Numeric(10, 2))
+    precio_cliente_mayorista = db.Column(db.Numeric(10, 2))
+    available = db.Column(db.Boolean, default=True, nullable=False)
+
+
+class CatalogVersion(db.Model):
+    """Single-row counter, bumped by every transaction that changes products or choices"""
+    __tablename__ = 'catalog_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    @staticmethod
+    def current():
+        """The catalog version, or None before the row exists (init-db creates it)"""
+        return db.session.query(CatalogVersion.version).filter_by(id=1).scalar()
+
+    @staticmethod
+    def bump(connection):
+        """Call this for catalog writes that bypass the ORM (bulk INSERT / UPDATE)"""
+        connection.execute(db.update(CatalogVersion).where(CatalogVersion.id == 1)
+                           .values(version=CatalogVersion.version + 1))
+
+
+class ProductTierPrice(db.Model):
+    """
+    Price of every product in every tier, with the NULL fallbacks of
+    Customer.TIERS already applied (see pricing.py)
+
+    Product saves through the ORM keep their rows current; bulk writes that
+    bypass it call rebuild() in the same transaction.
+    """
+    __tablename__ = 'product_tier_prices'
+
+    nivel_precio = db.Column(db.String(20), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True, index=True)
+    precio = db.Column(db.Numeric(10, 2), nullable=False)
+
+    @staticmethod
+    def resolved(product):
+        """[row dict per tier] for one Product instance"""
+        rows = []
+        for tier, (_, columns) in Customer.TIERS.items():
+            values = [getattr(product, column) for column in columns]
+            precio = next((v for v in values if v is not None), 0)
+            rows.append({'nivel_precio': tier, 'product_id': product.id, 'precio': precio})
+        return rows
+
+    @staticmethod
+    def rebuild(connection):
+        """Recompute the whole table: one INSERT ... SELECT per tier"""
+        table, products = ProductTierPrice.__table__, Product.__table__
+        connection.execute(db.delete(table))
+        for tier, (_, columns) in Customer.TIERS.items():
+            precio = db.func.coalesce(*[products.c[column] for column in columns], 0)
+            connection.execute(table.insert().from_select(
+                ['nivel_precio', 'product_id', 'precio'],
+                db.select(db.literal(tier), products.c.id, precio),
+            ))
+
+
+class CustomerPrice(db.Model):
+    """Price negotiated with one customer for one product; wins over the customer's tier"""
+    __tablename__ = 'customer_prices'
+
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True, index=True)
+    precio = db.Column(db.Numeric(10, 2), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    product = db.relationship('Product')
+
+
+class CustomerTrigram(db.Model):
+    """One trigram of a customer's searchable text (customer_search.py)"""
+    __tablename__ = 'customer_trigrams'
+
+    gram = db.Column(db.String(3), primary_key=True)
+    customer_id = db.Column(db.Integer, primary_key=True, index=True)
+
+
+PRICE_COLUMNS = ('precio_unitario', 'precio_mayorista', 'precio_cliente', 'precio_promocion',
+                 'precio_cliente_mayorista')
+
+
+@db.event.listens_for(Product, 'after_insert')
+@db.event.listens_for(Product, 'after_update')
+def refresh_tier_prices(mapper, connection, product):
+    state = db.inspect(product)
+    if any(state.attrs[column].history.has_changes() for column in PRICE_COLUMNS):
+        table = ProductTierPrice.__table__
+        connection.execute(db.delete(table).where(table.c.product_id == product.id))
+        connection.execute(table.insert(), ProductTierPrice.resolved(product))
+
+
+@db.event.listens_for(Product, 'before_delete')
+def delete_product_prices(mapper, connection, product):
+    for table in (ProductTierPrice.__table__, CustomerPrice.__table__):
+        connection.execute(db.delete(table).where(table.c.product_id == product.id))
+
+
+CATALOG_MODELS = (Product, ImpresionChoice, ColorsChoice)
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def bump_catalog_version(session, flush_context):
+    # Once per transaction and inside it, so the new version commits with the change
+    if session.info.get('catalog_bumped'):
+        return
+    changed = [*session.new, *session.deleted, *(obj for obj in session.dirty if session.is_modified(obj))]
+    if any(isinstance(obj, CATALOG_MODELS) for obj in changed):
+        CatalogVersion.bump(session.connection())
+        session.info['catalog_bumped'] = True
+
+
+@db.event.listens_for(db.session, 'after_transaction_end')
+def reset_catalog_bump(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('catalog_bumped', None)
+
+
+class ImportJob(db.Model):
+    """A catalog file uploaded from the web, imported in the background (see import_jobs.py)"""
+    __tablename__ = 'import_jobs'
+
+    MODES = {
+        'nuevos': 'Solo productos nuevos',
+        'actualizar': 'Nuevos y actualizar existentes',
+        'reemplazar': 'Reemplazar catálogo (desactiva los que no vienen en el archivo)',
+    }
+    FINISHED = ('Terminada', 'Fallida')
+
+    id = db.Column(db.Integer, primary_key=True)
+    archivo = db.Column(db.String(255), nullable=False)
+    modo = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='En cola')  # En cola, Importando, Terminada, Fallida
+    # 1 while the job is En cola / Importando, NULL once it finishes. The unique index lets
+    # only one job hold it, so two uploads arriving together can't both start (import_jobs.start())
+    running_slot = db.Column(db.Integer, unique=True)
+    procesadas = db.Column(db.Integer, nullable=False, default=0)
+    importadas = db.Column(db.Integer, nullable=False, default=0)
+    omitidas = db.Column(db.Integer, nullable=False, default=0)
+    errores = db.Column(db.Integer, nullable=False, default=0)
+    detalle_errores = db.Column(db.Text)  # first errors, one per line
+    mensaje = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    # Heartbeat: a running job that stops updating died with its worker process
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def finished(self):
+        return self.status in self.FINISHED
+
+    def to_dict(self):
+        end = self.finished_at or datetime.utcnow()
+        seconds = (end - self.started_at).total_seconds() if self.started_at else 0
+        return {
+            'id': self.id,
+            'archivo': self.archivo,
+            'modo': self.modo,
+            'status': self.status,
+            'procesadas': self.procesadas,
+            'importadas': self.importadas,
+            'omitidas': self.omitidas,
+            'errores': self.errores,
+            'detalle_errores': self.detalle_errores.splitlines() if self.detalle_errores else [],
+            'mensaje': self.mensaje,
+            'segundos': round(seconds, 1),
+            'filas_por_segundo': round(self.procesadas / seconds, 1) if seconds else 0,
+            'finished': self.finished,
+        }
+
+
+class ScheduledJob(db.Model):
+    """A periodic job of scheduler.py: who may run it next, and its metrics"""
+    __tablename__ = 'scheduled_jobs'
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    # Lease of the worker running it; expires if that worker dies mid-run
+    locked_until = db.Column(db.DateTime)
+    locked_by = db.Column(db.String(100))  # host:pid
+    runs = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_duration_ms = db.Column(db.Float)
+    last_rows = db.Column(db.Integer)  # rows touched by the last successful run
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255))
+
+    def to_dict(self):
+        row = {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
 class Quotation(db.Model):
     __tablename__ = 'quotations'
+    __table_args__ = (
+        db.Index('ix_quotations_status_fecha', 'status', 'fecha'),
+        db.Index('ix_quotations_customer_fecha', 'customer_id', 'fecha'),
+        db.Index('ix_quotations_status_vence_en', 'status', 'vence_en'),
+        db.Index('ix_quotations_fecha', 'fecha'),
+    )
+
+    STATUSES = ('Borrador', 'Enviada', 'Aceptada', 'Cancelada', 'Vencida')
+    OPEN_STATUSES = ('Borrador', 'Enviada')
+    # Allowed status changes; Aceptada, Cancelada and Vencida are final.
+    # Open quotations past vence_en become Vencida by themselves (expiration.py).
+    TRANSITIONS = {
+        'Borrador': ('Enviada', 'Cancelada'),
+        'Enviada': ('Aceptada', 'Cancelada', 'Borrador'),
+        'Aceptada': (),
+        'Cancelada': (),
+        'Vencida': (),
+    }
 
     quotation_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'))
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
     vigencia_dias = db.Column(db.Integer, default=15)
-    status = db.Column(db.Enum('Borrador', 'Enviada', 'Aceptada', 'Cancelada'), default='Borrador')
+    status = db.Column(db.Enum(*STATUSES), default='Borrador')
     notas_generales = db.Column(db.Text)
     tiempo_entrega_dias = db.Column(db.Integer, default=5)
     anticipo_requerido_porcentaje = db.Column(db.Numeric(5, 2), default=50.00)
+    # fecha + vigencia_dias, kept in sync by set_vence_en() so expiry queries are a range scan
+    vence_en = db.Column(db.DateTime)
+    # Optimistic lock: every edit through the builder API bumps it (see quotation_api.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     # Relationships
     customer = db.relationship('Customer', backref='quotations')
     details = db.relationship('QuotationDetail', backref='quotation', cascade="all, delete-orphan")
 
+    archived = False  # QuotationArchive rows are read-only copies, see archive.py
+
+    def can_change_to(self, status):
+        return status in self.TRANSITIONS.get(self.status, ())
+
+    @property
+    def editable(self):
+        """Lines can be changed only while the quotation is open"""
+        return self.status in self.OPEN_STATUSES
+
     @property
     def total(self):
         """Calculate total sum of details"""
         return sum(d.subtotal for d in self.details)
 
+    def to_dict(self):
+        return {
+            'quotation_id': self.quotation_id,
+            'customer_id': self.customer_id,
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'vigencia_dias': self.vigencia_dias,
+            'status': self.status,
+            'notas_generales': self.notas_generales,
+            'tiempo_entrega_dias': self.tiempo_entrega_dias,
+            'anticipo_requerido_porcentaje': float(self.anticipo_requerido_porcentaje or 0),
+            'vence_en': self.vence_en.isoformat() if self.vence_en else None,
+            'version': self.version,
+            'items': [d.to_dict() for d in self.details],
+            'total': self.total,
+        }
+
+@db.event.listens_for(Quotation, 'before_insert')
+@db.event.listens_for(Quotation, 'before_update')
+def set_vence_en(mapper, connection, quote):
+    """Keep vence_en = fecha + vigencia_dias"""
+    # Column defaults are applied by the INSERT itself, too late to use them here
+    if quote.fecha is None:
+        quote.fecha = datetime.utcnow()
+    if quote.vigencia_dias is None:
+        quote.vigencia_dias = mapper.columns['vigencia_dias'].default.arg
+    quote.vence_en = quote.fecha + timedelta(days=quote.vigencia_dias)
+
+
 class QuotationDetail(db.Model):
     __tablename__ = 'quotation_details'
 
     detail_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    quotation_id = db.Column(db.Integer, db.ForeignKey('quotations.quotation_id'))
-    clave_producto = db.Column(db.String(50), db.ForeignKey('products.clave_producto'))
+    quotation_id = db.Column(db.Integer, db.ForeignKey('quotations.quotation_id'), index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), index=True)
+    clave_producto = db.Column(db.String(100))  # the clave when quoted, kept if the product is renamed
     cantidad = db.Column(db.Integer, default=1)
     precio_pactado = db.Column(db.Numeric(10, 2), default=0.00)
     tecnica_personalizacion = db.Column(db.String(100))
@@ -147,8 +480,7 @@ class QuotationDetail(db.Model):
     url_logo_diseno = db.Column(db.String(255))
     ubicacion_impresion = db.Column(db.String(100))
 
-    # Relationship to Product (Using clave_producto as the link)
-    product = db.relationship('Product', foreign_keys=[clave_producto])
+    product = db.relationship('Product')
 
     @property
     def subtotal(self):
@@ -156,4 +488,157 @@ class QuotationDetail(db.Model):
         price = float(self.precio_pactado or 0)
         custom_cost = float(self.costo_personalizacion or 0)
         qty = int(self.cantidad or 0)
-        return (price + custom_cost) * qty
\ No newline at end of file
+        return (price + custom_cost) * qty
+
+    def to_dict(self):
+        return {
+            'detail_id': self.detail_id,
+            'quotation_id': self.quotation_id,
+            'product_id': self.product_id,
+            'clave_producto': self.clave_producto,
+            'cantidad': self.cantidad,
+            'precio': float(self.precio_pactado or 0),
+            'costo_personalizacion': float(self.costo_personalizacion or 0),
+            'tecnica': self.tecnica_personalizacion,
+            'ubicacion': self.ubicacion_impresion,
+            'comentarios': self.comentarios_diseno,
+            'subtotal': self.subtotal,
+        }
+
+
+class QuotationArchive(db.Model):
+    """
+    Quotations moved out of the hot tables by archive.py, same ids and columns
+
+    No foreign keys: MySQL can only partition tables without them (see
+    archive.partition_archive()). Archived quotations are read-only.
+    """
+    __tablename__ = 'quotations_archive'
+    __table_args__ = (
+        db.Index('ix_quotations_archive_customer_fecha', 'customer_id', 'fecha'),
+        db.Index('ix_quotations_archive_fecha', 'fecha'),
+    )
+
+    TRANSITIONS = {status: () for status in Quotation.STATUSES}
+    archived = True
+    editable = False
+
+    quotation_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_id = db.Column(db.Integer)
+    fecha = db.Column(db.DateTime)
+    vigencia_dias = db.Column(db.Integer)
+    status = db.Column(db.Enum(*Quotation.STATUSES))
+    notas_generales = db.Column(db.Text)
+    tiempo_entrega_dias = db.Column(db.Integer)
+    anticipo_requerido_porcentaje = db.Column(db.Numeric(5, 2))
+    vence_en = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    archivado_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    customer = db.relationship('Customer', primaryjoin='foreign(QuotationArchive.customer_id) == Customer.customer_id',
+                               viewonly=True)
+    details = db.relationship('QuotationDetailArchive', order_by='QuotationDetailArchive.detail_id', viewonly=True,
+                              primaryjoin='foreign(QuotationDetailArchive.quotation_id) == QuotationArchive.quotation_id')
+
+    @property
+    def total(self):
+        return sum(d.subtotal for d in self.details)
+
+
+class QuotationDetailArchive(db.Model):
+    """Lines of the archived quotations"""
+    __tablename__ = 'quotation_details_archive'
+
+    detail_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    quotation_id = db.Column(db.Integer, index=True)
+    product_id = db.Column(db.Integer, index=True)
+    clave_producto = db.Column(db.String(100))
+    cantidad = db.Column(db.Integer)
+    precio_pactado = db.Column(db.Numeric(10, 2))
+    tecnica_personalizacion = db.Column(db.String(100))
+    costo_personalizacion = db.Column(db.Numeric(10, 2))
+    comentarios_diseno = db.Column(db.Text)
+    url_logo_diseno = db.Column(db.String(255))
+    ubicacion_impresion = db.Column(db.String(100))
+
+    product = db.relationship('Product', primaryjoin='foreign(QuotationDetailArchive.product_id) == Product.id',
+                              viewonly=True)
+
+    subtotal = QuotationDetail.subtotal
+
+
+class QuotationTemplate(db.Model):
+    """A saved set of lines and conditions to start new quotations from (see quotation_copy.py)"""
+    __tablename__ = 'quotation_templates'
+
+    template_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    nombre = db.Column(db.String(100), nullable=False)
+    vigencia_dias = db.Column(db.Integer, default=15)
+    notas_generales = db.Column(db.Text)
+    tiempo_entrega_dias = db.Column(db.Integer, default=5)
+    anticipo_requerido_porcentaje = db.Column(db.Numeric(5, 2), default=50.00)
+    creada_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    details = db.relationship('QuotationTemplateDetail', order_by='QuotationTemplateDetail.detail_id',
+                              cascade='all, delete-orphan')
+
+
+class QuotationTemplateDetail(db.Model):
+    """Lines of a QuotationTemplate, same columns as QuotationDetail"""
+    __tablename__ = 'quotation_template_details'
+
+    detail_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('quotation_templates.template_id'), index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'))
+    clave_producto = db.Column(db.String(100))
+    cantidad = db.Column(db.Integer, default=1)
+    precio_pactado = db.Column(db.Numeric(10, 2), default=0.00)
+    tecnica_personalizacion = db.Column(db.String(100))
+    costo_personalizacion = db.Column(db.Numeric(10, 2), default=0.00)
+    comentarios_diseno = db.Column(db.Text)
+    url_logo_diseno = db.Column(db.String(255))
+    ubicacion_impresion = db.Column(db.String(100))
+
+    subtotal = QuotationDetail.subtotal
+
+
+class RollupProductMonth(db.Model):
+    """Quoted lines per product, month and quotation status (see analytics.py)"""
+    __tablename__ = 'rollup_product_month'
+
+    mes = db.Column(db.Date, primary_key=True)  # first day of the month
+    product_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    cotizaciones = db.Column(db.Integer, nullable=False, default=0)
+    lineas = db.Column(db.Integer, nullable=False, default=0)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    suma_precio = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # / lineas = average precio_pactado
+    importe = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # sum of the line subtotals
+
+
+class RollupCustomerMonth(db.Model):
+    """Quoted lines per customer, month and quotation status"""
+    __tablename__ = 'rollup_customer_month'
+
+    mes = db.Column(db.Date, primary_key=True)
+    customer_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    cotizaciones = db.Column(db.Integer, nullable=False, default=0)
+    lineas = db.Column(db.Integer, nullable=False, default=0)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    suma_precio = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    importe = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+
+class RollupTecnicaMonth(db.Model):
+    """Quoted lines per tecnica_personalizacion ('' when empty), month and quotation status"""
+    __tablename__ = 'rollup_tecnica_month'
+
+    mes = db.Column(db.Date, primary_key=True)
+    tecnica = db.Column(db.String(100), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    cotizaciones = db.Column(db.Integer, nullable=False, default=0)
+    lineas = db.Column(db.Integer, nullable=False, default=0)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    suma_precio = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    importe = db.Column(db.Numeric(14, 2), nullable=False, default=0)
@@ -0,0 +1,198 @@
+"""
+Price consistency checks
+
+Each product has five price columns (PRICE_COLUMNS) and nothing in the
+forms or the importer checks that they agree with each other. RULES lists
+what a coherent set of prices looks like. Each rule is an expression over
+the price columns that is True where the rule is broken.
+
+The catalog is loaded as one NumPy float array per column, with NaN for
+NULL, and every rule runs over the whole arrays at once. That takes
+milliseconds even for 100k products. The expressions only use comparisons
+and & / |, so the same rule also works on one product's prices as plain
+floats. The importer checks every row that way (check_values).
+
+Severity:
+  error  the import rejects the row (replace mode: the whole file)
+  aviso  reported, imported anyway
+
+Rules can be turned off with PRICE_CHECKS_DISABLED=code,code and the
+allowed spread between tiers is PRICE_MAX_RATIO (config.py).
+
+    python price_checks.py                 # check the catalog
+    python price_checks.py --csv precios.csv
+The same report is on the "Revisión de Precios" page.
+"""
+
+import argparse
+import csv
+from time import perf_counter
+
+from flask import current_app
+from sqlalchemy import Float, cast, select
+
+from models import db, Product, PRICE_COLUMNS
+
+# numpy is imported inside the functions that use it, like pandas in import_csv.py
+
+
+def missing(x):
+    return x != x  # NaN is the only value not equal to itself; works on arrays and floats
+
+
+def present(x):
+    return x == x
+
+
+def _any(*masks):
+    result = masks[0]
+    for mask in masks[1:]:
+        result = result | mask
+    return result
+
+
+def _negative(p, ratio):
+    return _any(*(p[c] < 0 for c in PRICE_COLUMNS))
+
+
+def _zero(p, ratio):
+    return _any(*(p[c] == 0 for c in PRICE_COLUMNS))
+
+
+def _out_of_range(p, ratio):
+    u = p['precio_unitario']
+    return _any(*((p[c] > u * ratio) | (p[c] * ratio < u) for c in PRICE_COLUMNS if c != 'precio_unitario'))
+
+
+# code -> (severity, message, broken(prices, PRICE_MAX_RATIO)); checked in this order
+RULES = {
+    'sin_precio_unitario': ('error', 'Sin precio_unitario',
+                            lambda p, ratio: missing(p['precio_unitario'])),
+    'precio_negativo': ('error', 'Algún precio es negativo', _negative),
+    'precio_cero': ('aviso', 'Algún precio está en cero', _zero),
+    'mayorista_sobre_unitario': ('aviso', 'precio_mayorista es mayor que precio_unitario',
+                                 lambda p, ratio: p['precio_mayorista'] > p['precio_unitario']),
+    'promocion_sobre_cliente': ('aviso', 'precio_promocion es mayor que el precio de lista del cliente',
+                                lambda p, ratio: (p['precio_promocion'] > p['precio_cliente'])
+                                | (missing(p['precio_cliente'])
+                                   & (p['precio_promocion'] > p['precio_unitario']))),
+    'cliente_mayorista_sobre_cliente': ('aviso', 'precio_cliente_mayorista es mayor que precio_cliente',
+                                        lambda p, ratio: p['precio_cliente_mayorista'] > p['precio_cliente']),
+    'cliente_mayorista_bajo_mayorista': ('aviso', 'precio_cliente_mayorista es menor que precio_mayorista',
+                                         lambda p, ratio: p['precio_cliente_mayorista'] < p['precio_mayorista']),
+    'falta_precio_cliente': ('aviso', 'Tiene precio_promocion o precio_cliente_mayorista pero no precio_cliente',
+                             lambda p, ratio: missing(p['precio_cliente'])
+                             & (present(p['precio_promocion']) | present(p['precio_cliente_mayorista']))),
+    'fuera_de_rango': ('aviso', 'Algún precio se aleja más de PRICE_MAX_RATIO veces de precio_unitario',
+                       _out_of_range),
+}
+
+
+def active_rules():
+    """The RULES not turned off in the config"""
+    disabled = set(current_app.config['PRICE_CHECKS_DISABLED'])
+    return {code: rule for code, rule in RULES.items() if code not in disabled}
+
+
+def load_prices(table=Product.__table__):
+    """(ids, claves, {column: float array, NaN for NULL}) for every row of products or products_staging"""
+    import numpy as np
+
+    rows = db.session.execute(
+        select(table.c.id, table.c.clave_producto, *[cast(table.c[c], Float) for c in PRICE_COLUMNS])
+        .order_by(table.c.id)
+    ).all()
+    columns = list(zip(*rows)) or [()] * (len(PRICE_COLUMNS) + 2)
+    prices = {c: np.array(values, dtype=np.float64) for c, values in zip(PRICE_COLUMNS, columns[2:])}
+    return list(columns[0]), list(columns[1]), prices
+
+
+def evaluate(prices, rules=None):
+    """{code: row indices breaking the rule}, only rules with at least one"""
+    import numpy as np
+
+    rules = active_rules() if rules is None else rules
+    ratio = current_app.config['PRICE_MAX_RATIO']
+    found = {}
+    for code, (severity, message, broken) in rules.items():
+        rows = np.flatnonzero(broken(prices, ratio))
+        if len(rows):
+            found[code] = rows
+    return found
+
+
+def check_values(values, rules=None):
+    """[(code, severity, message)] for one product's column values (Decimals or None)"""
+    rules = active_rules() if rules is None else rules
+    ratio = current_app.config['PRICE_MAX_RATIO']
+    prices = {c: float('nan') if values.get(c) is None else float(values[c]) for c in PRICE_COLUMNS}
+    return [(code, severity, message) for code, (severity, message, broken) in rules.items()
+            if broken(prices, ratio)]
+
+
+def check_table(table=Product.__table__, limit=None):
+    """
+    Run the active rules over a whole table
+
+    Returns (rows checked, milliseconds spent on the rules, [{code,
+    severidad, mensaje, total, productos}]) where productos holds up to
+    `limit` of the offending rows with their prices.
+    """
+    ids, claves, prices = load_prices(table)
+    rules = active_rules()
+    started = perf_counter()
+    found = evaluate(prices, rules)
+    elapsed = (perf_counter() - started) * 1000
+
+    results = []
+    for code, rows in found.items():
+        severity, message, _ = rules[code]
+        results.append({
+            'code': code,
+            'severidad': severity,
+            'mensaje': message,
+            'total': len(rows),
+            'productos': [{'id': ids[i], 'clave_producto': claves[i],
+                           **{c: None if missing(prices[c][i]) else float(prices[c][i]) for c in PRICE_COLUMNS}}
+                          for i in rows[:limit]],
+        })
+    return len(ids), elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limite', type=int, default=10, help='products printed per rule (default 10)')
+    parser.add_argument('--csv', help='write every violation to this CSV file')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        checked, elapsed, results = check_table(limit=None if args.csv else args.limite)
+        print(f"🔍 {checked} products, {len(active_rules())} rules checked in {elapsed:.1f} ms\n")
+        if not results:
+            print("✅ All prices are consistent")
+            return
+
+        for result in results:
+            icon = '❌' if result['severidad'] == 'error' else '⚠️ '
+            print(f"{icon} {result['code']}: {result['total']} products - {result['mensaje']}")
+            for product in result['productos'][:args.limite]:
+                prices = '  '.join('-' if product[c] is None else f"{product[c]:.2f}" for c in PRICE_COLUMNS)
+                print(f"     {product['clave_producto']:<20} {prices}")
+            if result['total'] > args.limite:
+                print(f"     ... and {result['total'] - args.limite} more")
+
+        if args.csv:
+            with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['regla', 'severidad', 'id', 'clave_producto', *PRICE_COLUMNS])
+                for result in results:
+                    for product in result['productos']:
+                        writer.writerow([result['code'], result['severidad'], product['id'],
+                                         product['clave_producto'], *[product[c] for c in PRICE_COLUMNS]])
+            print(f"\n📄 Violations written to {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
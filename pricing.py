@@ -0,0 +1,73 @@
+"""
+Customer prices
+
+Every customer buys from one of the five price lists on Product
+(Customer.nivel_precio, see Customer.TIERS) and may have negotiated prices
+for particular products (CustomerPrice). The fallbacks for products that
+leave a tier's column empty are resolved once, when the product is saved,
+into product_tier_prices. So any customer's price for any set of products
+is one query: the (nivel_precio, product_id) primary key of the matrix,
+left joined to the customer's overrides.
+
+To recompute the matrix by hand (after writing products with raw SQL):
+    python pricing.py
+"""
+
+from sqlalchemy import and_, func, select
+
+from models import db, Customer, CustomerPrice, Product, ProductTierPrice
+
+DEFAULT_TIER = 'unitario'  # walk-in prices, when no customer is chosen yet
+
+
+def _price_select(key, customer_id):
+    """SELECT key, precio over products, priced for the customer"""
+    tier = DEFAULT_TIER
+    precio = ProductTierPrice.precio
+    if customer_id is not None:
+        tier = select(Customer.nivel_precio).where(Customer.customer_id == customer_id).scalar_subquery()
+        precio = func.coalesce(CustomerPrice.precio, precio)
+    query = (select(key, precio.label('precio'))
+             .select_from(Product)
+             .join(ProductTierPrice, and_(ProductTierPrice.product_id == Product.id,
+                                          ProductTierPrice.nivel_precio == tier)))
+    if customer_id is not None:
+        query = query.outerjoin(CustomerPrice, and_(CustomerPrice.customer_id == customer_id,
+                                                    CustomerPrice.product_id == Product.id))
+    return query
+
+
+def prices_for(customer_id, product_ids):
+    """{product_id: precio} for the customer (None: walk-in prices); unknown ids are left out"""
+    if not product_ids:
+        return {}
+    query = _price_select(Product.id, customer_id).where(Product.id.in_(product_ids))
+    return dict(db.session.execute(query).all())
+
+
+def price_for(customer_id, product_id):
+    """The customer's price for one product, or None if either doesn't exist"""
+    return prices_for(customer_id, [product_id]).get(product_id)
+
+
+def prices_by_clave(customer_id, claves):
+    """{clave_producto: precio}, for the builder, which works with claves"""
+    if not claves:
+        return {}
+    query = _price_select(Product.clave_producto, customer_id).where(Product.clave_producto.in_(claves))
+    return dict(db.session.execute(query).all())
+
+
+def price_table(customer_id):
+    """Subquery (product_id, precio) over every product for the customer, to join in set-based writes"""
+    return _price_select(Product.id.label('product_id'), customer_id).subquery()
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    with create_app().app_context():
+        ProductTierPrice.rebuild(db.session.connection())
+        db.session.commit()
+        count = db.session.query(func.count()).select_from(ProductTierPrice).scalar()
+        print(f"✅ {count} tier prices rebuilt")
@@ -0,0 +1,306 @@
+"""
+JSON API for editing a saved quotation one line at a time
+
+The builder page sends small deltas (add / update / remove one
+QuotationDetail) instead of resubmitting the whole quote. Every request
+carries the quotation version the client last saw; the version is bumped
+with a single conditional UPDATE, so two salespeople editing the same
+quote never block each other and the slower one gets a 409 with the
+current state instead of silently overwriting the other's change.
+"""
+
+import math
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from sqlalchemy import func, update
+
+from models import db, Product, Quotation, QuotationDetail
+from replicas import read_replica
+import customer_search
+import pricing
+import readers
+import scheduler
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+TYPEAHEAD_LIMIT = 10  # customers suggested by default
+
+
+def _quantity(value):
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError
+    quantity = int(value) if isinstance(value, float) else int(str(value))
+    if quantity < 1:
+        raise ValueError
+    return quantity
+
+
+def _amount(value):
+    if isinstance(value, bool):
+        raise ValueError
+    amount = float(str(value))
+    if not math.isfinite(amount) or amount < 0:
+        raise ValueError
+    return amount
+
+
+# JSON key -> (QuotationDetail column, parser raising ValueError, message when it does). Same keys as the create POST.
+ITEM_FIELDS = {
+    'cantidad': ('cantidad', _quantity, 'La cantidad debe ser un número entero mayor o igual a 1'),
+    'precio': ('precio_pactado', _amount, 'El precio debe ser un número mayor o igual a 0'),
+    'costo_personalizacion': ('costo_personalizacion', _amount,
+                              'El costo de personalización debe ser un número mayor o igual a 0'),
+    'tecnica': ('tecnica_personalizacion', str, None),
+    'ubicacion': ('ubicacion_impresion', str, None),
+    'comentarios': ('comentarios_diseno', str, None),
+}
+
+
+class InvalidItem(Exception):
+    """A field of the request can't be stored in a QuotationDetail; args[0] is the message for the user"""
+
+
+class VersionConflict(Exception):
+    """The quotation was changed by someone else since the client loaded it"""
+
+
+class QuotationClosed(Exception):
+    """The quotation is Aceptada, Cancelada or Vencida: it can't be changed any more"""
+
+
+def claim_version(q_id, expected):
+    """
+    Compare-and-swap the version of an open quotation, returns the new version
+
+    Raises VersionConflict if the stored version is not `expected`, and
+    QuotationClosed if the quotation's status is not one of OPEN_STATUSES.
+    """
+    result = db.session.execute(
+        update(Quotation)
+        .where(Quotation.quotation_id == q_id, Quotation.version == expected,
+               Quotation.status.in_(Quotation.OPEN_STATUSES))
+        .values(version=Quotation.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        status = db.session.query(Quotation.status).filter_by(quotation_id=q_id).scalar()
+        if status is not None and status not in Quotation.OPEN_STATUSES:
+            raise QuotationClosed(status)
+        raise VersionConflict()
+    return expected + 1
+
+
+def quotation_total(q_id):
+    """Grand total computed in SQL, without loading every detail row; NULLs count as 0 like in subtotal"""
+    line = QuotationDetail
+    total = db.session.query(
+        func.sum((func.coalesce(line.precio_pactado, 0) + func.coalesce(line.costo_personalizacion, 0))
+                 * func.coalesce(line.cantidad, 0))
+    ).filter(QuotationDetail.quotation_id == q_id).scalar()
+    return float(total or 0)
+
+
+def parse_item_fields(data):
+    """
+    {QuotationDetail column: value} for the ITEM_FIELDS present in data
+
+    A blank number takes the column default, blank text is NULL. Raises
+    InvalidItem when a value doesn't parse or is out of range, before
+    anything is written.
+    """
+    columns = QuotationDetail.__table__.c
+    fields = {}
+    for key, (column, parse, message) in ITEM_FIELDS.items():
+        if key not in data:
+            continue
+        value = data[key]
+        if value not in (None, ''):
+            try:
+                value = parse(value)
+            except (TypeError, ValueError, OverflowError):
+                raise InvalidItem(message)
+        elif parse is not str:
+            value = columns[column].default.arg
+        else:
+            value = None
+        fields[column] = value
+    return fields
+
+
+def apply_item_fields(detail, fields):
+    """Set the columns returned by parse_item_fields()"""
+    for column, value in fields.items():
+        setattr(detail, column, value)
+
+
+def _expected_version(data):
+    try:
+        return int(data['version'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _conflict_response(q_id):
+    db.session.rollback()
+    quote = readers.quotation_dict(q_id)
+    if quote is None:
+        return jsonify({'success': False, 'error': 'Cotización no encontrada'}), 404
+    return jsonify({
+        'success': False,
+        'error': 'La cotización fue modificada por otro usuario',
+        'quotation': quote,
+    }), 409
+
+
+def _closed_response(q_id, status):
+    db.session.rollback()
+    return jsonify({
+        'success': False,
+        'closed': True,
+        'error': f'La cotización está {status} y ya no se puede modificar',
+        'quotation': readers.quotation_dict(q_id),
+    }), 409
+
+
+def _saved_response(q_id, version, detail=None, status=200):
+    body = {'success': True, 'version': version, 'total': quotation_total(q_id)}
+    if detail is not None:
+        body['item'] = detail.to_dict()
+    return jsonify(body), status
+
+
+@api.route('/prices')
+def get_prices():
+    """?customer_id=&claves=A,B -> the customer's price for each clave (walk-in prices without customer_id)"""
+    customer_id = request.args.get('customer_id', type=int)
+    claves = [c for c in request.args.get('claves', '').split(',') if c]
+    prices = pricing.prices_by_clave(customer_id, claves)
+    return jsonify({
+        'customer_id': customer_id,
+        'prices': {clave: float(precio) for clave, precio in prices.items()},
+    })
+
+
+@api.route('/customers/search')
+@read_replica
+def search_customers():
+    """?q=&limit= -> the best matching customers, for the quotation builder's typeahead"""
+    term = request.args.get('q', '', type=str)
+    limit = request.args.get('limit', TYPEAHEAD_LIMIT, type=int)
+    limit = min(max(limit, 1), current_app.config['CUSTOMER_SEARCH_LIMIT'])
+    rows = customer_search.search(term, limit) if term.strip() else []
+    return jsonify({
+        'q': term,
+        'customers': [{
+            'customer_id': row.customer_id,
+            'nombre_empresa': row.nombre_empresa,
+            'contacto_nombre': row.contacto_nombre,
+            'email': row.email,
+            'rfc': row.rfc,
+            'nivel_precio': row.nivel_precio,
+        } for row in rows],
+    })
+
+
+@api.route('/scheduler')
+def scheduler_jobs():
+    """The periodic jobs of scheduler.py with their metrics: runs, failures, rows touched, durations"""
+    return jsonify({'jobs': [job.to_dict() for job in scheduler.job_rows()]})
+
+
+@api.route('/quotations/<int:q_id>')
+def get_quotation(q_id):
+    quote = readers.quotation_dict(q_id)
+    if quote is None:
+        abort(404)
+    return jsonify(quote)
+
+
+@api.route('/quotations/<int:q_id>/items', methods=['POST'])
+def add_item(q_id):
+    data = request.get_json(silent=True) or {}
+    expected = _expected_version(data)
+    if expected is None:
+        return jsonify({'success': False, 'error': 'Falta version'}), 400
+
+    product = Product.query.filter_by(clave_producto=data.get('clave_producto')).first()
+    if product is None:
+        return jsonify({'success': False, 'error': 'Producto no encontrado'}), 400
+
+    try:
+        fields = parse_item_fields(data)
+    except InvalidItem as invalid:
+        return jsonify({'success': False, 'error': invalid.args[0]}), 400
+
+    try:
+        version = claim_version(q_id, expected)
+
+        customer_id = db.session.query(Quotation.customer_id).filter_by(quotation_id=q_id).scalar()
+        detail = QuotationDetail(quotation_id=q_id, product_id=product.id, clave_producto=product.clave_producto,
+                                 cantidad=1, precio_pactado=pricing.price_for(customer_id, product.id) or 0,
+                                 costo_personalizacion=0)
+        apply_item_fields(detail, fields)
+        db.session.add(detail)
+        db.session.commit()
+        return _saved_response(q_id, version, detail, 201)
+
+    except VersionConflict:
+        return _conflict_response(q_id)
+    except QuotationClosed as closed:
+        return _closed_response(q_id, closed.args[0])
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/quotations/<int:q_id>/items/<int:detail_id>', methods=['PATCH'])
+def update_item(q_id, detail_id):
+    data = request.get_json(silent=True) or {}
+    expected = _expected_version(data)
+    if expected is None:
+        return jsonify({'success': False, 'error': 'Falta version'}), 400
+
+    detail = QuotationDetail.query.filter_by(detail_id=detail_id, quotation_id=q_id).first_or_404()
+
+    try:
+        fields = parse_item_fields(data)
+    except InvalidItem as invalid:
+        return jsonify({'success': False, 'error': invalid.args[0]}), 400
+
+    try:
+        version = claim_version(q_id, expected)
+        apply_item_fields(detail, fields)
+        db.session.commit()
+        return _saved_response(q_id, version, detail)
+
+    except VersionConflict:
+        return _conflict_response(q_id)
+    except QuotationClosed as closed:
+        return _closed_response(q_id, closed.args[0])
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/quotations/<int:q_id>/items/<int:detail_id>', methods=['DELETE'])
+def remove_item(q_id, detail_id):
+    data = request.get_json(silent=True) or {}
+    expected = _expected_version(data)
+    if expected is None:
+        return jsonify({'success': False, 'error': 'Falta version'}), 400
+
+    detail = QuotationDetail.query.filter_by(detail_id=detail_id, quotation_id=q_id).first_or_404()
+
+    try:
+        version = claim_version(q_id, expected)
+        db.session.delete(detail)
+        db.session.commit()
+        return _saved_response(q_id, version)
+
+    except VersionConflict:
+        return _conflict_response(q_id)
+    except QuotationClosed as closed:
+        return _closed_response(q_id, closed.args[0])
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
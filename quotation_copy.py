@@ -0,0 +1,170 @@
+"""
+Duplicating quotations and quotation templates
+
+Sales reps often quote the same lines again: to another customer, or the
+same customer months later. Three copies cover that:
+  duplicate_quotation()   quotation -> new Borrador quotation
+  save_template()         quotation -> QuotationTemplate
+  quotation_from_template() template -> new Borrador quotation
+The source can be a live or an archived quotation (archive.py).
+
+Every copy is one transaction of two statements whatever the number of
+lines: an INSERT of the new header, then one INSERT ... SELECT that copies
+every line inside the database. With reprice=True that same SELECT joins
+the current prices of the customer (pricing.price_table()) and takes
+precio_pactado from there. A line whose product has no price keeps its
+old one.
+
+The new quotation's rollups (analytics.py) are refreshed explicitly, since
+the INSERT ... SELECT bypasses the ORM.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, literal, select
+
+import analytics
+import pricing
+from models import (db, Quotation, QuotationArchive, QuotationDetail, QuotationDetailArchive, QuotationTemplate,
+                    QuotationTemplateDetail)
+
+# Conditions a copy takes from its source
+HEADER_FIELDS = ['vigencia_dias', 'notas_generales', 'tiempo_entrega_dias', 'anticipo_requerido_porcentaje']
+
+# Line columns copied, the same in quotation_details, quotation_details_archive and quotation_template_details
+LINE_FIELDS = [c.name for c in QuotationDetail.__table__.columns if c.name not in ('detail_id', 'quotation_id')]
+
+
+def _source_quotation(q_id):
+    """(header row, lines table, key column) of the quotation, live or archived; None if it doesn't exist"""
+    for header, lines in ((Quotation.__table__, QuotationDetail.__table__),
+                          (QuotationArchive.__table__, QuotationDetailArchive.__table__)):
+        row = db.session.execute(select(header).where(header.c.quotation_id == q_id)).first()
+        if row is not None:
+            return row, lines, lines.c.quotation_id
+    return None
+
+
+def _copy_lines(source, source_key, source_id, target, target_key, target_id, customer_id=None, reprice=False):
+    """INSERT ... SELECT the lines of one quotation / template into another; returns the row count"""
+    columns = {field: source.c[field] for field in LINE_FIELDS}
+    lines = source
+    if reprice:
+        prices = pricing.price_table(customer_id)
+        lines = source.outerjoin(prices, prices.c.product_id == source.c.product_id)
+        columns['precio_pactado'] = func.coalesce(prices.c.precio, source.c.precio_pactado)
+
+    query = (
+        select(literal(target_id), *columns.values())
+        .select_from(lines)
+        .where(source_key == source_id)
+        .order_by(source.c.detail_id)  # same line order as the source
+    )
+    return db.session.execute(
+        insert(target).from_select([target_key.name, *columns], query)
+    ).rowcount
+
+
+def _new_quotation(conditions, customer_id):
+    """INSERT a Borrador quotation header; returns its id"""
+    quotations = Quotation.__table__
+    values = {field: conditions[field] for field in HEADER_FIELDS}
+    if values['vigencia_dias'] is None:
+        values['vigencia_dias'] = quotations.c.vigencia_dias.default.arg
+    now = datetime.utcnow()
+    result = db.session.execute(insert(quotations).values(
+        customer_id=customer_id,
+        fecha=now,
+        status='Borrador',
+        vence_en=now + timedelta(days=values['vigencia_dias']),  # what set_vence_en() does for ORM inserts
+        **values,
+    ))
+    return result.inserted_primary_key[0]
+
+
+def duplicate_quotation(q_id, reprice=False):
+    """
+    Copy a quotation and its lines into a new Borrador quotation for the same customer
+
+    Returns (new quotation_id, lines copied), or None if q_id doesn't exist.
+    """
+    source = _source_quotation(q_id)
+    if source is None:
+        return None
+    header, lines, key = source
+
+    try:
+        new_id = _new_quotation(header._mapping, header.customer_id)
+        copied = _copy_lines(lines, key, q_id, QuotationDetail.__table__, QuotationDetail.__table__.c.quotation_id,
+                             new_id, header.customer_id, reprice)
+        analytics.refresh_quotations(db.session.connection(), [new_id])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return new_id, copied
+
+
+def save_template(q_id, nombre):
+    """
+    Save a quotation's lines and conditions as a template
+
+    Returns (template_id, lines copied), or None if q_id doesn't exist.
+    """
+    source = _source_quotation(q_id)
+    if source is None:
+        return None
+    header, lines, key = source
+
+    details = QuotationTemplateDetail.__table__
+    try:
+        template_id = db.session.execute(insert(QuotationTemplate.__table__).values(
+            nombre=nombre, creada_en=datetime.utcnow(), **{field: header._mapping[field] for field in HEADER_FIELDS}
+        )).inserted_primary_key[0]
+        copied = _copy_lines(lines, key, q_id, details, details.c.template_id, template_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return template_id, copied
+
+
+def quotation_from_template(template_id, customer_id, reprice=True):
+    """
+    New Borrador quotation for the customer with the template's lines and conditions
+
+    reprice (default): the customer's current prices instead of the ones
+    saved in the template. Returns (quotation_id, lines copied), or None if
+    the template doesn't exist.
+    """
+    templates, details = QuotationTemplate.__table__, QuotationTemplateDetail.__table__
+    template = db.session.execute(select(templates).where(templates.c.template_id == template_id)).first()
+    if template is None:
+        return None
+
+    try:
+        new_id = _new_quotation(template._mapping, customer_id)
+        copied = _copy_lines(details, details.c.template_id, template_id, QuotationDetail.__table__,
+                             QuotationDetail.__table__.c.quotation_id, new_id, customer_id, reprice)
+        analytics.refresh_quotations(db.session.connection(), [new_id])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return new_id, copied
+
+
+def template_rows():
+    """Templates for the list page, newest first, with their line count and total"""
+    details = QuotationTemplateDetail
+    return db.session.execute(
+        select(QuotationTemplate.template_id, QuotationTemplate.nombre, QuotationTemplate.creada_en,
+               QuotationTemplate.vigencia_dias, func.count(details.detail_id).label('lineas'),
+               func.coalesce(func.sum((func.coalesce(details.precio_pactado, 0)
+                                       + func.coalesce(details.costo_personalizacion, 0))
+                                      * func.coalesce(details.cantidad, 0)), 0).label('total'))
+        .outerjoin(details, details.template_id == QuotationTemplate.template_id)
+        .group_by(QuotationTemplate.template_id, QuotationTemplate.nombre, QuotationTemplate.creada_en,
+                  QuotationTemplate.vigencia_dias)
+        .order_by(QuotationTemplate.creada_en.desc())
+    ).all()
@@ -0,0 +1,118 @@
+"""
+Column-projection reads for listings and JSON
+
+Loading ORM objects costs an identity-map entry, instance state and every
+column (descripcion is an unbounded Text) per row, even when the page shows
+six columns. The functions here select just the columns a page or endpoint
+needs and return SQLAlchemy Rows: named tuples that templates read with
+the same attribute syntax (product.clave_producto) as model instances.
+
+Use them for read-only pages and JSON. Anything that modifies rows still
+loads models.
+"""
+
+from flask_sqlalchemy.pagination import SelectPagination
+from sqlalchemy import func, select
+
+from models import db, Product, ImpresionChoice, Customer, Quotation, QuotationDetail
+
+EXCERPT = 50  # characters of descripcion shown in the product list
+
+
+class RowPagination(SelectPagination):
+    """db.paginate() for multi-column selects: items are Rows, not the first column"""
+
+    def _query_items(self):
+        select_ = self._query_args['select'].limit(self.per_page).offset(self._query_offset)
+        return self._query_args['session'].execute(select_).all()
+
+    def _query_count(self):
+        return self._query_args['session'].execute(self._query_args['count_select']).scalar()
+
+
+def product_page(conditions, page, per_page=10):
+    """One page of the product list, newest first"""
+    rows = (
+        select(Product.id, Product.clave_producto, Product.tipo_producto,
+               func.substr(Product.descripcion, 1, EXCERPT).label('descripcion_corta'),
+               ImpresionChoice.nombre.label('impresion'), Product.precio_unitario, Product.available)
+        .outerjoin(ImpresionChoice, ImpresionChoice.id == Product.impresion_id)
+        .where(*conditions)
+        .order_by(Product.created_at.desc())
+    )
+    count = select(func.count(Product.id)).where(*conditions)
+    return RowPagination(select=rows, count_select=count, session=db.session,
+                         page=page, per_page=per_page, error_out=False)
+
+
+def product_options():
+    """Available products for the quotation builder pickers"""
+    return db.session.execute(
+        select(Product.clave_producto, Product.tipo_producto, Product.descripcion, Product.precio_unitario)
+        .where(Product.available == True)
+        .order_by(Product.tipo_producto)
+    ).all()
+
+
+def customer_rows(conditions=()):
+    """Customers for the list page, by name"""
+    return db.session.execute(
+        select(Customer.customer_id, Customer.nombre_empresa, Customer.contacto_nombre,
+               Customer.email, Customer.telefono, Customer.rfc)
+        .where(*conditions)
+        .order_by(Customer.nombre_empresa)
+    ).all()
+
+
+def quotation_dict(q_id):
+    """Quotation.to_dict() in two narrow queries, or None if it doesn't exist"""
+    header = db.session.execute(
+        select(Quotation.quotation_id, Quotation.customer_id, Quotation.fecha, Quotation.vigencia_dias,
+               Quotation.status, Quotation.notas_generales, Quotation.tiempo_entrega_dias,
+               Quotation.anticipo_requerido_porcentaje, Quotation.vence_en, Quotation.version)
+        .where(Quotation.quotation_id == q_id)
+    ).first()
+    if header is None:
+        return None
+
+    details = db.session.execute(
+        select(QuotationDetail.detail_id, QuotationDetail.quotation_id, QuotationDetail.product_id,
+               QuotationDetail.clave_producto, QuotationDetail.cantidad, QuotationDetail.precio_pactado,
+               QuotationDetail.costo_personalizacion, QuotationDetail.tecnica_personalizacion,
+               QuotationDetail.ubicacion_impresion, QuotationDetail.comentarios_diseno)
+        .where(QuotationDetail.quotation_id == q_id)
+        .order_by(QuotationDetail.detail_id)
+    ).all()
+
+    items = []
+    for d in details:
+        precio = float(d.precio_pactado or 0)
+        costo = float(d.costo_personalizacion or 0)
+        items.append({
+            'detail_id': d.detail_id,
+            'quotation_id': d.quotation_id,
+            'product_id': d.product_id,
+            'clave_producto': d.clave_producto,
+            'cantidad': d.cantidad,
+            'precio': precio,
+            'costo_personalizacion': costo,
+            'tecnica': d.tecnica_personalizacion,
+            'ubicacion': d.ubicacion_impresion,
+            'comentarios': d.comentarios_diseno,
+            'subtotal': (precio + costo) * int(d.cantidad or 0),
+        })
+
+    return {
+        'quotation_id': header.quotation_id,
+        'customer_id': header.customer_id,
+        'fecha': header.fecha.isoformat() if header.fecha else None,
+        'vigencia_dias': header.vigencia_dias,
+        'status': header.status,
+        'notas_generales': header.notas_generales,
+        'tiempo_entrega_dias': header.tiempo_entrega_dias,
+        'anticipo_requerido_porcentaje': float(header.anticipo_requerido_porcentaje or 0),
+        'vence_en': header.vence_en.isoformat() if header.vence_en else None,
+        'version': header.version,
+        'items': items,
+        'total': sum(item['subtotal'] for item in items),
+    }
@@ -0,0 +1,64 @@
+"""
+Read replica routing
+
+Set DATABASE_REPLICA_URL to send the SELECTs of read-only pages to a
+replica. The pages opt in with @read_replica; everything else, every
+write and anything run from the CLI keeps using SQLALCHEMY_DATABASE_URI.
+
+Replicas lag behind the primary, so a user who just saved something
+would not see it on the page they are redirected to. After any request
+that commits, the user's session is pinned to the primary for
+READ_AFTER_WRITE_SECONDS.
+
+To try it locally, point both URLs at SQLite copies of the same database:
+    DATABASE_URL=sqlite:////tmp/primary.db DATABASE_REPLICA_URL=sqlite:////tmp/replica.db
+"""
+
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+
+REPLICA = 'replica'  # SQLALCHEMY_BINDS key
+
+STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(Session):
+    """Session whose SELECTs go to the replica while a @read_replica view runs"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and g and g.get('read_replica')
+                and getattr(clause, 'is_select', False)):
+            return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """Serve this view's queries from the replica, unless the user wrote recently"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_replica = (REPLICA in current_app.config['SQLALCHEMY_BINDS']
+                          and session.get(STICKY_KEY, 0) < time.time())
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _mark_write(db_session):
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _pin_to_primary(response):
+    if g.get('db_wrote'):
+        session[STICKY_KEY] = time.time() + current_app.config['READ_AFTER_WRITE_SECONDS']
+    return response
+
+
+def init_app(app, db):
+    app.config.setdefault('SQLALCHEMY_BINDS', {})
+    if REPLICA in app.config['SQLALCHEMY_BINDS']:
+        if not db.event.contains(db.session, 'after_commit', _mark_write):
+            db.event.listen(db.session, 'after_commit', _mark_write)
+        app.after_request(_pin_to_primary)
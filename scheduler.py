@@ -0,0 +1,189 @@
+"""
+Periodic jobs run inside the web workers
+
+A job is a function called every N seconds (JOBS). Each web worker
+process has one daemon thread that wakes up every SCHEDULER_TICK_SECONDS
+and runs the jobs that are due, so there is no cron entry or separate
+service to keep alive. wsgi.py and `python app.py` start it; the CLI
+scripts, which also call create_app(), don't.
+
+gunicorn runs WEB_CONCURRENCY workers, maybe on several hosts, and each
+one has the thread. The scheduled_jobs table decides which of them runs a
+job: a worker claims it with one conditional UPDATE (due and not leased ->
+next run time and a lease), the same compare-and-swap as
+quotation_api.claim_version(). Only the worker whose UPDATE changed the
+row runs the job, so it runs once per interval whatever the number of
+workers. If that worker dies mid-run its lease expires after
+SCHEDULER_LEASE_SECONDS and another one takes over.
+
+The row also keeps the job's metrics: runs, failures, rows touched and
+duration of the last run, rows touched in total. Every run is logged too
+(logger 'scheduler', with job, rows and duration_ms fields).
+    python scheduler.py                      # jobs and their metrics
+    python scheduler.py expire_quotations    # run a job now
+    GET /api/scheduler                       # the metrics as JSON
+"""
+
+import argparse
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+import expiration
+from models import db, ScheduledJob
+
+log = logging.getLogger(__name__)
+
+# name: (function returning the rows it touched, setting with its interval in seconds; 0 disables it)
+JOBS = {
+    'expire_quotations': (expiration.expire_quotations, 'EXPIRE_EVERY_SECONDS'),
+}
+
+_thread = None
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'[:100]
+
+
+def ensure_jobs():
+    """Add the scheduled_jobs rows of new JOBS, due now"""
+    existing = set(db.session.execute(select(ScheduledJob.name)).scalars())
+    for name in JOBS.keys() - existing:
+        try:
+            db.session.execute(insert(ScheduledJob).values(name=name, next_run_at=datetime.utcnow()))
+            db.session.commit()
+        except IntegrityError:  # another worker added it first
+            db.session.rollback()
+
+
+def claim(name, every, now=None):
+    """Take the job if it is due and no one is running it; True if this worker should run it now"""
+    now = now or datetime.utcnow()
+    lease = timedelta(seconds=current_app.config['SCHEDULER_LEASE_SECONDS'])
+    result = db.session.execute(
+        update(ScheduledJob)
+        .where(ScheduledJob.name == name, ScheduledJob.next_run_at <= now,
+               or_(ScheduledJob.locked_until.is_(None), ScheduledJob.locked_until < now))
+        .values(next_run_at=now + timedelta(seconds=every), locked_until=now + lease, locked_by=worker_name())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _record(name, started, duration, **values):
+    """Release the lease and store the metrics of a run"""
+    db.session.execute(
+        update(ScheduledJob)
+        .where(ScheduledJob.name == name)
+        .values(runs=ScheduledJob.runs + 1, last_started_at=started, last_finished_at=datetime.utcnow(),
+                last_duration_ms=round(duration, 1), locked_until=None, locked_by=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def run_job(name):
+    """Run a job in this thread and record its metrics; returns the rows it touched"""
+    function, _ = JOBS[name]
+    started = datetime.utcnow()
+    timer = time.perf_counter()
+    try:
+        rows = function() or 0
+    except Exception as e:
+        db.session.rollback()
+        duration = (time.perf_counter() - timer) * 1000
+        log.exception('%s failed after %.0fms', name, duration, extra={'job': name, 'duration_ms': round(duration, 1)})
+        _record(name, started, duration, failures=ScheduledJob.failures + 1, last_error=str(e)[:255])
+        raise
+
+    duration = (time.perf_counter() - timer) * 1000
+    log.info('%s: %d rows in %.0fms', name, rows, duration,
+             extra={'job': name, 'rows': rows, 'duration_ms': round(duration, 1)})
+    _record(name, started, duration, last_rows=rows, total_rows=ScheduledJob.total_rows + rows, last_error=None)
+    return rows
+
+
+def run_due_jobs():
+    """Run the jobs this worker manages to claim; returns {name: rows} of the ones it ran"""
+    ensure_jobs()
+    ran = {}
+    for name, (_, setting) in JOBS.items():
+        every = current_app.config[setting]
+        if every <= 0 or not claim(name, every):
+            continue
+        try:
+            ran[name] = run_job(name)
+        except Exception:
+            continue  # already logged and recorded by run_job(); the next job still runs
+    return ran
+
+
+def _loop(app):
+    tick = app.config['SCHEDULER_TICK_SECONDS']
+    time.sleep(random.uniform(0, tick))  # workers started together don't all query at once
+    while True:
+        with app.app_context():
+            try:
+                run_due_jobs()
+            except Exception:  # database unreachable...: try again next tick
+                log.exception('scheduler tick failed')
+        time.sleep(tick)
+
+
+def start(app):
+    """Start this process's scheduler thread, once; False if SCHEDULER_ENABLED is off or it already runs"""
+    global _thread
+    if _thread is not None or not app.config['SCHEDULER_ENABLED']:
+        return False
+    _thread = threading.Thread(target=_loop, args=(app,), name='scheduler', daemon=True)
+    _thread.start()
+    return True
+
+
+def job_rows():
+    """Every job's scheduled_jobs row, by name"""
+    return ScheduledJob.query.filter(ScheduledJob.name.in_(JOBS)).order_by(ScheduledJob.name).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('job', nargs='?', choices=sorted(JOBS), help='run this job now')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        ensure_jobs()
+        if args.job:
+            job = db.session.get(ScheduledJob, args.job)
+            if job.locked_until and job.locked_until > datetime.utcnow():
+                print(f"⚠️  {args.job} is running on {job.locked_by}, try again later")
+                return
+            rows = run_job(args.job)
+            print(f"✅ {args.job}: {rows} rows")
+            return
+
+        for job in job_rows():
+            every = current_app.config[JOBS[job.name][1]]
+            last = job.last_finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.last_finished_at else 'never'
+            print(f"  {job.name}  every {every}s  next {job.next_run_at:%Y-%m-%d %H:%M:%S}")
+            print(f"      last run {last}: {job.last_rows or 0} rows in {job.last_duration_ms or 0:.0f}ms")
+            print(f"      {job.runs} runs, {job.failures} failed, {job.total_rows} rows in total")
+            if job.last_error:
+                print(f"      ⚠️  {job.last_error}")
+            if job.locked_until and job.locked_until > datetime.utcnow():
+                print(f"      running on {job.locked_by}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 Quick setup script - Initialize everything
 """
 
-from app import app
+from app import create_app
 from models import db, ImpresionChoice, ColorsChoice
 
 
@@ -13,7 +13,7 @@ def quick_setup():
     print("QUICK SETUP - CHOICE TABLES")
     print("=" * 70)
 
-    with app.app_context():
+    with create_app().app_context():
         # Create tables
         print("\n📦 Creating database tables...")
         db.create_all()
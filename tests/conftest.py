@@ -0,0 +1,68 @@
+"""
+Fixtures: an app on a fresh SQLite database per test
+
+The schema is built the way `flask --app app init-db` builds it,
+db.create_all() then migrations.upgrade(), so the tests also run every
+migration against an empty database.
+"""
+
+import pytest
+
+from app import create_app
+from config import Config
+from migrations import upgrade
+from models import db, Customer, Product, Quotation
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        SQLALCHEMY_BINDS = {}
+        SCHEDULER_ENABLED = False
+        LOG_LEVEL = 'WARNING'
+        TESTING = True
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        upgrade()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def context(app):
+    """An app context around the test, like a request or a CLI script has"""
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, context):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_product(context):
+    def make_product(clave, **prices):
+        product = Product(clave_producto=clave, tipo_producto='Taza', precio_unitario=100, **prices)
+        db.session.add(product)
+        db.session.commit()
+        return product
+    return make_product
+
+
+@pytest.fixture
+def make_quotation(context):
+    def make_quotation(status='Borrador', nivel_precio='unitario'):
+        customer = Customer(nombre_empresa='Cliente de prueba', nivel_precio=nivel_precio)
+        db.session.add(customer)
+        db.session.flush()
+        quotation = Quotation(customer_id=customer.customer_id, status=status)
+        db.session.add(quotation)
+        db.session.commit()
+        return quotation
+    return make_quotation
@@ -0,0 +1,23 @@
+from sqlalchemy import inspect
+
+from migrations import upgrade
+from models import db
+
+
+def test_upgrade_is_idempotent_on_a_fresh_database(context):
+    # the fixture already ran create_all() and upgrade() once
+    assert upgrade() == []
+    assert upgrade() == []
+    assert 'impresion' in {c['name'] for c in inspect(db.engine).get_columns('products_staging')}
+
+
+def test_init_db_command_runs_twice(app):
+    # no app context here: the command must push its own
+    runner = app.test_cli_runner()
+
+    first = runner.invoke(args=['init-db'])
+    second = runner.invoke(args=['init-db'])
+
+    assert first.exit_code == 0, first.output
+    assert second.exit_code == 0, second.output
+    assert 'Migration applied' not in second.output
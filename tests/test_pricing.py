@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+import pricing
+from models import db, Customer, CustomerPrice
+
+
+def test_customer_price_beats_the_tier_price(make_product, make_quotation):
+    negotiated = make_product('P1', precio_mayorista=80)
+    tier_only = make_product('P2', precio_mayorista=90)
+    customer_id = make_quotation(nivel_precio='mayorista').customer_id
+    db.session.add(CustomerPrice(customer_id=customer_id, product_id=negotiated.id, precio=70))
+    db.session.commit()
+
+    prices = pricing.prices_for(customer_id, [negotiated.id, tier_only.id])
+
+    assert prices == {negotiated.id: Decimal('70.00'), tier_only.id: Decimal('90.00')}
+
+
+def test_walk_in_prices_ignore_customer_prices(make_product, make_quotation):
+    product = make_product('P1', precio_mayorista=80)
+    customer_id = make_quotation(nivel_precio='mayorista').customer_id
+    db.session.add(CustomerPrice(customer_id=customer_id, product_id=product.id, precio=70))
+    db.session.commit()
+
+    assert pricing.prices_for(None, [product.id]) == {product.id: Decimal('100.00')}
+
+
+def test_empty_tier_falls_back_to_precio_unitario(make_product):
+    product = make_product('P1')
+    customer = Customer(nombre_empresa='Otro', nivel_precio='cliente_mayorista')
+    db.session.add(customer)
+    db.session.commit()
+
+    assert pricing.prices_for(customer.customer_id, [product.id]) == {product.id: Decimal('100.00')}
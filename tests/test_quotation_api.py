@@ -0,0 +1,72 @@
+from models import db, Quotation, QuotationDetail
+
+
+def add_item(client, quotation, clave, version=None, **fields):
+    return client.post(f'/api/quotations/{quotation.quotation_id}/items',
+                       json={'version': version or quotation.version, 'clave_producto': clave, **fields})
+
+
+def stored_version(quotation):
+    return db.session.query(Quotation.version).filter_by(quotation_id=quotation.quotation_id).scalar()
+
+
+def test_add_item_bumps_version(client, make_product, make_quotation):
+    make_product('T1')
+    quotation = make_quotation()
+    version = quotation.version
+
+    response = add_item(client, quotation, 'T1', cantidad=3)
+
+    assert response.status_code == 201
+    assert response.get_json()['version'] == version + 1
+    assert response.get_json()['total'] == 300
+
+
+def test_stale_version_is_a_conflict(client, make_product, make_quotation):
+    make_product('T1')
+    quotation = make_quotation()
+    stale = quotation.version
+    detail_id = add_item(client, quotation, 'T1').get_json()['item']['detail_id']
+
+    response = client.patch(f'/api/quotations/{quotation.quotation_id}/items/{detail_id}',
+                            json={'version': stale, 'cantidad': 7})
+
+    assert response.status_code == 409
+    assert response.get_json()['quotation']['version'] == stale + 1
+    assert db.session.get(QuotationDetail, detail_id).cantidad == 1
+
+
+def test_closed_quotation_refuses_edits(client, make_product, make_quotation):
+    make_product('T1')
+    quotation = make_quotation()
+    detail_id = add_item(client, quotation, 'T1').get_json()['item']['detail_id']
+    db.session.query(Quotation).filter_by(quotation_id=quotation.quotation_id).update({'status': 'Aceptada'})
+    db.session.commit()
+    version = stored_version(quotation)
+
+    responses = [
+        add_item(client, quotation, 'T1', version),
+        client.patch(f'/api/quotations/{quotation.quotation_id}/items/{detail_id}',
+                     json={'version': version, 'cantidad': 7}),
+        client.delete(f'/api/quotations/{quotation.quotation_id}/items/{detail_id}', json={'version': version}),
+    ]
+
+    assert [r.status_code for r in responses] == [409, 409, 409]
+    assert all(r.get_json()['closed'] for r in responses)
+    assert stored_version(quotation) == version
+    assert client.get(f'/quotations/{quotation.quotation_id}/edit').status_code == 302
+
+
+def test_invalid_fields_are_rejected_before_the_version_changes(client, make_product, make_quotation):
+    make_product('T1')
+    quotation = make_quotation()
+    response = add_item(client, quotation, 'T1')
+    detail_id, version = response.get_json()['item']['detail_id'], response.get_json()['version']
+
+    for fields in ({'cantidad': -5, 'precio': -100}, {'precio': 'nan'}, {'cantidad': 'abc'}):
+        response = client.patch(f'/api/quotations/{quotation.quotation_id}/items/{detail_id}',
+                                json={'version': version, **fields})
+        assert response.status_code == 400
+        assert response.get_json()['error']
+
+    assert stored_version(quotation) == version
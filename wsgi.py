@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app          (Linux / macOS)
+    waitress-serve --threads=4 wsgi:app            (Windows)
+"""
+
+from app import create_app
+import scheduler
+
+app = create_app()
+scheduler.start(app)  # periodic jobs, e.g. expiring quotations (SCHEDULER_ENABLED)